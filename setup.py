@@ -21,6 +21,15 @@ setup(name='tap-s3-csv',
       extras_require={
           'dev': [
               'ipdb'
+          ],
+          'zstd': [
+              'zstandard==0.25.0'
+          ],
+          'orjson': [
+              'orjson==3.13.0'
+          ],
+          'ujson': [
+              'ujson==5.10.0'
           ]
       },
       entry_points='''
@@ -6,6 +6,7 @@ import singer
 from singer import metadata
 from singer import utils as singer_utils
 from tap_s3_csv.discover import discover_streams
+from tap_s3_csv import output
 from tap_s3_csv import s3
 from tap_s3_csv.sync import sync_stream
 from tap_s3_csv.config import CONFIG_CONTRACT
@@ -15,6 +16,14 @@ LOGGER = singer.get_logger()
 REQUIRED_CONFIG_KEYS = ["start_date", "bucket", "account_id", "external_id", "role_name"]
 
 
+def share_listings(config):
+    # Tables searching the same prefixes of the bucket share its listing,
+    # rather than each of them listing the bucket again. Shared listings are
+    # held in memory until the end of the sync, so they have to be enabled.
+    if str(config.get('share_listings', '')).lower() == 'true' and len(config['tables']) > 1:
+        s3.enable_shared_listing()
+
+
 def do_discover(config):
     LOGGER.info("Starting discover")
     streams = discover_streams(config)
@@ -31,7 +40,17 @@ def stream_is_selected(mdata):
 
 def do_sync(config, catalog, state, sync_start_time):
     LOGGER.info('Starting sync.')
+    output.configure(config)
+    share_listings(config)
+    try:
+        sync_streams(config, catalog, state, sync_start_time)
+    finally:
+        s3.disable_shared_listing()
+
+    LOGGER.info('Done syncing.')
 
+
+def sync_streams(config, catalog, state, sync_start_time):
     for stream in catalog['streams']:
         stream_name = stream['tap_stream_id']
         mdata = metadata.to_map(stream['metadata'])
@@ -50,8 +69,6 @@ def do_sync(config, catalog, state, sync_start_time):
         counter_value = sync_stream(config, state, table_spec, stream, sync_start_time)
         LOGGER.info("%s: Completed sync (%s rows)", stream_name, counter_value)
 
-    LOGGER.info('Done syncing.')
-
 def validate_table_config(config):
     # Parse the incoming tables config as JSON
     tables_config = json.loads(config['tables'])
@@ -91,7 +108,7 @@ def main():
         s3.setup_s3fs_client_with_proxy(config)
     else:
         try:
-            for page in s3.list_files_in_bucket(config):
+            for page in s3.list_files_in_bucket(config, sharded=False):
                 break
             LOGGER.warning("I have direct access to the bucket without assuming the configured role.")
         except:
@@ -1,4 +1,6 @@
-from voluptuous import Schema, Required, Optional
+from voluptuous import Schema, Required, Optional, In
+
+from tap_s3_csv.sampling import SAMPLE_STRATEGIES
 
 CONFIG_CONTRACT = Schema([{
     Required('table_name'): str,
@@ -6,5 +8,11 @@ CONFIG_CONTRACT = Schema([{
     Required('key_properties'): [str],
     Optional('search_prefix'): str,
     Optional('date_overrides'): [str],
-    Optional('delimiter'): str
+    Optional('delimiter'): str,
+    Optional('schema_from_metadata'): bool,
+    Optional('sample_rate'): int,
+    Optional('max_records'): int,
+    Optional('max_files'): int,
+    Optional('sample_strategy'): In(SAMPLE_STRATEGIES),
+    Optional('sample_stable_files'): int
 }])
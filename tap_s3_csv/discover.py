@@ -1,12 +1,24 @@
 from singer import metadata
 from tap_s3_csv import s3
+from tap_s3_csv import utils
+
+# Tables are sampled one at a time unless `discovery_concurrency` is configured
+DISCOVERY_CONCURRENCY = 1
 
 
 def discover_streams(config):
     streams = []
 
-    for table_spec in config['tables']:
-        schema = discover_schema(config, table_spec)
+    tables = config['tables']
+    discovery_concurrency = utils.get_positive_int(config, 'discovery_concurrency', DISCOVERY_CONCURRENCY)
+    if discovery_concurrency > 1:
+        # Schemas are returned in the order of the tables, so the catalog is the same as when sampled one at a time
+        schemas = utils.ordered_concurrent_map(
+            lambda table_spec: discover_schema(config, table_spec), tables, discovery_concurrency)
+    else:
+        schemas = (discover_schema(config, table_spec) for table_spec in tables)
+
+    for table_spec, schema in zip(tables, schemas):
         streams.append({'stream': table_spec['table_name'], 'tap_stream_id': table_spec['table_name'],
                        'schema': schema, 'metadata': load_metadata(table_spec, schema)})
     return streams
@@ -0,0 +1,119 @@
+"""
+In-file checkpoints, which let the sync of a large CSV or JSONL object
+resume from the last line whose record was written, instead of from the
+start of the object, when a previous sync of it failed.
+"""
+import codecs
+import csv
+import itertools
+
+import singer
+
+from tap_s3_csv import output, s3
+
+LOGGER = singer.get_logger()
+
+BOOKMARK_KEY = 'file_checkpoint'
+
+
+# pylint: disable=too-many-instance-attributes
+class FileCheckpoint():
+    """
+    Tracks how many bytes of an object were read and how many of its records
+    were written, and writes them to the table's `file_checkpoint` bookmark
+    every `interval` bytes. A bookmark for the same key and ETag is resumed
+    from.
+    """
+
+    def __init__(self, state, table_name, s3_file, interval):
+        self.state = state
+        self.table_name = table_name
+        self.s3_path = s3_file['key']
+        self.etag = s3_file.get('etag')
+        self.size = s3_file.get('size')
+        self.interval = interval
+
+        bookmark = singer.get_bookmark(state, table_name, BOOKMARK_KEY) or {}
+        if self.etag and bookmark.get('key') == self.s3_path and bookmark.get('etag') == self.etag:
+            self.offset = bookmark['offset']
+            self.records = bookmark['records']
+            LOGGER.info('Resuming "%s" from byte %s, after %s records.', self.s3_path, self.offset, self.records)
+        else:
+            self.offset = 0
+            self.records = 0
+        self.position = self.offset
+        self.written_offset = self.offset
+
+    @property
+    def is_at_end(self):
+        """Whether the records of every line were written before the sync failed."""
+        return self.size is not None and self.offset >= self.size
+
+    def count_lines(self, lines):
+        """Yields the lines of the object, counting the bytes read."""
+        for line in lines:
+            self.position += len(line)
+            yield line
+
+    def update(self, records):
+        """Called once `records` records of the object, up to the bytes read so
+        far, are written."""
+        self.records = records
+        self.offset = self.position
+        if self.offset - self.written_offset >= self.interval:
+            self.write()
+
+    def write(self):
+        # Records are written in batches, so they have to be flushed before the
+        # state is, otherwise the checkpoint could get ahead of them
+        output.flush()
+        singer.write_bookmark(self.state, self.table_name, BOOKMARK_KEY, {
+            'key': self.s3_path,
+            'etag': self.etag,
+            'offset': self.offset,
+            'records': self.records
+        })
+        singer.write_state(self.state)
+        self.written_offset = self.offset
+
+
+def clear_bookmark(state, table_name):
+    return singer.clear_bookmark(state, table_name, BOOKMARK_KEY)
+
+
+def read_csv_header_lines(lines, delimiter):
+    """Returns the lines of the header row of a CSV file."""
+    header_lines = []
+    def read_lines():
+        for line in lines:
+            header_lines.append(line)
+            yield line
+    next(csv.reader(codecs.iterdecode(read_lines(), 'utf-8-sig'), delimiter=delimiter), None)
+    return header_lines
+
+
+def open_lines(config, file_checkpoint, table_spec, extension):
+    """
+    Returns the lines of a CSV or JSONL object from its checkpoint, counting
+    the bytes read. When resuming a CSV object, its header is read from the
+    start of the object again.
+    """
+    s3_path = file_checkpoint.s3_path
+    if not file_checkpoint.offset:
+        return file_checkpoint.count_lines(s3.get_file_handle(config, s3_path)._raw_stream) #pylint:disable=protected-access
+
+    if file_checkpoint.is_at_end:
+        # A range starting at the end of the object can't be requested
+        lines = iter(())
+    else:
+        file_handle = s3.get_file_handle_from_offset(config, s3_path, file_checkpoint.offset, file_checkpoint.etag)
+        lines = file_checkpoint.count_lines(file_handle._raw_stream) #pylint:disable=protected-access
+    if extension == 'jsonl':
+        return lines
+
+    header_file_handle = s3.get_file_handle(config, s3_path)
+    try:
+        header_lines = read_csv_header_lines(header_file_handle._raw_stream, table_spec.get('delimiter', ',')) #pylint:disable=protected-access
+    finally:
+        header_file_handle.close()
+    return itertools.chain(header_lines, lines)
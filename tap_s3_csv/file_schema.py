@@ -0,0 +1,157 @@
+"""
+Builds prototype records from the schema that Parquet and Avro files carry in
+their footer or header, so their table schema can be discovered without
+reading any of their rows.
+
+A prototype record has a value of the Python type that reading the file
+would give for each column (e.g. a str for a Parquet timestamp, as rows hold
+datetimes that are observed as strings), so that add_observations() observes
+the same types for it as for the rows of the file. Columns that can hold values of several types
+(Avro unions) give one prototype record per type.
+"""
+import pyarrow as pa
+import pyarrow.parquet as pq
+import singer.schema_generation as schema
+from fastavro import reader
+
+# Values observed as the corresponding JSON schema type
+INTEGER = 1
+NUMBER = 0.5
+BOOLEAN = True
+STRING = "prototype"
+
+
+class ObjectPrototype(dict):
+    """An object whose properties aren't known without reading it, see
+    add_observations()."""
+
+
+# Observed as an object without properties
+OBJECT = ObjectPrototype()
+
+AVRO_PRIMITIVE_PROTOTYPES = {
+    'null': None,
+    'boolean': BOOLEAN,
+    'int': INTEGER,
+    'long': INTEGER,
+    'float': NUMBER,
+    'double': NUMBER
+}
+
+
+def add_observations(acc, path, data):
+    """Same as singer.schema_generation.add_observations(), but also observes
+    the objects without properties of prototype records, which an empty dict
+    doesn't add any observation for."""
+    if isinstance(data, ObjectPrototype):
+        node = acc
+        for key in path:
+            node = node.setdefault(key, {})
+        node.setdefault('object', {})
+    elif isinstance(data, dict):
+        for key, value in data.items():
+            add_observations(acc, path + ['object', key], value)
+    elif isinstance(data, list) and data:
+        for item in data:
+            add_observations(acc, path + ['array'], item)
+    else:
+        schema.add_observations(acc, path, data)
+    return acc
+
+
+def _get_record_prototypes(fields):
+    """Returns the prototype records of a record with the given (name,
+    prototypes) fields, using every prototype of each field at least once."""
+    fields = list(fields)
+    count = max((len(prototypes) for _, prototypes in fields), default=1)
+    return [{name: prototypes[min(i, len(prototypes) - 1)] for name, prototypes in fields}
+            for i in range(count)]
+
+
+def get_arrow_prototypes(arrow_type):
+    """Returns the values that an Arrow column of `arrow_type` gives rows."""
+    if pa.types.is_dictionary(arrow_type):
+        return get_arrow_prototypes(arrow_type.value_type)
+    if pa.types.is_boolean(arrow_type):
+        return [BOOLEAN]
+    if pa.types.is_integer(arrow_type):
+        return [INTEGER]
+    if pa.types.is_floating(arrow_type):
+        return [NUMBER]
+    if pa.types.is_null(arrow_type):
+        return [None]
+    if pa.types.is_struct(arrow_type):
+        return _get_record_prototypes((arrow_type.field(i).name, get_arrow_prototypes(arrow_type.field(i).type))
+                                      for i in range(arrow_type.num_fields))
+    if pa.types.is_map(arrow_type):
+        # Rows hold maps as lists of (key, value) tuples, which are observed as strings
+        return [[STRING]]
+    if pa.types.is_list(arrow_type) or pa.types.is_large_list(arrow_type) or pa.types.is_fixed_size_list(arrow_type):
+        return [get_arrow_prototypes(arrow_type.value_type)]
+    # strings, binaries, dates, times, timestamps, durations and decimals
+    return [STRING]
+
+
+def get_parquet_prototype_records(file_handle):
+    """Returns the prototype records of a Parquet file, only reading its footer."""
+    arrow_schema = pq.ParquetFile(file_handle).schema_arrow
+    return _get_record_prototypes((field.name, get_arrow_prototypes(field.type)) for field in arrow_schema)
+
+
+def _get_avro_record_prototypes(avro_schema, named_schemas, expanding):
+    if avro_schema['name'] in expanding:
+        # A recursive record is only expanded once, the records nested in it
+        # are objects whose properties aren't known
+        return [OBJECT]
+    expanding = expanding | {avro_schema['name']}
+    return _get_record_prototypes((field['name'], get_avro_prototypes(field['type'], named_schemas, expanding))
+                                  for field in avro_schema['fields'])
+
+
+def get_avro_prototypes(avro_schema, named_schemas, expanding=frozenset()):
+    """Returns the values that fastavro gives rows for fields of `avro_schema`.
+    `expanding` holds the names of the records that `avro_schema` is nested in."""
+    if isinstance(avro_schema, list):
+        # A union gives values of each of its types. Like sampling non-null
+        # values, the null of an optional field isn't observed.
+        non_null_schemas = [member for member in avro_schema if member != 'null'] or ['null']
+        return [prototype for member in non_null_schemas
+                for prototype in get_avro_prototypes(member, named_schemas, expanding)]
+
+    if isinstance(avro_schema, str):
+        if avro_schema in named_schemas:
+            return get_avro_prototypes(named_schemas[avro_schema], named_schemas, expanding)
+        avro_schema = {'type': avro_schema}
+
+    avro_type = avro_schema['type']
+    if isinstance(avro_type, (list, dict)):
+        return get_avro_prototypes(avro_type, named_schemas, expanding)
+
+    if avro_type in ('record', 'error', 'enum', 'fixed'):
+        named_schemas[avro_schema['name']] = avro_schema
+        if avro_schema.get('namespace'):
+            named_schemas[avro_schema['namespace'] + '.' + avro_schema['name']] = avro_schema
+
+    if avro_schema.get('logicalType'):
+        # Dates, times, timestamps, decimals and uuids are observed as strings
+        return [STRING]
+    if avro_type in AVRO_PRIMITIVE_PROTOTYPES:
+        return [AVRO_PRIMITIVE_PROTOTYPES[avro_type]]
+    if avro_type in ('record', 'error'):
+        return _get_avro_record_prototypes(avro_schema, named_schemas, expanding)
+    if avro_type == 'array':
+        return [get_avro_prototypes(avro_schema['items'], named_schemas, expanding)]
+    if avro_type == 'map':
+        # The keys of a map aren't known without reading it
+        return [OBJECT]
+    if avro_type in named_schemas and avro_type not in ('enum', 'fixed'):
+        return get_avro_prototypes(named_schemas[avro_type], named_schemas, expanding)
+    # strings, bytes, enums and fixed
+    return [STRING]
+
+
+def get_avro_prototype_records(file_handle):
+    """Returns the prototype records of an Avro file, only reading its header."""
+    prototypes = get_avro_prototypes(reader(file_handle).writer_schema, {})
+    # Rows are records, even if the schema of the file is a union with null
+    return [prototype for prototype in prototypes if isinstance(prototype, dict)]
@@ -0,0 +1,124 @@
+import math
+import sys
+import time
+
+import simplejson
+
+import singer
+
+from tap_s3_csv import utils
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+LOGGER = singer.get_logger()
+
+# Records are written to stdout in batches of this many records, or once
+# this many seconds have passed since the last write, whichever comes first.
+OUTPUT_BATCH_SIZE = 1000
+OUTPUT_FLUSH_INTERVAL = 1.0
+
+
+def _dumps(record):
+    # Same encoding as singer.write_record(), used when no faster encoder is
+    # installed or the fast one can't encode a value (e.g. a Decimal)
+    return simplejson.dumps(record, use_decimal=True)
+
+
+def _has_non_finite_float(value):
+    if isinstance(value, float):
+        return not math.isfinite(value)
+    if isinstance(value, dict):
+        return any(_has_non_finite_float(item) for item in value.values())
+    if isinstance(value, list):
+        return any(_has_non_finite_float(item) for item in value)
+    return False
+
+
+def _fast_dumps(record):
+    # orjson writes NaN and Infinity as null and ujson may reject them, so
+    # records with them are written as NaN and Infinity, as simplejson does
+    if _has_non_finite_float(record):
+        return _dumps(record)
+    try:
+        if orjson is not None:
+            return orjson.dumps(record).decode('utf-8')
+        return ujson.dumps(record)
+    except (TypeError, OverflowError):
+        return _dumps(record)
+
+
+class RecordWriter():
+    """
+    Writes RECORD messages to stdout like singer.write_record(), but
+    serializes them with orjson or ujson when installed and writes them in
+    batches instead of flushing stdout after every record.
+
+    flush() must be called before any other message (e.g. STATE) is written,
+    so that messages stay in order. Records written from worker threads are
+    queued by sync.write_concurrently() and written from the main thread.
+    """
+
+    def __init__(self, batch_size=OUTPUT_BATCH_SIZE, flush_interval=OUTPUT_FLUSH_INTERVAL):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dumps = _fast_dumps if orjson is not None or ujson is not None else _dumps
+        self._envelopes = {}
+        self._buffer = []
+        self._last_flush = time.monotonic()
+
+    def _get_envelope(self, stream_name):
+        # The envelope of a RECORD message is the same for every record of a stream
+        if stream_name not in self._envelopes:
+            self._envelopes[stream_name] = '{{"type": "RECORD", "stream": {}, "record": '.format(
+                simplejson.dumps(stream_name))
+        return self._envelopes[stream_name]
+
+    def write_record(self, stream_name, record):
+        self._buffer.append(self._get_envelope(stream_name) + self.dumps(record) + '}\n')
+
+        if len(self._buffer) >= self.batch_size or time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        if self._buffer:
+            sys.stdout.write(''.join(self._buffer))
+            self._buffer = []
+        sys.stdout.flush()
+        self._last_flush = time.monotonic()
+
+
+def get_flush_interval(config):
+    # Get `output_flush_interval` value from config.
+    config_flush_interval = config.get('output_flush_interval')
+
+    # if config output_flush_interval is other than 0,"0" or "" then use it
+    if config_flush_interval and float(config_flush_interval):
+        return float(config_flush_interval)
+    return OUTPUT_FLUSH_INTERVAL
+
+
+_record_writer = RecordWriter()
+
+
+def configure(config):
+    global _record_writer # pylint: disable=global-statement
+    _record_writer.flush()
+    _record_writer = RecordWriter(
+        utils.get_positive_int(config, 'output_batch_size', OUTPUT_BATCH_SIZE),
+        get_flush_interval(config))
+
+
+def write_record(stream_name, record):
+    _record_writer.write_record(stream_name, record)
+
+
+def flush():
+    _record_writer.flush()
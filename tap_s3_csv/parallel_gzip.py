@@ -0,0 +1,219 @@
+"""
+Decompresses gzip files with more than one thread, so that downloading,
+inflating and parsing a large gz file overlap instead of taking turns on
+one core.
+
+BGZF files (blocked gzip, as written by bgzip) are a series of small gzip
+members that each record their compressed size in their header, so their
+members are found without inflating them and are inflated concurrently. The
+members of other gzip files can only be found by inflating them, so they're
+inflated by a single thread, ahead of the thread reading the decompressed
+data.
+"""
+import io
+import queue
+import struct
+import threading
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor
+
+# Compressed bytes are read from the object in chunks of this size, and
+# decompressed bytes are handed to the reading thread in chunks of at most
+# this size
+CHUNK_SIZE = 1024 * 1024
+
+# The number of chunks each thread of the pipeline can get ahead of the next
+# one. BGZF blocks are inflated up to this many per thread ahead of the reader
+QUEUE_SIZE = 16
+
+# ID1 ID2 CM FLG MTIME XFL OS XLEN, then the BC subfield: SI1 SI2 SLEN BSIZE
+BGZF_HEADER_SIZE = 18
+
+# Lets zlib parse the gzip header and check the CRC of each member
+GZIP_WBITS = zlib.MAX_WBITS | 16
+
+
+def is_bgzf(header):
+    """Returns whether `header`, the first bytes of a gzip member, is the
+    header of a BGZF block."""
+    return len(header) >= BGZF_HEADER_SIZE and \
+        header[:4] == b'\x1f\x8b\x08\x04' and header[12:16] == b'BC\x02\x00'
+
+
+def get_bgzf_block_size(header):
+    # BSIZE is the size of the whole block minus 1
+    return struct.unpack('<H', header[16:18])[0] + 1
+
+
+def split_bgzf_blocks(chunks):
+    """Yields the BGZF blocks, each a complete gzip member, of the
+    compressed `chunks`."""
+    buffer = bytearray()
+    for chunk in chunks:
+        buffer += chunk
+        while len(buffer) >= BGZF_HEADER_SIZE:
+            if buffer[0] == 0:
+                # Padding, see inflate_members()
+                del buffer[:len(buffer) - len(buffer.lstrip(b'\x00'))]
+                continue
+            if not is_bgzf(buffer[:BGZF_HEADER_SIZE]):
+                raise OSError('Not a BGZF block')
+            block_size = get_bgzf_block_size(buffer)
+            if len(buffer) < block_size:
+                break
+            yield bytes(buffer[:block_size])
+            del buffer[:block_size]
+    if buffer.lstrip(b'\x00'):
+        raise EOFError('Compressed file ended before the end-of-stream marker was reached')
+
+
+def inflate_members(chunks):
+    """Yields the decompressed bytes of the gzip members in the compressed
+    `chunks`, at most CHUNK_SIZE bytes at a time."""
+    decompressor = zlib.decompressobj(GZIP_WBITS)
+    member_started = False
+    for chunk in chunks:
+        while True:
+            if not member_started:
+                # Like gzip.GzipFile, skip the zeroes a gzip file can be padded with
+                chunk = chunk.lstrip(b'\x00')
+                if not chunk:
+                    break
+                member_started = True
+            data = decompressor.decompress(chunk, CHUNK_SIZE)
+            if data:
+                yield data
+            if decompressor.eof:
+                # Another member can start right after this one
+                chunk = decompressor.unused_data
+                decompressor = zlib.decompressobj(GZIP_WBITS)
+                member_started = False
+            else:
+                chunk = decompressor.unconsumed_tail
+                # A full chunk of output can leave more of it pending in zlib
+                if not chunk and len(data) < CHUNK_SIZE:
+                    break
+    if member_started:
+        raise EOFError('Compressed file ended before the end-of-stream marker was reached')
+
+
+class ParallelGzipReader(io.RawIOBase):
+    """
+    A raw file object with the decompressed bytes of the gzip stream
+    `fileobj`. One thread reads `fileobj` and another inflates it, or, for
+    BGZF files, splits it into blocks inflated by `threads` threads. Each
+    thread gets at most QUEUE_SIZE chunks ahead of the next, so memory use
+    is bounded however far behind the reader is.
+
+    Use open_gzip_file() to get a buffered reader, which can be iterated
+    line by line.
+    """
+
+    def __init__(self, fileobj, threads):
+        super().__init__()
+        self._fileobj = fileobj
+        self._compressed = queue.Queue(QUEUE_SIZE)
+        self._decompressed = queue.Queue(QUEUE_SIZE * threads)
+        self._executor = ThreadPoolExecutor(max_workers=threads)
+        self._stopped = threading.Event()
+        self._data = memoryview(b'')
+        self._eof = False
+
+        for target in [self._download, self._inflate]:
+            threading.Thread(target=target, daemon=True).start()
+
+    def _put(self, items, item):
+        # Gives up once the reader is closed, so that the threads don't wait
+        # forever for it to read what they're ahead by
+        while not self._stopped.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _get_compressed_chunks(self):
+        while not self._stopped.is_set():
+            try:
+                chunk = self._compressed.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if isinstance(chunk, Exception):
+                raise chunk
+            if not chunk:
+                return
+            yield chunk
+
+    def _download(self):
+        try:
+            while True:
+                chunk = self._fileobj.read(CHUNK_SIZE)
+                if not self._put(self._compressed, chunk) or not chunk:
+                    return
+        except Exception as err:
+            self._put(self._compressed, err)
+
+    def _inflate(self):
+        try:
+            chunks = self._get_compressed_chunks()
+            first_chunk = b''
+            for chunk in chunks:
+                first_chunk += chunk
+                if len(first_chunk) >= BGZF_HEADER_SIZE:
+                    break
+            chunks = _prepend(first_chunk, chunks)
+
+            if is_bgzf(first_chunk[:BGZF_HEADER_SIZE]):
+                for block in split_bgzf_blocks(chunks):
+                    if not self._put(self._decompressed, self._executor.submit(zlib.decompress, block, GZIP_WBITS)):
+                        return
+            else:
+                for data in inflate_members(chunks):
+                    if not self._put(self._decompressed, data):
+                        return
+            self._put(self._decompressed, None)
+        except Exception as err:
+            self._put(self._decompressed, err)
+        finally:
+            # The blocks already submitted are still inflated
+            self._executor.shutdown(wait=False)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._data:
+            if self._eof:
+                return 0
+            item = self._decompressed.get()
+            if item is None:
+                self._eof = True
+                return 0
+            if isinstance(item, Exception):
+                raise item
+            if isinstance(item, Future):
+                item = item.result()
+            self._data = memoryview(item)
+
+        size = min(len(buffer), len(self._data))
+        buffer[:size] = self._data[:size]
+        self._data = self._data[size:]
+        return size
+
+    def close(self):
+        self._stopped.set()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        super().close()
+
+
+def _prepend(first_chunk, chunks):
+    if first_chunk:
+        yield first_chunk
+    yield from chunks
+
+
+def open_gzip_file(fileobj, threads):
+    """Returns a buffered file object with the decompressed bytes of the gzip
+    stream `fileobj`, see ParallelGzipReader."""
+    return io.BufferedReader(ParallelGzipReader(fileobj, threads), buffer_size=CHUNK_SIZE)
@@ -1,11 +1,15 @@
+# pylint: disable=too-many-lines
 import asyncio
+import contextlib
 import itertools
 import functools
+import random
 import re
 import io
 import json
-import gzip
 import sys
+import threading
+import zipfile
 import backoff
 import boto3
 from s3fs import S3FileSystem
@@ -34,13 +38,16 @@ import singer
 import singer.schema_generation as schema
 from singer_encodings import (
     avro,
-    compression,
     csv,
     jsonl,
     parquet
 )
 
+from tap_s3_csv import file_schema
+from tap_s3_csv import sampling
 from tap_s3_csv import utils
+from tap_s3_csv.schema_cache import SchemaCache
+from tap_s3_csv.shared_listing import SharedListing
 
 fs = None
 
@@ -51,10 +58,40 @@ SDC_SOURCE_FILE_COLUMN = "_sdc_source_file"
 SDC_SOURCE_LINENO_COLUMN = "_sdc_source_lineno"
 SDC_EXTRA_COLUMN = "_sdc_extra"
 skipped_files_count = 0
+# Files can be skipped by the threads syncing or sampling files concurrently
+_skipped_files_count_lock = threading.Lock()
+# The number of files skipped by each thread, see get_thread_skipped_files_count()
+_thread_skipped_files = threading.local()
 
 # timeout request after 300 seconds
 REQUEST_TIMEOUT = 300
 
+# Sampled files are opened one at a time unless `sample_prefetch_files` is configured
+SAMPLE_PREFETCH_FILES = 1
+
+# Prefixes are listed with a single paginator unless `list_concurrency` is configured
+LIST_CONCURRENCY = 1
+
+# The literal prefixes derived from a search_pattern are listed this many at
+# a time, unless their listings are sharded
+PREFIX_LIST_CONCURRENCY = 4
+
+# Each shard or prefix listed concurrently is listed at most this many pages
+# ahead of the objects being consumed
+LIST_QUEUE_PAGES = 4
+
+# The number of objects in each page of a listing
+LIST_PAGE_SIZE = 1000
+
+# botocore's default connection pool size
+MAX_POOL_CONNECTIONS = 10
+
+# boto3 clients are thread-safe and keep their endpoint resolution and
+# connection pool between calls, so listing, sampling and sync share one
+# client per timeout/pool size instead of building one per request.
+_s3_clients = {}
+_s3_clients_lock = threading.Lock()
+
 def is_access_denied_error(error):
     """
         This function checks whether the URLError contains 'Access Denied' substring
@@ -141,6 +178,7 @@ def setup_aws_client(config):
 
     LOGGER.info("Attempting to assume_role on RoleArn: %s", role_arn)
     boto3.setup_default_session(botocore_session=refreshable_session)
+    clear_s3_clients()
 
 @retry_pattern
 def setup_aws_client_with_proxy(config):
@@ -192,6 +230,7 @@ def setup_aws_client_with_proxy(config):
 
     LOGGER.info("Attempting to assume_role on RoleArn: %s", cust_role_arn)
     boto3.setup_default_session(botocore_session=refreshable_session_cust)
+    clear_s3_clients()
 
 #pylint: disable=global-statement
 @retry_pattern
@@ -275,16 +314,37 @@ def setup_s3fs_client_with_proxy(config):
     fs = S3FileSystem(session=refreshable_session_cust)
 
 
+#pylint: disable=global-statement
+def increment_skipped_files_count(count=1):
+    global skipped_files_count
+    with _skipped_files_count_lock:
+        skipped_files_count = skipped_files_count + count
+    _thread_skipped_files.count = get_thread_skipped_files_count() + count
+
+
+def get_thread_skipped_files_count():
+    return getattr(_thread_skipped_files, 'count', 0)
+
+
 def get_sampled_schema_for_table(config, table_spec):
     LOGGER.info('Sampling records to determine table schema.')
 
-    s3_files_gen = get_input_files_for_table(config, table_spec)
-    samples = [sample for sample in sample_files(config, table_spec, s3_files_gen)]
+    # Sampling usually stops after the first files, before a sharded
+    # listing would pay off
+    s3_files_gen = get_input_files_for_table(config, table_spec, sharded=False)
+    if config.get('schema_cache_path'):
+        samples_count, observations = sample_files_with_cache(
+            config, table_spec, s3_files_gen, SchemaCache(config['schema_cache_path']))
+    else:
+        samples_count, observations = 0, {}
+        for sample in sample_files(config, table_spec, s3_files_gen):
+            file_schema.add_observations(observations, [], sample)
+            samples_count += 1
 
     if skipped_files_count:
         LOGGER.warning("%s files got skipped during the last sampling.",skipped_files_count)
 
-    if not samples:
+    if not samples_count:
         #Return empty properties for accept everything from data if no samples found
         LOGGER.info("No samples found, returning empty props")
         return {
@@ -302,7 +362,7 @@ def get_sampled_schema_for_table(config, table_spec):
         }
     }
 
-    data_schema = schema.generate_schema(samples)
+    data_schema = schema.to_json_schema(observations)
     for key in data_schema.get('properties', {}):
         if key in table_spec.get('date_overrides', []):
             data_schema['properties'][key] = update_schema_to_be_a_date(data_schema['properties'][key])
@@ -424,46 +484,110 @@ def check_key_properties_and_date_overrides_for_jsonl_file(table_spec, jsonl_sam
             raise Exception('JSONL file "{}" is missing date_overrides key: {}'
                             .format(s3_path, date_overrides - all_keys))
 
-#pylint: disable=global-statement
-def sampling_gz_file(table_spec, s3_path, file_handle, sample_rate, max_records=1000):
-    global skipped_files_count
-    if s3_path.endswith(".tar.gz"):
-        LOGGER.warning('Skipping "%s" file as .tar.gz extension is not supported',s3_path)
-        skipped_files_count = skipped_files_count + 1
-        return []
+def get_checked_jsonl_records(table_spec, s3_path, records, max_records):
+    """
+    Yields up to `max_records` sampled records of a JSONL file and checks them
+    with check_key_properties_and_date_overrides_for_jsonl_file(), keeping
+    only their keys instead of every record. The last record is yielded once
+    they're checked, as the caller stops reading after `max_records`.
+    """
+
+    # A record with every key of the sampled records
+    all_keys = {}
+    last_record = None
+    for record in itertools.islice(records, max_records):
+        if last_record is not None:
+            yield last_record
+        all_keys.update(dict.fromkeys(record))
+        last_record = record
 
-    file_bytes = file_handle.read()
-    gz_file_obj = gzip.GzipFile(fileobj=io.BytesIO(file_bytes))
+    if last_record is None:
+        LOGGER.warning('Skipping "%s" file as it is empty', s3_path)
+        increment_skipped_files_count()
+    check_key_properties_and_date_overrides_for_jsonl_file(table_spec, [all_keys], s3_path)
+
+    if last_record is not None:
+        yield last_record
+
+def sampling_gz_file(table_spec, s3_path, file_handle, sample_rate, max_records=1000):
+    if s3_path.lower().endswith(".tar.gz"):
+        return sampling_tar_file(table_spec, s3_path, file_handle, sample_rate, max_records)
 
     try:
-        gz_file_name = utils.get_file_name_from_gzfile(fileobj=io.BytesIO(file_bytes))
+        gz_file_name, gz_file_obj = utils.open_gz_file(file_handle, default_name=s3_path.split("/")[-1][:-len(".gz")])
     except AttributeError as err:
         # If a file is compressed using gzip command with --no-name attribute,
         # It will not return the file name and timestamp. Hence we will skip such files.
         # We also seen this issue occur when tar is used to compress the file
         LOGGER.warning('Skipping "%s" file as we did not get the original file name',s3_path)
-        skipped_files_count = skipped_files_count + 1
+        increment_skipped_files_count()
         return []
 
     if gz_file_name:
-        if gz_file_name.endswith(".gz"):
-            LOGGER.warning('Skipping "%s" file as it contains nested compression.',s3_path)
-            skipped_files_count = skipped_files_count + 1
-            return []
-
-        gz_file_extension = gz_file_name.split(".")[-1].lower()
-        return sample_file(table_spec, s3_path + "/" + gz_file_name, io.BytesIO(gz_file_obj.read()), sample_rate, gz_file_extension, max_records)
+        return sample_decompressed_file(table_spec, s3_path, gz_file_name, gz_file_obj, sample_rate, max_records)
 
     raise Exception('"{}" file has some error(s)'.format(s3_path))
 
-#pylint: disable=global-statement,too-many-arguments
+#pylint: disable=too-many-arguments
+def sampling_compressed_stream_file(table_spec, s3_path, file_handle, sample_rate, extension, max_records=1000):
+    """
+    Samples a bz2, xz or zst file, decompressing it as it's read. The name of
+    the decompressed file is that of the file without the compression
+    extension, see sync.sync_compressed_stream_file().
+    """
+    if not utils.is_supported_compression(extension):
+        LOGGER.warning('Skipping "%s" file as the zstandard package is not installed.',s3_path)
+        increment_skipped_files_count()
+        return []
+
+    file_name = s3_path.split("/")[-1][:-len(extension) - 1]
+    if "." not in file_name:
+        LOGGER.warning('"%s" without extension will not be sampled.',s3_path)
+        increment_skipped_files_count()
+        return []
+
+    decompressed_file_obj = utils.open_compressed_file(file_handle, extension)
+    return sample_decompressed_file(table_spec, s3_path, file_name, decompressed_file_obj, sample_rate, max_records)
+
+#pylint: disable=too-many-arguments
+def sample_decompressed_file(table_spec, s3_path, file_name, file_obj, sample_rate, max_records=1000):
+    """
+    Samples the file `file_name` decompressed from the gz, bz2, xz or zst
+    file `s3_path` as `file_obj`, by the extension of `file_name`.
+    """
+    file_extension = file_name.split(".")[-1].lower()
+    if file_extension in ["gz"] + utils.COMPRESSION_EXTENSIONS:
+        LOGGER.warning('Skipping "%s" file as it contains nested compression.',s3_path)
+        increment_skipped_files_count()
+        return []
+
+    if file_extension == "parquet":
+        # Parquet needs random access, which the decompressed stream can't provide
+        file_obj = utils.spool_to_tempfile(file_obj)
+    return sample_file(table_spec, s3_path + "/" + file_name, file_obj, sample_rate, file_extension, max_records)
+
+def sampling_tar_file(table_spec, s3_path, file_handle, sample_rate, max_records=1000):
+    """
+    Samples the supported members of a tar file, compressed or not, one after
+    the other as they're read from its stream. The archive is sampled as one
+    file, so `max_records` is shared by its members.
+    """
+    for member_name, member_file in utils.get_tar_members(file_handle):
+        extension = member_name.split(".")[-1].lower()
+        if extension not in ["csv", "gz", "jsonl", "txt", "parquet", "avro"] + utils.COMPRESSION_EXTENSIONS or member_name.lower().endswith(".tar.gz"):
+            continue
+        if extension == "parquet":
+            # Parquet needs random access, which the tar stream can't provide
+            member_file = utils.spool_to_tempfile(member_file)
+        yield from sample_file(table_spec, s3_path + "/" + member_name, member_file, sample_rate, extension, max_records)
+
+#pylint: disable=too-many-arguments,too-many-branches
 def sample_file(table_spec, s3_path, file_handle, sample_rate, extension, max_records=1000):
-    global skipped_files_count
 
     # Check whether file is without extension or not
     if not extension or s3_path.lower() == extension:
         LOGGER.warning('"%s" without extension will not be sampled.',s3_path)
-        skipped_files_count = skipped_files_count + 1
+        increment_skipped_files_count()
         return []
     if extension in ["csv", "txt"]:
         # If file object read from s3 bucket file else use extracted file object from zip or gz
@@ -474,51 +598,51 @@ def sample_file(table_spec, s3_path, file_handle, sample_rate, extension, max_re
             csv_records = get_records_for_csv(s3_path, sample_rate, iterator)
         else:
             LOGGER.warning('Skipping "%s" file as it is empty',s3_path)
-            skipped_files_count = skipped_files_count + 1
+            increment_skipped_files_count()
         return csv_records
     if extension == "gz":
         return sampling_gz_file(table_spec, s3_path, file_handle, sample_rate, max_records)
+    if extension in ["tar", "tgz"]:
+        return sampling_tar_file(table_spec, s3_path, file_handle, sample_rate, max_records)
+    if extension in utils.COMPRESSION_EXTENSIONS:
+        return sampling_compressed_stream_file(table_spec, s3_path, file_handle, sample_rate, extension, max_records)
     if extension == "jsonl":
         # If file object read from s3 bucket file else use extracted file object from zip or gz
         file_handle = file_handle._raw_stream if hasattr(file_handle, "_raw_stream") else file_handle
         records = get_records_for_iterator(
             s3_path, sample_rate, jsonl.get_row_iterator(file_handle))
-        check_jsonl_sample_records, records = itertools.tee(
-            records)
-        jsonl_sample_records = list(check_jsonl_sample_records)
-        if len(jsonl_sample_records) == 0:
-            LOGGER.warning('Skipping "%s" file as it is empty', s3_path)
-            skipped_files_count = skipped_files_count + 1
-        check_key_properties_and_date_overrides_for_jsonl_file(
-            table_spec, jsonl_sample_records, s3_path)
-
-        return records
+        return get_checked_jsonl_records(table_spec, s3_path, records, max_records)
 
     if extension == "parquet":
         if parquet.is_empty(file_handle):
             LOGGER.warning('Skipping "%s" file as it is empty',s3_path)
-            skipped_files_count = skipped_files_count + 1
+            increment_skipped_files_count()
             return []
+        if table_spec.get('schema_from_metadata'):
+            LOGGER.info('Using the schema in the footer of "%s"', s3_path)
+            return file_schema.get_parquet_prototype_records(file_handle)
         return get_records_for_parquet(s3_path, sample_rate, max_records, file_handle)
 
     if extension == "avro":
+        if table_spec.get('schema_from_metadata'):
+            LOGGER.info('Using the schema in the header of "%s"', s3_path)
+            return file_schema.get_avro_prototype_records(file_handle)
         iterator = avro.get_row_iterator(file_handle)
         if iterator is not None:
             return get_records_for_iterator(s3_path, sample_rate, iterator)
         LOGGER.warning('Skipping "%s" file as it is empty',s3_path)
-        skipped_files_count = skipped_files_count + 1
+        increment_skipped_files_count()
         return []
 
     if extension == "zip":
         LOGGER.warning('Skipping "%s" file as it contains nested compression.',s3_path)
-        skipped_files_count = skipped_files_count + 1
+        increment_skipped_files_count()
         return []
     LOGGER.warning('"%s" having the ".%s" extension will not be sampled.',s3_path,extension)
-    skipped_files_count = skipped_files_count + 1
+    increment_skipped_files_count()
     return []
 
-#pylint: disable=global-statement
-def get_files_to_sample(config, s3_files, max_files):
+def get_files_to_sample(config, s3_files, max_files, zip_files=None):
     """
     Returns the list of files for sampling, it checks the s3_files whether any zip or gz file exists or not
     if exists then extract if and append in the list of files
@@ -526,17 +650,25 @@ def get_files_to_sample(config, s3_files, max_files):
     Args:
         config dict(): Configuration
         s3_files list(): List of S3 Bucket files
+        max_files int(): Maximum number of files returned
+        zip_files ExitStack(): Closes the zip files whose members are returned, once they're sampled
     Returns:
         list(dict()) : List of Files for sampling
              |_ s3_path str(): S3 Bucket File path
-             |_ file_handle StreamingBody(): file object
+             |_ file_handle StreamingBody(): file object (for extracted files only)
+             |_ open_file_handle function(): opens the file object (for normal files only)
              |_ type str(): Type of file which is used for extracted file
              |_ extension str(): extension of file (for normal files only)
     """
-    global skipped_files_count
     sampled_files = []
+    if zip_files is None:
+        # The zip files are left to be closed once they're garbage collected
+        zip_files = contextlib.ExitStack()
+
+    OTHER_FILES = ["csv","gz","jsonl","txt","parquet","avro"] + utils.COMPRESSION_EXTENSIONS
 
-    OTHER_FILES = ["csv","gz","jsonl","txt","parquet","avro"]
+    sample_max_bytes = utils.get_positive_int(config, 'sample_max_bytes', None)
+    sample_random_ranges = utils.get_positive_int(config, 'sample_random_ranges', 0)
 
     for s3_file in s3_files:
         file_key = s3_file.get('key')
@@ -547,83 +679,189 @@ def get_files_to_sample(config, s3_files, max_files):
         if file_key:
             file_name = file_key.split("/").pop()
             extension = file_name.split(".").pop().lower()
-            file_handle = None
+            # Files are only opened right before they're sampled, see sample_files()
             if extension in ['parquet', 'avro']:
-                file_handle = get_s3fs_file_handle(config, file_key)
+                open_file_handle = functools.partial(get_s3fs_file_handle, config, file_key)
+            elif extension in ['csv', 'txt', 'jsonl'] and sample_max_bytes:
+                # Ranges at random offsets would start in the middle of a quoted CSV field
+                random_ranges = sample_random_ranges if extension == 'jsonl' else 0
+                open_file_handle = functools.partial(get_sample_file_handle, config, file_key, sample_max_bytes, random_ranges)
             else:
-                file_handle = get_file_handle(config, file_key)
+                open_file_handle = functools.partial(get_file_handle, config, file_key)
 
             # Check whether file is without extension or not
             if not extension or file_name.lower() == extension:
                 LOGGER.warning('"%s" without extension will not be sampled.',file_key)
-                skipped_files_count = skipped_files_count + 1
-            elif file_key.endswith(".tar.gz"):
-                LOGGER.warning('Skipping "%s" file as .tar.gz extension is not supported', file_key)
-                skipped_files_count = skipped_files_count + 1
+                increment_skipped_files_count()
             elif extension == "zip":
-                files = compression.infer(io.BytesIO(file_handle.read()), file_name)
+                # The members of a zip file are only known once its central directory is read
+                zip_file = zip_files.enter_context(open_zip_file(config, file_key))
+
+                # Open only those extracted files which are supported by tap, up to max_files
+                files = get_zip_members(zip_file, lambda name: name.split(".")[-1].lower() in OTHER_FILES
+                                        and not name.endswith(".tar.gz"))
 
-                # Add only those extracted files which are supported by tap
                 # Prepare dictionary contains the zip file name, type i.e. unzipped and file object of extracted file
-                sampled_files.extend([{ "type" : "unzipped", "s3_path" : file_key, "file_handle" : de_file } for de_file in files if de_file.name.split(".")[-1].lower() in OTHER_FILES and not de_file.name.endswith(".tar.gz") ])
-            elif extension in OTHER_FILES:
-                # Prepare dictionary contains the s3 file path, extension of file and file object
-                sampled_files.append({ "s3_path" : file_key , "file_handle" : file_handle, "extension" : extension })
+                sampled_files.extend([{ "type" : "unzipped", "s3_path" : file_key, "file_handle" : de_file }
+                                      for de_file in itertools.islice(files, max_files - len(sampled_files))])
+            elif extension in OTHER_FILES or extension in ["tar", "tgz"]:
+                # Tar files are sampled as one file, as their members can only be read in order
+                # Prepare dictionary contains the s3 file path, extension of file and the function opening it
+                sampled_files.append({ "s3_path" : file_key , "open_file_handle" : open_file_handle, "extension" : extension })
             else:
                 LOGGER.warning('"%s" having the ".%s" extension will not be sampled.',file_key,extension)
-                skipped_files_count = skipped_files_count + 1
+                increment_skipped_files_count()
 
     return sampled_files
 
 
-# pylint: disable=too-many-arguments,global-statement
+# pylint: disable=too-many-arguments
 def sample_files(config, table_spec, s3_files,
-                 sample_rate=5, max_records=1000, max_files=5):
-    global skipped_files_count
+                 sample_rate=None, max_records=None, max_files=None):
+    sample_rate, max_records, max_files = sampling.get_sampling_parameters(
+        table_spec, sample_rate, max_records, max_files)
     LOGGER.info("Sampling files (max files: %s)", max_files)
 
-    for s3_file in itertools.islice(get_files_to_sample(config, s3_files, max_files), max_files):
-
-
-        s3_path = s3_file.get("s3_path","")
-        file_handle = s3_file.get("file_handle")
-        file_type = s3_file.get("type")
-        extension = s3_file.get("extension")
-
-        # Check whether the file is extracted from zip file.
-        if file_type and file_type == "unzipped":
-            # Append the extracted file name with zip file.
-            s3_path += "/" + file_handle.name
-            extension = file_handle.name.split(".")[-1].lower()
-
-        LOGGER.info('Sampling %s (max records: %s, sample rate: %s)',
-                    s3_path,
-                    max_records,
-                    sample_rate)
-        try:
-            yield from itertools.islice(sample_file(table_spec, s3_path, file_handle, sample_rate, extension, max_records), max_records)
-        except (UnicodeDecodeError,json.decoder.JSONDecodeError):
-            # UnicodeDecodeError will be raised if non csv file parsed to csv parser
-            # JSONDecodeError will be reaised if non JSONL file parsed to JSON parser
-            # Handled both error and skipping file with wrong extension.
-            LOGGER.warn("Skipping %s file as parsing failed. Verify an extension of the file.",s3_path)
-            skipped_files_count = skipped_files_count + 1
-        finally:
-            # Explicitly release the file handle once sampling is done so the
-            # underlying S3/S3FS connection and read buffers aren't held open
-            # for the entire discovery run (get_files_to_sample keeps every
-            # sampled file's handle alive in a list until this generator
-            # finishes, so relying on refcounting alone doesn't free them
-            # incrementally as each file is processed).
-            if hasattr(file_handle, "close"):
-                try:
-                    file_handle.close()
-                except Exception: #pylint:disable=broad-except
-                    LOGGER.debug('Could not close file handle for "%s"', s3_path)
+    s3_files = sampling.order_files_to_sample(s3_files, table_spec)
+    # The zip files whose members are sampled are closed once sampling is done
+    with contextlib.ExitStack() as zip_files:
+        files_to_sample = itertools.islice(get_files_to_sample(config, s3_files, max_files, zip_files), max_files)
+        sample_prefetch_files = utils.get_positive_int(config, 'sample_prefetch_files', SAMPLE_PREFETCH_FILES)
+        if sample_prefetch_files > 1:
+            # Opens the next files while the current one is sampled, and closes
+            # those left unsampled once sampling stops
+            files_to_sample = zip_files.enter_context(contextlib.closing(
+                sampling.prefetch_files_to_sample(files_to_sample, sample_prefetch_files)))
+
+        stability, observations = sampling.SchemaStability(table_spec.get('sample_stable_files')), {}
+        for s3_file in files_to_sample:
+            file_observations = {}
+            for record in sample_file_to_sample(table_spec, s3_file, sample_rate, max_records):
+                if stability.stable_files:
+                    file_schema.add_observations(file_observations, [], record)
+                yield record
+
+            stability.add_file(observations, file_observations)
+            if stability.is_stable:
+                LOGGER.info("Schema unchanged by the last %s sampled files, sampling stopped.", stability.stable_files)
+                break
+
+
+def sample_file_to_sample(table_spec, s3_file, sample_rate, max_records):
+    """
+    Samples one of the files returned by get_files_to_sample() and closes its
+    file handle.
+    """
 
-#pylint: disable=global-statement
-def get_input_files_for_table(config, table_spec, modified_since=None):
-    global skipped_files_count
+    s3_file = sampling.open_file_to_sample(s3_file)
+    s3_path = s3_file.get("s3_path","")
+    file_handle = s3_file.get("file_handle")
+    file_type = s3_file.get("type")
+    extension = s3_file.get("extension")
+
+    # Check whether the file is extracted from zip file.
+    if file_type and file_type == "unzipped":
+        # Append the extracted file name with zip file.
+        s3_path += "/" + file_handle.name
+        extension = file_handle.name.split(".")[-1].lower()
+
+    LOGGER.info('Sampling %s (max records: %s, sample rate: %s)',
+                s3_path,
+                max_records,
+                sample_rate)
+    try:
+        yield from itertools.islice(sample_file(table_spec, s3_path, file_handle, sample_rate, extension, max_records), max_records)
+    except (UnicodeDecodeError,json.decoder.JSONDecodeError):
+        # UnicodeDecodeError will be raised if non csv file parsed to csv parser
+        # JSONDecodeError will be reaised if non JSONL file parsed to JSON parser
+        # Handled both error and skipping file with wrong extension.
+        LOGGER.warn("Skipping %s file as parsing failed. Verify an extension of the file.",s3_path)
+        increment_skipped_files_count()
+    finally:
+        # Explicitly release the file handle once sampling is done so the
+        # underlying S3/S3FS connection and read buffers aren't held open
+        # for the entire discovery run (get_files_to_sample keeps every
+        # sampled file's handle alive in a list until this generator
+        # finishes, so relying on refcounting alone doesn't free them
+        # incrementally as each file is processed).
+        if hasattr(file_handle, "close"):
+            try:
+                file_handle.close()
+            except Exception: #pylint:disable=broad-except
+                LOGGER.debug('Could not close file handle for "%s"', s3_path)
+
+
+# pylint: disable=too-many-arguments
+def sample_files_with_cache(config, table_spec, s3_files, cache,
+                            sample_rate=None, max_records=None, max_files=None):
+    """
+    Samples files like sample_files(), but returns the number of sampled
+    records and their observations (see file_schema.add_observations), and only
+    downloads the files whose observations aren't in `cache` yet.
+    """
+    sample_rate, max_records, max_files = sampling.get_sampling_parameters(
+        table_spec, sample_rate, max_records, max_files)
+    LOGGER.info("Sampling files (max files: %s)", max_files)
+
+    sampling_parameters = {'bucket': config['bucket'],
+                           'delimiter': table_spec.get('delimiter'),
+                           'schema_from_metadata': bool(table_spec.get('schema_from_metadata')),
+                           'sample_rate': sample_rate,
+                           'max_records': max_records,
+                           'max_files': max_files,
+                           'sample_max_bytes': config.get('sample_max_bytes'),
+                           'sample_random_ranges': config.get('sample_random_ranges'),
+                           # Sampled JSONL files are checked for these fields
+                           'key_properties': table_spec.get('key_properties'),
+                           'date_overrides': table_spec.get('date_overrides')}
+    records_count = 0
+    observations = {}
+    files_count = 0
+    stability = sampling.SchemaStability(table_spec.get('sample_stable_files'))
+
+    for s3_file in sampling.order_files_to_sample(s3_files, table_spec):
+        if files_count >= max_files or stability.is_stable:
+            break
+
+        # A zip file is sampled as one file per supported member
+        entry = cache.get(s3_file, sampling_parameters)
+        if entry is None:
+            # Files are sampled by this thread, so the files it skips are those of `s3_file`
+            skipped_files_before = get_thread_skipped_files_count()
+            sampled_files = []
+            with contextlib.ExitStack() as zip_files:
+                for file_to_sample in get_files_to_sample(config, [s3_file], max_files, zip_files):
+                    file_observations = {}
+                    file_records_count = 0
+                    for record in sample_file_to_sample(table_spec, file_to_sample, sample_rate, max_records):
+                        file_schema.add_observations(file_observations, [], record)
+                        file_records_count += 1
+                    sampled_files.append({'records_count': file_records_count, 'observations': file_observations})
+            entry = {'sampled_files': sampled_files,
+                     'skipped_files_count': get_thread_skipped_files_count() - skipped_files_before}
+            cache.put(s3_file, sampling_parameters, entry)
+        else:
+            LOGGER.info('Using the cached samples of "%s"', s3_file['key'])
+            # Counted as if the file had been sampled again
+            increment_skipped_files_count(entry['skipped_files_count'])
+
+        for sampled_file in entry['sampled_files'][:max_files - files_count]:
+            if stability.is_stable:
+                break
+            records_count += sampled_file['records_count']
+            stability.add_file(observations, sampled_file['observations'])
+            files_count += 1
+
+    return records_count, observations
+
+
+def get_input_files_for_table(config, table_spec, modified_since=None, synced_keys=None, sharded=True):
+    """
+    Yields the files of a table modified after `modified_since`. If the keys
+    of the files already synced at `modified_since` are given as
+    `synced_keys`, the other files modified at `modified_since` are yielded too.
+    Pass `sharded=False` when only the first files will be consumed.
+    """
     bucket = config['bucket']
 
     to_return = []
@@ -641,26 +879,36 @@ def get_input_files_for_table(config, table_spec, modified_since=None):
     LOGGER.info(
         'Checking bucket "%s" for keys matching "%s"', bucket, pattern)
 
+    search_prefixes = [table_spec.get('search_prefix')]
+    if search_prefixes[0] is None:
+        # Without a search_prefix the whole bucket would be listed, so list
+        # only the literal prefixes that the pattern is anchored to, if any.
+        search_prefixes = utils.get_literal_prefixes(pattern) or search_prefixes
+        if search_prefixes[0] is not None:
+            LOGGER.info('Listing prefixes %s derived from the search_pattern', search_prefixes)
+
     matched_files_count = 0
     unmatched_files_count = 0
     max_files_before_log = 30000
-    for s3_object in list_files_in_bucket(config, table_spec.get('search_prefix')):
+    for s3_object in list_files_in_prefixes(config, search_prefixes, sharded):
         key = s3_object['Key']
         last_modified = s3_object['LastModified']
 
         if s3_object['Size'] == 0:
             LOGGER.warning('Skipping matched file "%s" as it is empty', key)
-            skipped_files_count = skipped_files_count + 1
+            increment_skipped_files_count()
             unmatched_files_count += 1
             continue
 
         if matcher.search(key):
             matched_files_count += 1
-            if modified_since is None or modified_since < last_modified:
+            if modified_since is None or modified_since < last_modified or \
+               (synced_keys is not None and modified_since == last_modified and key not in synced_keys):
                 LOGGER.info('Will download key "%s" as it was last modified %s',
                             key,
                             last_modified)
-                yield {'key': key, 'last_modified': last_modified}
+                yield {'key': key, 'last_modified': last_modified,
+                       'etag': s3_object.get('ETag'), 'size': s3_object['Size']}
         else:
             unmatched_files_count += 1
 
@@ -690,17 +938,94 @@ def get_request_timeout(config):
         request_timeout = REQUEST_TIMEOUT
     return request_timeout
 
-@retry_pattern
-def list_files_in_bucket(config, search_prefix=None):
-    # Set connect and read timeout for resource
+def get_s3_client(config):
+    # Set connect and read timeout and the connection pool size for the client
     timeout = get_request_timeout(config)
-    client_config = Config(connect_timeout=timeout,  read_timeout=timeout)
-    s3_client = boto3.client('s3', config=client_config)
+    max_pool_connections = utils.get_positive_int(config, 'max_pool_connections', MAX_POOL_CONNECTIONS)
+    client_key = (timeout, max_pool_connections)
+
+    with _s3_clients_lock:
+        if client_key not in _s3_clients:
+            client_config = Config(connect_timeout=timeout,
+                                   read_timeout=timeout,
+                                   max_pool_connections=max_pool_connections)
+            _s3_clients[client_key] = boto3.client('s3', config=client_config)
+        return _s3_clients[client_key]
+
+def clear_s3_clients():
+    # Clients keep the credentials of the session they were created from, so
+    # they have to be rebuilt once the default session changes.
+    with _s3_clients_lock:
+        _s3_clients.clear()
+
+@retry_pattern
+def list_files_in_bucket(config, search_prefix=None, sharded=True):
+    """Yields the objects under `search_prefix`. Unless `sharded` is False,
+    the prefix is listed in shards when `list_concurrency` is configured,
+    which only pays off when the whole listing is consumed."""
+    s3_client = get_s3_client(config)
 
     s3_object_count = 0
 
-    max_results = 1000
     bucket = config['bucket']
+    list_concurrency = utils.get_positive_int(config, 'list_concurrency', LIST_CONCURRENCY)
+    if sharded and list_concurrency > 1:
+        s3_objects = list_objects_in_shards(s3_client, bucket, search_prefix, list_concurrency)
+    else:
+        s3_objects = list_objects(s3_client, bucket, search_prefix)
+
+    for s3_object in s3_objects:
+        s3_object_count += 1
+        yield s3_object
+
+    if s3_object_count > 0:
+        LOGGER.info("Found %s files.", s3_object_count)
+    else:
+        LOGGER.warning('Found no files for bucket "%s" that match prefix "%s"', bucket, search_prefix)
+
+
+_shared_listing = None
+
+
+def enable_shared_listing():
+    global _shared_listing
+    # list_files_in_bucket is looked up on each call, so that it can be patched
+    _shared_listing = SharedListing(lambda config, search_prefix: list_files_in_bucket(config, search_prefix)) # pylint: disable=unnecessary-lambda
+
+
+def disable_shared_listing():
+    global _shared_listing
+    _shared_listing = None
+
+
+def list_files_in_prefix(config, search_prefix=None, sharded=True):
+    if _shared_listing is not None:
+        return _shared_listing.list_files(config, search_prefix)
+    return list_files_in_bucket(config, search_prefix, sharded)
+
+
+def list_files_in_prefixes(config, search_prefixes, sharded=True):
+    """Lists up to PREFIX_LIST_CONCURRENCY of `search_prefixes` at once,
+    yielding their keys in the order of the prefixes."""
+    list_concurrency = utils.get_positive_int(config, 'list_concurrency', LIST_CONCURRENCY)
+    if len(search_prefixes) == 1 or (sharded and list_concurrency > 1):
+        # Sharded prefixes are already listed by `list_concurrency` workers each
+        for search_prefix in search_prefixes:
+            yield from list_files_in_prefix(config, search_prefix, sharded)
+        return
+
+    def list_pages(search_prefix):
+        s3_objects = iter(list_files_in_prefix(config, search_prefix, sharded))
+        return iter(lambda: list(itertools.islice(s3_objects, LIST_PAGE_SIZE)), [])
+
+    for s3_objects in utils.ordered_concurrent_chain(list_pages, search_prefixes,
+                                                     min(len(search_prefixes), PREFIX_LIST_CONCURRENCY),
+                                                     LIST_QUEUE_PAGES):
+        yield from s3_objects
+
+
+def paginate_objects(s3_client, bucket, search_prefix=None, delimiter=None):
+    max_results = LIST_PAGE_SIZE
     args = {
         'Bucket': bucket,
         'MaxKeys': max_results,
@@ -708,32 +1033,128 @@ def list_files_in_bucket(config, search_prefix=None):
 
     if search_prefix is not None:
         args['Prefix'] = search_prefix
+    if delimiter is not None:
+        args['Delimiter'] = delimiter
 
     paginator = s3_client.get_paginator('list_objects_v2')
     pages = 0
     for page in paginator.paginate(**args):
         pages += 1
         LOGGER.debug("On page %s", pages)
-        s3_object_count += len(page['Contents'])
-        yield from page['Contents']
+        yield page
 
-    if s3_object_count > 0:
-        LOGGER.info("Found %s files.", s3_object_count)
-    else:
-        LOGGER.warning('Found no files for bucket "%s" that match prefix "%s"', bucket, search_prefix)
+
+def list_objects(s3_client, bucket, search_prefix=None):
+    for page in paginate_objects(s3_client, bucket, search_prefix):
+        yield from page.get('Contents', [])
+
+
+def list_objects_in_shards(s3_client, bucket, search_prefix, list_concurrency):
+    """
+    Lists the keys under `search_prefix` by splitting it into one shard per
+    sub-prefix (found with Delimiter='/') and listing up to `list_concurrency`
+    shards at once. Shards are yielded in key order, so the result is the same
+    as that of list_objects().
+    """
+    # Keys directly under the prefix are yielded as they are. They sort
+    # between the sub-prefixes, as they can't contain another delimiter.
+    shards = []
+    for page in paginate_objects(s3_client, bucket, search_prefix, delimiter='/'):
+        shards.extend((s3_object['Key'], [s3_object]) for s3_object in page.get('Contents', []))
+        shards.extend((common_prefix['Prefix'], None) for common_prefix in page.get('CommonPrefixes', []))
+    shards.sort(key=lambda shard: shard[0])
+
+    LOGGER.info('Listing %s sub-prefixes of "%s" with %s workers',
+                sum(1 for _, s3_objects in shards if s3_objects is None), search_prefix or '', list_concurrency)
+
+    def list_shard(shard):
+        shard_prefix, s3_objects = shard
+        if s3_objects is not None:
+            yield s3_objects
+            return
+        for page in paginate_objects(s3_client, bucket, shard_prefix):
+            yield page.get('Contents', [])
+
+    for s3_objects in utils.ordered_concurrent_chain(list_shard, shards, list_concurrency, LIST_QUEUE_PAGES):
+        yield from s3_objects
 
 
 @retry_pattern
 def get_file_handle(config, s3_path):
     bucket = config['bucket']
-    # Set connect and read timeout for resource
-    timeout = get_request_timeout(config)
-    client_config = Config(connect_timeout=timeout,  read_timeout=timeout)
-    s3_client = boto3.resource('s3', config=client_config)
+    s3_client = get_s3_client(config)
+    return s3_client.get_object(Bucket=bucket, Key=s3_path)['Body']
+
+@retry_pattern
+def get_file_handle_from_offset(config, s3_path, offset, etag=None):
+    """Returns the body of an object from byte `offset` to its end. If `etag`
+    is given, the request fails unless the object still has that ETag."""
+    bucket = config['bucket']
+    s3_client = get_s3_client(config)
+    args = {'Bucket': bucket, 'Key': s3_path, 'Range': 'bytes={}-'.format(offset)}
+    if etag:
+        args['IfMatch'] = etag
+    return s3_client.get_object(**args)['Body']
+
+@retry_pattern
+def get_object_range(config, s3_path, start, end):
+    """Returns the bytes `start` to `end` (inclusive) of an object and the
+    size of the whole object."""
+    bucket = config['bucket']
+    s3_client = get_s3_client(config)
+    response = s3_client.get_object(Bucket=bucket, Key=s3_path, Range='bytes={}-{}'.format(start, end))
+    # e.g. "bytes 0-1023/4096"
+    object_size = int(response['ContentRange'].rsplit('/', 1)[1])
+    return response['Body'].read(), object_size
+
+def get_sample_file_handle(config, s3_path, max_bytes, random_ranges=0):
+    """
+    Returns a file object with the complete lines of at most `max_bytes` of an
+    object: those at its start and, if `random_ranges` is set, those in as
+    many ranges at random offsets (seeded by the key, so that discovery is
+    repeatable). The bytes are split evenly between the ranges.
+    """
+    range_size = max(max_bytes // (random_ranges + 1), 1)
+    data, object_size = get_object_range(config, s3_path, 0, range_size - 1)
+    if len(data) >= object_size:
+        return io.BytesIO(data)
+
+    # Leave out the line cut off at the end of the range
+    chunks = [data[:data.rfind(b'\n') + 1]]
+    if random_ranges and object_size > range_size:
+        random_generator = random.Random(s3_path)
+        offsets = sorted(random_generator.randrange(range_size, object_size) for _ in range(random_ranges))
+        for offset in offsets:
+            data, _ = get_object_range(config, s3_path, offset, offset + range_size - 1)
+            # Leave out the lines cut off at both ends of the range, unless it's the end of the object
+            start = data.find(b'\n') + 1
+            end = len(data) if offset + len(data) >= object_size else data.rfind(b'\n') + 1
+            if 0 < start < end:
+                chunks.append(data[start:end])
+
+    LOGGER.info('Sampling %s of the %s bytes of "%s"', sum(len(chunk) for chunk in chunks), object_size, s3_path)
+    return io.BytesIO(b''.join(chunks))
+
+@contextlib.contextmanager
+def open_zip_file(config, s3_path):
+    """
+    Opens a zip object through a seekable s3fs file, so only its central
+    directory, at its end, and the compressed bytes of each member as the
+    member is read are fetched, with Range requests, instead of the whole
+    archive. The archive and the s3fs file are closed on exit, after which
+    its members can't be read.
+    """
+    with get_s3fs_file_handle(config, s3_path) as file_handle, zipfile.ZipFile(file_handle) as zip_file:
+        yield zip_file
+
 
-    s3_bucket = s3_client.Bucket(bucket)
-    s3_object = s3_bucket.Object(s3_path)
-    return s3_object.get()['Body']
+def get_zip_members(zip_file, is_supported):
+    """Yields the members of `zip_file` whose name `is_supported`, as file
+    objects. Each member is only opened once it's yielded, and the others
+    are never opened."""
+    for name in zip_file.namelist():
+        if is_supported(name):
+            yield zip_file.open(name) #pylint:disable=consider-using-with
 
 @retry_pattern
 def get_s3fs_file_handle(config, s3_path):
@@ -0,0 +1,130 @@
+"""
+Chooses which files discovery samples, and how much of each, from the
+sampling options of a table.
+"""
+import random
+
+from tap_s3_csv import utils
+from tap_s3_csv.schema_cache import merge_observations
+
+# Every 5th record of up to 1000 records of 5 files is sampled unless the
+# table sets `sample_rate`, `max_records` or `max_files`
+SAMPLE_RATE = 5
+MAX_RECORDS = 1000
+MAX_FILES = 5
+
+SAMPLE_STRATEGIES = ['first', 'newest', 'oldest', 'random', 'spread']
+
+
+def get_sampling_parameters(table_spec, sample_rate=None, max_records=None, max_files=None):
+    """Returns the (sample_rate, max_records, max_files) of a table, unless
+    they're given explicitly."""
+    return (sample_rate or utils.get_positive_int(table_spec, 'sample_rate', SAMPLE_RATE),
+            max_records or utils.get_positive_int(table_spec, 'max_records', MAX_RECORDS),
+            max_files or utils.get_positive_int(table_spec, 'max_files', MAX_FILES))
+
+
+def _spread(s3_files, rand):
+    # Oldest first
+    s3_files = sorted(s3_files, key=lambda s3_file: s3_file['last_modified'])
+    while s3_files:
+        yield s3_files.pop()
+        if s3_files:
+            yield s3_files.pop(0)
+        if s3_files:
+            yield s3_files.pop(rand.randrange(len(s3_files)))
+
+
+def order_files_to_sample(s3_files, table_spec):
+    """
+    Returns the files of a table in the order they should be sampled in,
+    depending on its `sample_strategy`:
+    - first: the order they're listed in, i.e. by key (default)
+    - newest / oldest: by last modified date
+    - random: in a random order
+    - spread: alternately the newest, the oldest and a random one of the rest
+
+    Random orders are seeded with the table name, so discovering the same
+    files gives the same schema.
+    """
+    strategy = table_spec.get('sample_strategy') or 'first'
+    if strategy == 'first':
+        return s3_files
+
+    rand = random.Random(table_spec.get('table_name'))
+    if strategy == 'newest':
+        return sorted(s3_files, key=lambda s3_file: s3_file['last_modified'], reverse=True)
+    if strategy == 'oldest':
+        return sorted(s3_files, key=lambda s3_file: s3_file['last_modified'])
+    if strategy == 'random':
+        s3_files = list(s3_files)
+        rand.shuffle(s3_files)
+        return s3_files
+    return _spread(s3_files, rand)
+
+
+def has_new_observations(acc, observations):
+    """Returns whether merging `observations` into `acc` would change the schema."""
+    for key, value in observations.items():
+        if key not in acc:
+            return True
+        if isinstance(value, dict) and has_new_observations(acc[key], value):
+            return True
+    return False
+
+
+class SchemaStability():
+    """
+    Merges the observations of each sampled file, counting how many files in
+    a row didn't change the schema, so sampling can stop once the last
+    `stable_files` files didn't.
+    """
+
+    def __init__(self, stable_files):
+        self.stable_files = stable_files
+        self.unchanged_files = 0
+
+    def add_file(self, observations, file_observations):
+        if has_new_observations(observations, file_observations):
+            merge_observations(observations, file_observations)
+            self.unchanged_files = 0
+        else:
+            self.unchanged_files += 1
+
+    @property
+    def is_stable(self):
+        return bool(self.stable_files) and self.unchanged_files >= self.stable_files
+
+
+def open_file_to_sample(s3_file):
+    """Opens the file handle of a file returned by s3.get_files_to_sample()."""
+    if "open_file_handle" not in s3_file:
+        return s3_file
+    s3_file = dict(s3_file)
+    s3_file["file_handle"] = s3_file.pop("open_file_handle")()
+    return s3_file
+
+
+def prefetch_files_to_sample(s3_files, prefetch_files):
+    """
+    Yields the files returned by s3.get_files_to_sample() in order, opening up
+    to `prefetch_files` of them at once. Once closed, the files opened ahead
+    of the last one yielded are closed too, as they won't be sampled.
+    """
+    opened = {}
+
+    def open_file(s3_file):
+        s3_file = open_file_to_sample(s3_file)
+        opened[id(s3_file)] = s3_file
+        return s3_file
+
+    s3_files = utils.ordered_concurrent_map(open_file, s3_files, prefetch_files)
+    try:
+        for s3_file in s3_files:
+            del opened[id(s3_file)]
+            yield s3_file
+    finally:
+        # Waits for the files still being opened
+        s3_files.close()
+        for s3_file in opened.values():
+            s3_file['file_handle'].close()
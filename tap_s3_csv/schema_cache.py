@@ -0,0 +1,72 @@
+import hashlib
+import json
+import os
+import tempfile
+
+import singer
+
+LOGGER = singer.get_logger()
+
+# Bumped whenever the format of cached entries changes, so older entries are
+# sampled again instead of being misread
+CACHE_VERSION = 2
+
+
+def merge_observations(acc, observations):
+    """Merges the observations of singer.schema_generation.add_observations()
+    into `acc`, as if the records they were made from had been added to it."""
+    for key, value in observations.items():
+        if isinstance(value, dict):
+            merge_observations(acc.setdefault(key, {}), value)
+        else:
+            acc[key] = value
+    return acc
+
+
+class SchemaCache():
+    """
+    Stores what sampling each S3 file contributed to a table's schema, in one
+    JSON file per object under `path`. Entries are keyed by the bucket, key,
+    ETag and size of the object and by the sampling parameters, so a changed
+    object, or a change of how it's sampled, is sampled again.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def _get_entry_path(self, s3_file, sampling_parameters):
+        entry_key = json.dumps({'version': CACHE_VERSION,
+                                'key': s3_file['key'],
+                                'etag': s3_file['etag'],
+                                'size': s3_file['size'],
+                                **sampling_parameters}, sort_keys=True)
+        return os.path.join(self.path, hashlib.sha256(entry_key.encode('utf-8')).hexdigest() + '.json')
+
+    def get(self, s3_file, sampling_parameters):
+        if not s3_file.get('etag'):
+            return None
+
+        try:
+            with open(self._get_entry_path(s3_file, sampling_parameters), encoding='utf-8') as entry_file:
+                return json.load(entry_file)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as err:
+            LOGGER.warning('Ignoring the cached samples of "%s": %s', s3_file['key'], err)
+            return None
+
+    def put(self, s3_file, sampling_parameters, entry):
+        if not s3_file.get('etag'):
+            return
+
+        # Written to a temporary file first, so concurrent runs never read a partial entry
+        fd, temp_path = tempfile.mkstemp(dir=self.path, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as entry_file:
+                json.dump(entry, entry_file)
+            os.replace(temp_path, self._get_entry_path(s3_file, sampling_parameters))
+        except OSError as err:
+            LOGGER.warning('Could not cache the samples of "%s": %s', s3_file['key'], err)
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
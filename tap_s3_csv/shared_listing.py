@@ -0,0 +1,57 @@
+import threading
+
+import singer
+
+LOGGER = singer.get_logger()
+
+
+class SharedListing():
+    """
+    Lists each prefix of a bucket once and shares its objects between all the
+    tables of a run. A prefix starting with one that was already listed is
+    filtered from that listing instead of being listed again.
+
+    Objects are kept in memory until the end of the run.
+    """
+
+    def __init__(self, list_files):
+        # Called as list_files(config, search_prefix) to list a prefix
+        self.list_files_in_bucket = list_files
+        # (bucket, search_prefix) -> list of objects
+        self.listings = {}
+        self.listing_locks = {}
+        self.lock = threading.Lock()
+
+    def _get_listed_objects(self, bucket, search_prefix):
+        # The longest listed prefix covering `search_prefix` has the fewest objects to filter
+        listed_prefixes = [prefix for listed_bucket, prefix in self.listings
+                           if listed_bucket == bucket
+                           and (prefix is None or (search_prefix or '').startswith(prefix))]
+        if not listed_prefixes:
+            return None
+
+        listed_prefix = max(listed_prefixes, key=lambda prefix: len(prefix or ''))
+        objects = self.listings[(bucket, listed_prefix)]
+        if listed_prefix == search_prefix:
+            return objects
+
+        LOGGER.info('Using the listing of prefix "%s" for prefix "%s"', listed_prefix, search_prefix)
+        return [s3_object for s3_object in objects if s3_object['Key'].startswith(search_prefix)]
+
+    def list_files(self, config, search_prefix=None):
+        bucket = config['bucket']
+        with self.lock:
+            objects = self._get_listed_objects(bucket, search_prefix)
+            if objects is not None:
+                return objects
+            listing_lock = self.listing_locks.setdefault((bucket, search_prefix), threading.Lock())
+
+        # Tables discovered concurrently wait for the one listing the prefix
+        with listing_lock:
+            with self.lock:
+                objects = self._get_listed_objects(bucket, search_prefix)
+            if objects is None:
+                objects = list(self.list_files_in_bucket(config, search_prefix))
+                with self.lock:
+                    self.listings[(bucket, search_prefix)] = objects
+            return objects
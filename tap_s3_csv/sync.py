@@ -1,38 +1,88 @@
 import sys
 import csv
-import io
+import itertools
 import json
-import gzip
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import pyarrow as pa
+import pyarrow.parquet as pq
 
 from singer import metadata
-from singer import Transformer
 from singer import utils as singer_utils
 
 import singer
 from singer_encodings import (
     avro,
-    compression,
     csv as csv_helper,
     jsonl,
     parquet
 )
 from tap_s3_csv import (
+    file_checkpoint,
+    output,
     utils,
-    s3
+    s3,
+    transform
 )
 
 LOGGER = singer.get_logger()
 
+# Files are synced one at a time unless `max_concurrent_files` is configured
+MAX_CONCURRENT_FILES = 1
+
+# Members of a zip file are synced one at a time unless
+# `zip_member_concurrency` is configured
+ZIP_MEMBER_CONCURRENCY = 1
+
+# gz files are decompressed by the thread parsing them unless
+# `gzip_decompression_threads` is configured
+GZIP_DECOMPRESSION_THREADS = 1
+
+# Row groups of a Parquet file are read one at a time unless
+# `parquet_row_group_concurrency` is configured
+PARQUET_ROW_GROUP_CONCURRENCY = 1
+
+# Each thread syncing a file concurrently queues at most this many records
+# ahead of the main thread writing them
+RECORD_QUEUE_SIZE = 1000
+
+# When set for a thread, records are put in this RecordQueue instead of being
+# written to stdout. See write_concurrently().
+_record_queue = threading.local()
+
+# When set for a thread, the plain CSV or JSONL object it's for is synced from
+# and updates this checkpoint. See checkpoint_table_file().
+_file_checkpoint = threading.local()
+
+
+def write_record(table_name, record):
+    record_queue = getattr(_record_queue, 'queue', None)
+    if record_queue is not None:
+        record_queue.put(record)
+    else:
+        output.write_record(table_name, record)
+
+
 def sync_stream(config, state, table_spec, stream, sync_start_time):
     table_name = table_spec['table_name']
     modified_since = singer_utils.strptime_with_tz(singer.get_bookmark(state, table_name, 'modified_since') or
                                             config['start_date'])
 
+    # The keys of the files synced that were last modified at the
+    # modified_since bookmark. Other files modified in the same second are
+    # still synced. States from before it was bookmarked don't have it.
+    synced_keys = singer.get_bookmark(state, table_name, 'synced_keys')
+    if synced_keys is not None:
+        synced_keys = set(synced_keys)
+
     LOGGER.info('Syncing table "%s".', table_name)
     LOGGER.info('Getting files modified since %s.', modified_since)
 
     s3_files = s3.get_input_files_for_table(
-        config, table_spec, modified_since)
+        config, table_spec, modified_since, synced_keys)
 
     records_streamed = 0
 
@@ -40,14 +90,38 @@ def sync_stream(config, state, table_spec, stream, sync_start_time):
     # sense. This means that we can't sync s3 buckets that are larger than
     # we can sort in memory which is suboptimal. If we could bookmark
     # based on anything else then we could just sync files as we see them.
-    for s3_file in sorted(s3_files, key=lambda item: item['last_modified']):
-        records_streamed += sync_table_file(
-            config, s3_file['key'], table_spec, stream)
-        if s3_file['last_modified'] < sync_start_time:
-            state = singer.write_bookmark(state, table_name, 'modified_since', s3_file['last_modified'].isoformat())
-        else:
-            state = singer.write_bookmark(state, table_name, 'modified_since', sync_start_time.isoformat())
-        singer.write_state(state)
+    s3_files = sorted(s3_files, key=lambda item: item['last_modified'])
+
+    max_concurrent_files = utils.get_positive_int(config, 'max_concurrent_files', MAX_CONCURRENT_FILES)
+    file_checkpoint_bytes = utils.get_positive_int(config, 'file_checkpoint_bytes', None)
+    if max_concurrent_files > 1:
+        synced_files = sync_files_concurrently(config, s3_files, table_spec, stream, max_concurrent_files)
+    elif file_checkpoint_bytes:
+        synced_files = ((s3_file, checkpoint_table_file(config, state, s3_file, table_spec, stream, file_checkpoint_bytes))
+                        for s3_file in s3_files)
+    else:
+        synced_files = ((s3_file, sync_table_file(config, s3_file['key'], table_spec, stream))
+                        for s3_file in s3_files)
+
+    try:
+        for s3_file, records_synced in synced_files:
+            records_streamed += records_synced
+            bookmark = min(s3_file['last_modified'], sync_start_time)
+            if bookmark != modified_since or synced_keys is None:
+                modified_since = bookmark
+                synced_keys = set()
+            if s3_file['last_modified'] == bookmark:
+                synced_keys.add(s3_file['key'])
+            singer.write_bookmark(state, table_name, 'synced_keys', sorted(synced_keys))
+            state = singer.write_bookmark(state, table_name, 'modified_since', bookmark.isoformat())
+            if file_checkpoint_bytes:
+                state = file_checkpoint.clear_bookmark(state, table_name)
+            # Records are written in batches, so they have to be flushed before the
+            # state is, otherwise the bookmark could get ahead of them
+            output.flush()
+            singer.write_state(state)
+    finally:
+        output.flush()
 
     if s3.skipped_files_count:
         LOGGER.warn("%s files got skipped during the last sync.",s3.skipped_files_count)
@@ -57,6 +131,121 @@ def sync_stream(config, state, table_spec, stream, sync_start_time):
     return records_streamed
 
 
+class WritingStopped(Exception):
+    """Raised in a thread syncing a file once its records won't be written."""
+
+
+class RecordQueue():
+    """
+    The records synced by a worker thread, for the main thread to write in
+    order. The worker waits once RECORD_QUEUE_SIZE records are queued, so
+    files synced concurrently aren't held in memory whole.
+    """
+    _end = object()
+
+    def __init__(self, stopped):
+        self.records = queue.Queue(RECORD_QUEUE_SIZE)
+        self.stopped = stopped
+
+    def put(self, record):
+        # Gives up once the main thread stopped writing, so the worker
+        # doesn't wait forever
+        while not self.stopped.is_set():
+            try:
+                self.records.put(record, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+        raise WritingStopped()
+
+    def sync(self, sync_function, *args):
+        _record_queue.queue = self
+        try:
+            return sync_function(*args)
+        finally:
+            _record_queue.queue = None
+            try:
+                self.put(self._end)
+            except WritingStopped:
+                pass
+
+    def __iter__(self):
+        while True:
+            record = self.records.get()
+            if record is self._end:
+                return
+            yield record
+
+
+def write_concurrently(table_name, sync_function, items, max_workers):
+    """
+    Calls `sync_function(item)`, which syncs records and returns how many,
+    for up to `max_workers` items at once, and writes the records in the
+    order of `items`. Yields each item and the result of its call once all
+    of its records are written.
+    """
+    items = iter(items)
+    stopped = threading.Event()
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def submit(item):
+        record_queue = RecordQueue(stopped)
+        return item, record_queue, executor.submit(record_queue.sync, sync_function, item)
+
+    try:
+        pending = deque(submit(item) for item in itertools.islice(items, max_workers))
+        while pending:
+            item, record_queue, future = pending.popleft()
+
+            # Keep the pool busy while this item's records are written. The
+            # pool runs items in order, so this one is already running.
+            for next_item in itertools.islice(items, 1):
+                pending.append(submit(next_item))
+
+            for record in record_queue:
+                write_record(table_name, record)
+            yield item, future.result()
+    finally:
+        stopped.set()
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+# pylint: disable=too-many-arguments
+def checkpoint_table_file(config, state, s3_file, table_spec, stream, interval):
+    """
+    Syncs a file like sync_table_file(), but if it's a CSV or JSONL object,
+    writes a checkpoint of it to `state` every `interval` bytes, and resumes
+    it from the checkpoint left by a failed sync.
+    """
+    _file_checkpoint.checkpoint = file_checkpoint.FileCheckpoint(state, table_spec['table_name'], s3_file, interval)
+    try:
+        return sync_table_file(config, s3_file['key'], table_spec, stream)
+    finally:
+        _file_checkpoint.checkpoint = None
+
+
+def get_file_checkpoint(s3_path):
+    """Returns the checkpoint of the file being synced by this thread, if it's `s3_path`."""
+    checkpoint = getattr(_file_checkpoint, 'checkpoint', None)
+    if checkpoint is not None and checkpoint.s3_path == s3_path:
+        return checkpoint
+    return None
+
+
+def sync_files_concurrently(config, s3_files, table_spec, stream, max_concurrent_files):
+    """
+    Downloads and parses up to `max_concurrent_files` files ahead of the one
+    being written. Records are still written in the order of `s3_files`, and
+    each file is yielded as (s3_file, records synced) only once all of its
+    records are written, so the caller can bookmark it straight away.
+    """
+    yield from write_concurrently(
+        table_spec['table_name'],
+        lambda s3_file: sync_table_file(config, s3_file['key'], table_spec, stream),
+        s3_files,
+        max_concurrent_files)
+
+
 def sync_table_file(config, s3_path, table_spec, stream):
 
     extension = s3_path.split(".")[-1].lower()
@@ -64,12 +253,12 @@ def sync_table_file(config, s3_path, table_spec, stream):
     # Check whether file is without extension or not
     if not extension or s3_path.lower() == extension:
         LOGGER.warning('"%s" without extension will not be synced.',s3_path)
-        s3.skipped_files_count = s3.skipped_files_count + 1
+        s3.increment_skipped_files_count()
         return 0
     try:
         if extension == "zip":
             return sync_compressed_file(config, s3_path, table_spec, stream)
-        if extension in ["csv", "gz", "jsonl", "txt", "parquet", "avro"]:
+        if extension in ["csv", "gz", "jsonl", "txt", "parquet", "avro", "tar", "tgz"] + utils.COMPRESSION_EXTENSIONS:
             return handle_file(config, s3_path, table_spec, stream, extension)
         LOGGER.warning('"%s" having the ".%s" extension will not be synced.',s3_path,extension)
     except (UnicodeDecodeError,json.decoder.JSONDecodeError):
@@ -77,7 +266,7 @@ def sync_table_file(config, s3_path, table_spec, stream):
         # JSONDecodeError will be raised if non JSONL file passed to JSON parser
         # Handled both error and skipping file with wrong extension.
         LOGGER.warning("Skipping %s file as parsing failed. Verify an extension of the file.",s3_path)
-        s3.skipped_files_count = s3.skipped_files_count + 1
+        s3.increment_skipped_files_count()
     return 0
 
 
@@ -90,20 +279,27 @@ def handle_file(config, s3_path, table_spec, stream, extension, file_handler = N
     # Check whether file is without extension or not
     if not extension or s3_path.lower() == extension:
         LOGGER.warning('"%s" without extension will not be synced.',s3_path)
-        s3.skipped_files_count = s3.skipped_files_count + 1
+        s3.increment_skipped_files_count()
         return 0
     if extension == "gz":
         return sync_gz_file(config, s3_path, table_spec, stream, file_handler)
 
-    if extension in ["csv", "txt"]:
+    if extension in ["tar", "tgz"]:
+        return sync_tar_file(config, s3_path, table_spec, stream, file_handler)
+
+    if extension in utils.COMPRESSION_EXTENSIONS:
+        return sync_compressed_stream_file(config, s3_path, table_spec, stream, extension, file_handler)
 
-        # If file is extracted from zip or gz use file object else get file object from s3 bucket
-        file_handle = file_handler if file_handler else s3.get_file_handle(config, s3_path)._raw_stream #pylint:disable=protected-access
+    if extension in ["csv", "txt"]:
+        file_handle = open_text_file(config, s3_path, table_spec, extension, file_handler)
         return sync_csv_file(config, file_handle, s3_path, table_spec, stream)
 
     if extension == "parquet":
-        file_handle = file_handler if file_handler else s3.get_s3fs_file_handle(config, s3_path)
-        return sync_parquet_file(config, file_handle, s3_path, table_spec, stream)
+        if file_handler:
+            return sync_parquet_file(config, file_handler, s3_path, table_spec, stream)
+        # Files read from the bucket can be opened again to read row groups concurrently
+        return sync_parquet_file(config, s3.get_s3fs_file_handle(config, s3_path), s3_path, table_spec, stream,
+                                 lambda: s3.get_s3fs_file_handle(config, s3_path))
 
     if extension == "avro":
         file_handle = file_handler if file_handler else s3.get_s3fs_file_handle(config, s3_path)
@@ -111,82 +307,176 @@ def handle_file(config, s3_path, table_spec, stream, extension, file_handler = N
 
     if extension == "jsonl":
 
-        # If file is extracted from zip or gz use file object else get file object from s3 bucket
-        file_handle = file_handler if file_handler else s3.get_file_handle(config, s3_path)._raw_stream
+        file_handle = open_text_file(config, s3_path, table_spec, extension, file_handler)
         iterator = jsonl.get_row_iterator(file_handle)
         records =  sync_jsonl_file(config, iterator, s3_path, table_spec, stream)
         if records == 0:
             # Only space isn't the valid JSON but it is a valid CSV header hence skipping the jsonl file with only space.
-            s3.skipped_files_count = s3.skipped_files_count + 1
+            s3.increment_skipped_files_count()
             LOGGER.warning('Skipping "%s" file as it is empty', s3_path)
         return records
 
     if extension == "zip":
         LOGGER.warning('Skipping "%s" file as it contains nested compression.',s3_path)
-        s3.skipped_files_count = s3.skipped_files_count + 1
+        s3.increment_skipped_files_count()
         return 0
 
     LOGGER.warning('"%s" having the ".%s" extension will not be synced.',s3_path,extension)
-    s3.skipped_files_count = s3.skipped_files_count + 1
+    s3.increment_skipped_files_count()
     return 0
 
 
+# pylint: disable=too-many-arguments
+def open_text_file(config, s3_path, table_spec, extension, file_handler):
+    """
+    Returns the file object of a CSV or JSONL file: `file_handler` if it's
+    extracted from zip or gz, else that of the object in the bucket, read from
+    its checkpoint if this thread has one.
+    """
+    if file_handler:
+        return file_handler
+    checkpoint = get_file_checkpoint(s3_path)
+    if checkpoint:
+        return file_checkpoint.open_lines(config, checkpoint, table_spec, extension)
+    return s3.get_file_handle(config, s3_path)._raw_stream #pylint:disable=protected-access
+
+
 def sync_gz_file(config, s3_path, table_spec, stream, file_handler):
-    if s3_path.endswith(".tar.gz"):
-        LOGGER.warning('Skipping "%s" file as .tar.gz extension is not supported',s3_path)
-        s3.skipped_files_count = s3.skipped_files_count + 1
-        return 0
+    if s3_path.lower().endswith(".tar.gz"):
+        if file_handler:
+            LOGGER.warning('Skipping "%s" file as it contains nested compression.',s3_path)
+            s3.increment_skipped_files_count()
+            return 0
+        return sync_tar_file(config, s3_path, table_spec, stream)
 
     # If file is extracted from zip use file object else get file object from s3 bucket
     file_object = file_handler if file_handler else s3.get_file_handle(config, s3_path)
 
-    file_bytes = file_object.read()
-    gz_file_obj = gzip.GzipFile(fileobj=io.BytesIO(file_bytes))
+    gzip_decompression_threads = utils.get_positive_int(config, 'gzip_decompression_threads', GZIP_DECOMPRESSION_THREADS)
 
     # pylint: disable=duplicate-code
     try:
-        gz_file_name = utils.get_file_name_from_gzfile(fileobj=io.BytesIO(file_bytes))
+        gz_file_name, gz_file_obj = utils.open_gz_file(file_object, gzip_decompression_threads, s3_path.split("/")[-1][:-len(".gz")])
     except AttributeError as err:
         # If a file is compressed using gzip command with --no-name attribute,
         # It will not return the file name and timestamp. Hence we will skip such files.
         # We also seen this issue occur when tar is used to compress the file
         LOGGER.warning('Skipping "%s" file as we did not get the original file name',s3_path)
-        s3.skipped_files_count = s3.skipped_files_count + 1
+        s3.increment_skipped_files_count()
         return 0
 
     if gz_file_name:
+        # Closing the file stops the threads decompressing it, if any
+        with gz_file_obj:
+            return sync_decompressed_file(config, s3_path, table_spec, stream, gz_file_name, gz_file_obj)
 
-        if gz_file_name.endswith(".gz"):
-            LOGGER.warning('Skipping "%s" file as it contains nested compression.',s3_path)
-            s3.skipped_files_count = s3.skipped_files_count + 1
-            return 0
+    raise Exception('"{}" file has some error(s)'.format(s3_path))
 
-        gz_file_extension = gz_file_name.split(".")[-1].lower()
-        return handle_file(config, s3_path + "/" + gz_file_name, table_spec, stream, gz_file_extension, io.BytesIO(gz_file_obj.read()))
 
-    raise Exception('"{}" file has some error(s)'.format(s3_path))
+# pylint: disable=too-many-arguments
+def sync_compressed_stream_file(config, s3_path, table_spec, stream, extension, file_handler):
+    """
+    Syncs a bz2, xz or zst file, decompressing it as it's read. These formats
+    don't store the original file name, so it's the name of the file without
+    the compression extension, e.g. "data.csv" for "data.csv.zst".
+    """
+    if not utils.is_supported_compression(extension):
+        LOGGER.warning('Skipping "%s" file as the zstandard package is not installed.',s3_path)
+        s3.increment_skipped_files_count()
+        return 0
+
+    file_name = s3_path.split("/")[-1][:-len(extension) - 1]
+    if "." not in file_name:
+        LOGGER.warning('"%s" without extension will not be synced.',s3_path)
+        s3.increment_skipped_files_count()
+        return 0
+
+    # If file is extracted from zip or tar use file object else get file object from s3 bucket
+    file_object = file_handler if file_handler else s3.get_file_handle(config, s3_path)
+    decompressed_file_obj = utils.open_compressed_file(file_object, extension)
+    return sync_decompressed_file(config, s3_path, table_spec, stream, file_name, decompressed_file_obj)
+
+
+# pylint: disable=too-many-arguments
+def sync_decompressed_file(config, s3_path, table_spec, stream, file_name, file_obj):
+    """
+    Syncs the file `file_name` decompressed from the gz, bz2, xz or zst file
+    `s3_path` as `file_obj`, by the extension of `file_name`.
+    """
+    file_extension = file_name.split(".")[-1].lower()
+    if file_extension in ["gz"] + utils.COMPRESSION_EXTENSIONS:
+        LOGGER.warning('Skipping "%s" file as it contains nested compression.',s3_path)
+        s3.increment_skipped_files_count()
+        return 0
+
+    if file_extension == "parquet":
+        # Parquet needs random access, which the decompressed stream can't provide
+        file_obj = utils.spool_to_tempfile(file_obj)
+    return handle_file(config, s3_path + "/" + file_name, table_spec, stream, file_extension, file_obj)
 
 
 def sync_compressed_file(config, s3_path, table_spec, stream):
     LOGGER.info('Syncing Compressed file "%s".', s3_path)
 
     records_streamed = 0
-    s3_file_handle = s3.get_file_handle(config, s3_path)
 
-    decompressed_files = compression.infer(io.BytesIO(s3_file_handle.read()), s3_path)
+    with s3.open_zip_file(config, s3_path) as zip_file:
+        # Only the supported members are opened
+        decompressed_files = s3.get_zip_members(
+            zip_file, lambda name: name.split(".")[-1].lower() in ["csv", "jsonl", "gz", "txt"] + utils.COMPRESSION_EXTENSIONS)
 
-    for decompressed_file in decompressed_files:
-        extension = decompressed_file.name.split(".")[-1].lower()
+        # Append the extracted file name with zip file.
+        members = ((s3_path + "/" + decompressed_file.name, decompressed_file.name.split(".")[-1].lower(), decompressed_file)
+                   for decompressed_file in decompressed_files)
 
-        if extension in ["csv", "jsonl", "gz", "txt"]:
-            # Append the extracted file name with zip file.
-            s3_file_path = s3_path + "/" + decompressed_file.name
+        zip_member_concurrency = utils.get_positive_int(config, 'zip_member_concurrency', ZIP_MEMBER_CONCURRENCY)
+        if zip_member_concurrency > 1:
+            return sync_zip_members_concurrently(config, members, table_spec, stream, zip_member_concurrency)
 
+        for s3_file_path, extension, decompressed_file in members:
             records_streamed += handle_file(config, s3_file_path, table_spec, stream, extension, file_handler=decompressed_file)
 
     return records_streamed
 
 
+def sync_tar_file(config, s3_path, table_spec, stream, file_handler=None):
+    """
+    Syncs the members of a tar file, compressed or not, one after the other
+    as they're read from the object's stream, which is never seeked.
+    """
+    LOGGER.info('Syncing tar file "%s".', s3_path)
+
+    records_streamed = 0
+
+    file_object = file_handler if file_handler else s3.get_file_handle(config, s3_path)
+    for member_name, member_file in utils.get_tar_members(file_object):
+        extension = member_name.split(".")[-1].lower()
+
+        if extension in ["csv", "jsonl", "gz", "txt", "parquet", "avro"] + utils.COMPRESSION_EXTENSIONS:
+            if extension == "parquet":
+                # Parquet needs random access, which the tar stream can't provide
+                member_file = utils.spool_to_tempfile(member_file)
+            # Append the member name with tar file.
+            s3_file_path = s3_path + "/" + member_name
+            records_streamed += handle_file(config, s3_file_path, table_spec, stream, extension, file_handler=member_file)
+
+    return records_streamed
+
+
+def sync_zip_members_concurrently(config, members, table_spec, stream, zip_member_concurrency):
+    """
+    Decompresses, parses and transforms up to `zip_member_concurrency` members
+    of a zip file at once. Records are still written in member order.
+    """
+    synced_members = write_concurrently(
+        table_spec['table_name'],
+        lambda member: handle_file(config, member[0], table_spec, stream, member[1], member[2]),
+        members,
+        zip_member_concurrency)
+
+    return sum(records_synced for _, records_synced in synced_members)
+
+
 def sync_csv_file(config, file_handle, s3_path, table_spec, stream):
     LOGGER.info('Syncing file "%s".', s3_path)
 
@@ -209,31 +499,36 @@ def sync_csv_file(config, file_handle, s3_path, table_spec, stream):
         iterator = csv_helper.get_row_iterator(file_handle, table_spec, None, True)
 
     records_synced = 0
+    # Records of a resumed file are numbered after those synced before
+    checkpoint = get_file_checkpoint(s3_path)
+    records_skipped = checkpoint.records if checkpoint else 0
 
     if iterator:
-        for row in iterator:
+        with transform.RecordTransformer(stream) as transformer:
+            for row in iterator:
 
-            #Skipping the empty line of CSV
-            if len(row) == 0:
-                continue
+                #Skipping the empty line of CSV
+                if len(row) == 0:
+                    continue
 
-            custom_columns = {
-                s3.SDC_SOURCE_BUCKET_COLUMN: bucket,
-                s3.SDC_SOURCE_FILE_COLUMN: s3_path,
+                custom_columns = {
+                    s3.SDC_SOURCE_BUCKET_COLUMN: bucket,
+                    s3.SDC_SOURCE_FILE_COLUMN: s3_path,
 
-                # index zero, +1 for header row
-                s3.SDC_SOURCE_LINENO_COLUMN: records_synced + 2
-            }
-            rec = {**row, **custom_columns}
+                    # index zero, +1 for header row
+                    s3.SDC_SOURCE_LINENO_COLUMN: records_skipped + records_synced + 2
+                }
+                rec = {**row, **custom_columns}
 
-            with Transformer() as transformer:
-                to_write = transformer.transform(rec, stream['schema'], metadata.to_map(stream['metadata']))
+                to_write = transformer.transform(rec)
 
-            singer.write_record(table_name, to_write)
-            records_synced += 1
+                write_record(table_name, to_write)
+                records_synced += 1
+                if checkpoint:
+                    checkpoint.update(records_skipped + records_synced)
     else:
         LOGGER.warning('Skipping "%s" file as it is empty',s3_path)
-        s3.skipped_files_count = s3.skipped_files_count + 1
+        s3.increment_skipped_files_count()
 
     return records_synced
 
@@ -246,25 +541,25 @@ def sync_avro_parquet_file(config, iterator, s3_path, table_spec, stream):
     records_synced = 0
 
     if iterator is not None:
-        for row in iterator:
+        with transform.RecordTransformer(stream) as transformer:
+            for row in iterator:
 
-            custom_columns = {
-                s3.SDC_SOURCE_BUCKET_COLUMN: bucket,
-                s3.SDC_SOURCE_FILE_COLUMN: s3_path,
+                custom_columns = {
+                    s3.SDC_SOURCE_BUCKET_COLUMN: bucket,
+                    s3.SDC_SOURCE_FILE_COLUMN: s3_path,
 
-                # index zero, +1 for header row
-                s3.SDC_SOURCE_LINENO_COLUMN: records_synced + 1
-            }
-            rec = {**row, **custom_columns}
+                    # index zero, +1 for header row
+                    s3.SDC_SOURCE_LINENO_COLUMN: records_synced + 1
+                }
+                rec = {**row, **custom_columns}
 
-            with Transformer() as transformer:
-                to_write = transformer.transform(rec, stream['schema'], metadata.to_map(stream['metadata']))
+                to_write = transformer.transform(rec)
 
-            singer.write_record(table_name, to_write)
-            records_synced += 1
+                write_record(table_name, to_write)
+                records_synced += 1
     else:
         LOGGER.warning('Skipping "%s" file as it is empty',s3_path)
-        s3.skipped_files_count = s3.skipped_files_count + 1
+        s3.increment_skipped_files_count()
 
     return records_synced
 
@@ -272,11 +567,58 @@ def sync_avro_file(config, file_handle, s3_path, table_spec, stream):
     iterator = avro.get_row_iterator(file_handle)
     return sync_avro_parquet_file(config, iterator, s3_path, table_spec, stream)
 
-def sync_parquet_file(config, file_handle, s3_path, table_spec, stream):
-    iterator = parquet.get_row_iterator(file_handle)
-    return sync_avro_parquet_file(config, iterator, s3_path, table_spec, stream)
+def get_selected_columns(stream):
+    """
+    Returns the columns to read for the stream: its selected fields plus its
+    key properties, or None if every column has to be read.
+    """
+    selected_fields = transform.RecordTransformer(stream).selected_fields
+    if selected_fields is None:
+        return None
+    mdata = metadata.to_map(stream.get('metadata', []))
+    return selected_fields | set(metadata.get(mdata, (), 'table-key-properties') or [])
 
-def sync_jsonl_file(config, iterator, s3_path, table_spec, stream):
+
+def get_parquet_batch_iterator(file_handle, columns=None):
+    """
+    Yields the record batches of a Parquet file, only reading the given
+    columns, so the column chunks of deselected fields are never fetched.
+    """
+    parquet_file = pq.ParquetFile(file_handle)
+    if columns is not None:
+        columns = [column for column in parquet_file.schema_arrow.names if column in columns]
+    yield from parquet_file.iter_batches(batch_size=parquet.BATCH_SIZE, columns=columns)
+
+
+def get_parquet_row_group_batch_iterator(file_handle, open_file_handle, columns=None,
+                                         max_workers=PARQUET_ROW_GROUP_CONCURRENCY):
+    """
+    Like get_parquet_batch_iterator(), but reads up to `max_workers` row
+    groups at once, each through its own handle from `open_file_handle()`,
+    so their column chunks are fetched and decoded concurrently. Batches are
+    still yielded in row group order, and no more than `max_workers` decoded
+    row groups are held in memory.
+    """
+    parquet_file = pq.ParquetFile(file_handle)
+    if columns is not None:
+        columns = [column for column in parquet_file.schema_arrow.names if column in columns]
+
+    def read_row_group(index):
+        with open_file_handle() as row_group_file_handle:
+            # Reuse the footer that was already read instead of fetching it again
+            row_group_file = pq.ParquetFile(row_group_file_handle, metadata=parquet_file.metadata)
+            return row_group_file.read_row_group(index, columns=columns)
+
+    for table in utils.ordered_concurrent_map(read_row_group, range(parquet_file.num_row_groups), max_workers):
+        yield from table.to_batches(max_chunksize=parquet.BATCH_SIZE)
+
+
+def sync_parquet_batches(config, batches, s3_path, table_spec, stream):
+    """
+    Syncs the record batches of a Parquet file like sync_avro_parquet_file()
+    syncs rows, but adds the _sdc columns and transforms the records a batch
+    at a time.
+    """
     LOGGER.info('Syncing file "%s".', s3_path)
 
     bucket = config['bucket']
@@ -284,37 +626,81 @@ def sync_jsonl_file(config, iterator, s3_path, table_spec, stream):
 
     records_synced = 0
 
-    for row in iterator:
+    with transform.RecordTransformer(stream) as transformer:
+        for batch in batches:
+            num_rows = batch.num_rows
+            custom_columns = {
+                s3.SDC_SOURCE_BUCKET_COLUMN: pa.array([bucket] * num_rows, pa.string()),
+                s3.SDC_SOURCE_FILE_COLUMN: pa.array([s3_path] * num_rows, pa.string()),
 
-        custom_columns = {
-            s3.SDC_SOURCE_BUCKET_COLUMN: bucket,
-            s3.SDC_SOURCE_FILE_COLUMN: s3_path,
+                # index zero, +1 for header row
+                s3.SDC_SOURCE_LINENO_COLUMN: pa.array(range(records_synced + 1, records_synced + num_rows + 1),
+                                                      pa.int64())
+            }
+            names = [name for name in batch.schema.names if name not in custom_columns]
+            batch = pa.RecordBatch.from_arrays(
+                [batch.column(name) for name in names] + list(custom_columns.values()),
+                names + list(custom_columns))
 
-            # index zero and then starting from 1
-            s3.SDC_SOURCE_LINENO_COLUMN: records_synced + 1
-        }
-        rec = {**row, **custom_columns}
+            for to_write in transformer.transform_batch(batch):
+                write_record(table_name, to_write)
+                records_synced += 1
 
-        with Transformer() as transformer:
-            to_write = transformer.transform(rec, stream['schema'], metadata.to_map(stream['metadata']))
-        # collecting the value which was removed in transform to add those in _sdc_extra
-        value = [ {field:rec[field]} for field in set(rec) - set(to_write) ]
+    return records_synced
+
+
+# pylint: disable=too-many-arguments
+def sync_parquet_file(config, file_handle, s3_path, table_spec, stream, open_file_handle=None):
+    columns = get_selected_columns(stream)
+    row_group_concurrency = utils.get_positive_int(config, 'parquet_row_group_concurrency',
+                                                   PARQUET_ROW_GROUP_CONCURRENCY)
+    if open_file_handle and row_group_concurrency > 1:
+        batches = get_parquet_row_group_batch_iterator(file_handle, open_file_handle, columns, row_group_concurrency)
+    else:
+        batches = get_parquet_batch_iterator(file_handle, columns)
+    return sync_parquet_batches(config, batches, s3_path, table_spec, stream)
 
-        if value:
-            LOGGER.warning(
-                "\"%s\" is not found in catalog and its value will be stored in the \"_sdc_extra\" field.", value)
-            extra_data = {
-                s3.SDC_EXTRA_COLUMN: value
+def sync_jsonl_file(config, iterator, s3_path, table_spec, stream):
+    LOGGER.info('Syncing file "%s".', s3_path)
+
+    bucket = config['bucket']
+    table_name = table_spec['table_name']
+
+    records_synced = 0
+    # Records of a resumed file are numbered after those synced before
+    checkpoint = get_file_checkpoint(s3_path)
+    records_skipped = checkpoint.records if checkpoint else 0
+
+    with transform.RecordTransformer(stream) as transformer:
+        for row in iterator:
+
+            custom_columns = {
+                s3.SDC_SOURCE_BUCKET_COLUMN: bucket,
+                s3.SDC_SOURCE_FILE_COLUMN: s3_path,
+
+                # index zero and then starting from 1
+                s3.SDC_SOURCE_LINENO_COLUMN: records_skipped + records_synced + 1
             }
-            update_to_write = {**to_write,**extra_data}
-        else:
-            update_to_write = to_write
+            rec = {**row, **custom_columns}
+
+            to_write = transformer.transform(rec)
+            # collecting the value which was removed in transform to add those in _sdc_extra
+            value = [ {field:rec[field]} for field in set(rec) - set(to_write) ]
 
-        # Transform again to validate _sdc_extra value.
-        with Transformer() as transformer:
-            update_to_write = transformer.transform(update_to_write, stream['schema'], metadata.to_map(stream['metadata']))
+            if value:
+                LOGGER.warning(
+                    "\"%s\" is not found in catalog and its value will be stored in the \"_sdc_extra\" field.", value)
+                extra_data = {
+                    s3.SDC_EXTRA_COLUMN: value
+                }
 
-        singer.write_record(table_name, update_to_write)
-        records_synced += 1
+                # Transform again to validate _sdc_extra value. Records without
+                # extra fields are already transformed.
+                to_write = transformer.transform({**to_write,**extra_data})
+
+            write_record(table_name, to_write)
+            records_synced += 1
+            if checkpoint:
+                checkpoint.update(records_skipped + records_synced)
 
     return records_synced
@@ -0,0 +1,325 @@
+import pyarrow as pa
+import pyarrow.compute as pc
+from singer import metadata
+from singer import Transformer
+from singer.transform import Error, SchemaMismatch, SchemaKey
+
+import singer
+
+LOGGER = singer.get_logger()
+
+
+def _coerce_null(data):
+    if data is None or data == "":
+        return True, None
+    return False, None
+
+
+def _coerce_string(data):
+    if data is not None:
+        try:
+            return True, str(data)
+        except:
+            return False, None
+    return False, None
+
+
+def _coerce_integer(data):
+    if isinstance(data, str):
+        data = data.replace(",", "")
+    try:
+        return True, int(data)
+    except:
+        return False, None
+
+
+def _coerce_number(data):
+    if isinstance(data, str):
+        data = data.replace(",", "")
+    try:
+        return True, float(data)
+    except:
+        return False, None
+
+
+def _coerce_boolean(data):
+    if isinstance(data, str) and data.lower() == "false":
+        return True, False
+    try:
+        return True, bool(data)
+    except:
+        return False, None
+
+
+def _str_timestamps(column):
+    # Same as str() of each datetime, e.g. "2024-01-01 01:02:03.004000+00:00",
+    # where the microseconds are left out when they are zero. UTC timestamps
+    # are cast as naive ones, which is much faster and gives the same digits.
+    strings = column.cast(pa.timestamp('us')).cast(pa.string())
+    strings = pc.replace_substring_regex(strings, pattern=r'\.000000$', replacement='')
+    if column.type.tz:
+        strings = pc.binary_join_element_wise(strings, '+00:00', '')
+    return strings.to_pylist()
+
+
+def _get_column_conversion(typ, schema, arrow_type):
+    """
+    Returns a function converting an Arrow column of `arrow_type` straight to
+    the values that coercing each of its (non-null) values to `typ` would
+    give, or None if there's no such conversion.
+    """
+    if typ == "integer" and pa.types.is_integer(arrow_type):
+        return lambda column: column.to_pylist()
+    if typ == "number" and pa.types.is_floating(arrow_type):
+        return lambda column: column.to_pylist()
+    if typ == "boolean" and pa.types.is_boolean(arrow_type):
+        return lambda column: column.to_pylist()
+    if typ == "string" and not schema.get("format"):
+        if pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type):
+            return lambda column: column.to_pylist()
+        if pa.types.is_integer(arrow_type) or pa.types.is_date(arrow_type):
+            return lambda column: column.cast(pa.string()).to_pylist()
+        if (pa.types.is_timestamp(arrow_type) and arrow_type.unit in ('s', 'ms', 'us')
+                and arrow_type.tz in (None, 'UTC')):
+            return _str_timestamps
+    return None
+
+
+class RecordTransformer():
+    """
+    Transforms records the same way as singer.Transformer().transform(record,
+    schema, metadata), but resolves the selection and the coercion of each
+    top level field of the stream once, up front, instead of walking the
+    metadata and the schema again for every record.
+
+    Schemas that can't be compiled (e.g. a top level anyOf or no properties)
+    are transformed by singer.Transformer as before.
+    """
+
+    def __init__(self, stream):
+        self.schema = stream['schema']
+        self.mdata = metadata.to_map(stream.get('metadata', []))
+        self.transformer = Transformer()
+
+        # field name -> coercion function, or None if the field isn't selected
+        self.nested_fields = set()
+        self.fields = self._compile_fields()
+
+        # (field name, Arrow type) -> column conversion, see transform_batch()
+        self.column_conversions = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.transformer.log_warning()
+
+    @property
+    def selected_fields(self):
+        """
+        The names of the top level fields kept by transform(), or None if
+        every field of the record has to be read.
+        """
+        if self.fields is None:
+            return None
+        return {field for field, coerce in self.fields.items() if coerce is not None}
+
+    def _compile_fields(self):
+        types = self.schema.get('type', [])
+        if not isinstance(types, list):
+            types = [types]
+        properties = self.schema.get('properties')
+        if ('object' not in types or not properties
+                or SchemaKey.any_of in self.schema or SchemaKey.pattern_properties in self.schema):
+            return None
+
+        nested_breadcrumbs = {breadcrumb[1] for breadcrumb in self.mdata if len(breadcrumb) > 2}
+        fields = {}
+        for field, field_schema in properties.items():
+            breadcrumb = ('properties', field)
+            selected = metadata.get(self.mdata, breadcrumb, 'selected')
+            inclusion = metadata.get(self.mdata, breadcrumb, 'inclusion')
+            if inclusion != 'automatic' and (selected is False or inclusion == 'unsupported'):
+                fields[field] = None
+                continue
+
+            coerce = self._compile_schema(field_schema, [field])
+            if field in nested_breadcrumbs:
+                coerce = self._filter_nested(coerce, breadcrumb)
+                self.nested_fields.add(field)
+            fields[field] = coerce
+        return fields
+
+    def _filter_nested(self, coerce, breadcrumb):
+        def filter_and_coerce(data):
+            return coerce(self.transformer.filter_data_by_metadata(data, self.mdata, breadcrumb))
+        return filter_and_coerce
+
+    def _compile_schema(self, schema, path):
+        if SchemaKey.any_of in schema:
+            return lambda data: self.transformer.transform_recur(data, schema, path)
+
+        if "type" not in schema:
+            # indicates no typing information so don't bother transforming it
+            return lambda data: (True, data)
+
+        types = schema["type"]
+        if not isinstance(types, list):
+            types = [types]
+
+        # "null" is always tried last
+        types = [typ for typ in types if typ != "null"] + (["null"] if "null" in types else [])
+        coercions = [self._compile_type(typ, schema, path) for typ in types]
+
+        def coerce(data):
+            for coerce_type in coercions:
+                success, transformed_data = coerce_type(data)
+                if success:
+                    return success, transformed_data
+            self.transformer.errors.append(Error(path, data, schema, logging_level=LOGGER.level))
+            return False, None
+        return coerce
+
+    def _compile_type(self, typ, schema, path):
+        if typ == "string" and schema.get("format"):
+            return lambda data: self.transformer._transform(data, typ, schema, path)
+
+        coercion = {
+            "null": _coerce_null,
+            "string": _coerce_string,
+            "integer": _coerce_integer,
+            "number": _coerce_number,
+            "boolean": _coerce_boolean
+        }.get(typ)
+        if coercion:
+            return coercion
+
+        # objects, arrays and unknown types
+        return lambda data: self.transformer._transform(data, typ, schema, path)
+
+    def transform(self, record):
+        # A SchemaMismatch only reports the errors of the record that raised it
+        self.transformer.errors = []
+        if self.fields is None:
+            return self.transformer.transform(record, self.schema, self.mdata)
+
+        result = {}
+        filtered = []
+        successes = True
+        for field, value in record.items():
+            if field not in self.fields:
+                self.transformer.removed.add(field)
+                continue
+
+            coerce = self.fields[field]
+            if coerce is None:
+                self.transformer.filtered.add(field)
+                filtered.append(field)
+                continue
+
+            success, result[field] = coerce(value)
+            successes = successes and success
+
+        # Like singer.Transformer, deselected fields are popped from the
+        # record, so that they aren't taken for fields missing from the catalog
+        for field in filtered:
+            del record[field]
+
+        if not successes:
+            raise SchemaMismatch(self.transformer.errors)
+
+        return result
+
+    def _compile_column_conversion(self, field, arrow_type):
+        schema = self.schema['properties'][field]
+        if field in self.nested_fields or SchemaKey.any_of in schema:
+            return None
+        if "type" not in schema:
+            return lambda column: column.to_pylist()
+
+        types = schema["type"]
+        if not isinstance(types, list):
+            types = [types]
+        types = [typ for typ in types if typ != "null"] + (["null"] if "null" in types else [])
+        if types[0] == "null":
+            return None
+
+        # Work out what a null is coerced to, trying each type in turn like coerce() does
+        nullable, null_value = False, None
+        for typ in types:
+            if typ == "boolean":
+                nullable, null_value = True, False
+                break
+            if typ == "null":
+                nullable = True
+                break
+            if typ not in ("string", "integer", "number"):
+                return None
+
+        convert = _get_column_conversion(types[0], schema, arrow_type)
+        if convert is None:
+            return None
+
+        def convert_column(column):
+            if not column.null_count:
+                return convert(column)
+            if not nullable:
+                return None
+            values = convert(column)
+            if null_value is not None:
+                values = [null_value if value is None else value for value in values]
+            return values
+        return convert_column
+
+    def _transform_column(self, field, column):
+        key = (field, column.type)
+        if key not in self.column_conversions:
+            self.column_conversions[key] = self._compile_column_conversion(field, column.type)
+
+        conversion = self.column_conversions[key]
+        values = conversion(column) if conversion else None
+        if values is not None:
+            return values
+
+        coerce = self.fields[field]
+        values = []
+        successes = True
+        for value in column.to_pylist():
+            success, value = coerce(value)
+            values.append(value)
+            successes = successes and success
+
+        if not successes:
+            raise SchemaMismatch(self.transformer.errors)
+
+        return values
+
+    def transform_batch(self, batch):
+        """
+        Transforms each row of a pyarrow RecordBatch like transform(), but a
+        column at a time. Columns whose Arrow type already matches their
+        schema are converted by Arrow, without coercing each value.
+        """
+        if self.fields is None:
+            return [self.transform(row) for row in batch.to_pylist()]
+
+        self.transformer.errors = []
+
+        fields = []
+        columns = []
+        for field, column in zip(batch.schema.names, batch.columns):
+            if field not in self.fields:
+                self.transformer.removed.add(field)
+                continue
+
+            if self.fields[field] is None:
+                self.transformer.filtered.add(field)
+                continue
+
+            fields.append(field)
+            columns.append(self._transform_column(field, column))
+
+        if not columns:
+            return [{} for _ in range(batch.num_rows)]
+
+        return [dict(zip(fields, values)) for values in zip(*columns)]
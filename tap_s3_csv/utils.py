@@ -1,5 +1,37 @@
+import bz2
 import gzip
+import io
+import itertools
+import lzma
+import os
+import queue
+import re
+import shutil
 import struct
+import tarfile
+import tempfile
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from tap_s3_csv import parallel_gzip
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    from re import _parser as sre_parse
+except ImportError: # Python < 3.11
+    import sre_parse # pylint: disable=deprecated-module
+
+# Besides gz, files with these extensions are decompressed as streams
+COMPRESSION_EXTENSIONS = ["bz2", "xz", "zst"]
+
+# Alternations with more literal prefixes than this are listed by their
+# common prefix instead, to avoid issuing a listing per alternative.
+MAX_LITERAL_PREFIXES = 20
 
 
 def get_file_name_from_gzfile(filename=None, fileobj=None):
@@ -44,6 +76,257 @@ def get_file_name_from_gzfile(filename=None, fileobj=None):
 
     return None
 
+class ReplayableStream():
+    """Wraps a forward-only stream (e.g. an S3 StreamingBody) and keeps the
+    bytes read from it until replay() is called, after which they are read
+    again before the rest of the stream. Used to parse the gzip header
+    without reading the whole object into memory."""
+
+    def __init__(self, fileobj):
+        self._fileobj = fileobj
+        self._buffer = bytearray()
+        self._recording = True
+
+    def _read_from_stream(self, size):
+        if size is None or size < 0:
+            return self._fileobj.read()
+        return self._fileobj.read(size)
+
+    def read(self, size=-1):
+        if self._recording:
+            data = self._read_from_stream(size)
+            self._buffer += data
+            return data
+
+        if not self._buffer:
+            return self._read_from_stream(size)
+
+        if size is None or size < 0:
+            data = bytes(self._buffer) + self._read_from_stream(size)
+            self._buffer = bytearray()
+            return data
+
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+    def read_start(self, size):
+        """Returns the first `size` bytes of the stream, which must not be
+        replayed yet."""
+        if len(self._buffer) < size:
+            self.read(size - len(self._buffer))
+        return bytes(self._buffer[:size])
+
+    def replay(self):
+        self._recording = False
+
+
+def open_gz_file(fileobj, threads=1, default_name=None):
+    """Returns the original file name from the gzip header of `fileobj`
+    along with a GzipFile that decompresses it incrementally, or, if
+    `threads` is more than 1, a file object that decompresses it with more
+    threads (see parallel_gzip).
+
+    BGZF files never store the original file name, so `default_name` is
+    returned for them, if given. Raises AttributeError if the header of any
+    other file has no file name (see get_file_name_from_gzfile)."""
+    stream = ReplayableStream(fileobj)
+    try:
+        gz_file_name = get_file_name_from_gzfile(fileobj=stream)
+    except AttributeError:
+        if default_name is None or not parallel_gzip.is_bgzf(stream.read_start(parallel_gzip.BGZF_HEADER_SIZE)):
+            raise
+        gz_file_name = default_name
+    stream.replay()
+    if threads > 1:
+        return gz_file_name, parallel_gzip.open_gzip_file(stream, threads)
+    return gz_file_name, gzip.GzipFile(fileobj=stream)
+
+
+def open_compressed_file(fileobj, extension):
+    """Returns a file object that decompresses the bz2, xz or zst stream
+    `fileobj` incrementally. zst files need the optional `zstandard`
+    package, see is_supported_compression()."""
+    if extension == "bz2":
+        return bz2.BZ2File(fileobj)
+    if extension == "xz":
+        return lzma.LZMAFile(fileobj)
+    # The zstandard reader can't be iterated line by line, so it's buffered
+    return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(fileobj, read_across_frames=True))
+
+
+def is_supported_compression(extension):
+    return extension != "zst" or zstandard is not None
+
+
+def get_tar_members(fileobj):
+    """Yields the name and file object of each regular file in a tar archive,
+    compressed or not. The archive is read from `fileobj` as a stream, without
+    seeking or buffering it whole, so each member has to be read before the
+    next one is yielded."""
+    with tarfile.open(fileobj=fileobj, mode='r|*') as tar_file:
+        for member in tar_file:
+            if member.isfile():
+                yield member.name, tar_file.extractfile(member)
+
+
+def spool_to_tempfile(fileobj):
+    """Copies a stream to a temporary file on disk, for readers that need
+    random access (e.g. Parquet) to a file that is only streamable."""
+    temp_file = tempfile.TemporaryFile()
+    shutil.copyfileobj(fileobj, temp_file)
+    temp_file.seek(0)
+    return temp_file
+
+
+def ordered_concurrent_map(func, items, max_workers):
+    """Yields func(item) for each item, in order, running up to `max_workers`
+    calls at once. Unlike Executor.map(), an item is only submitted once the
+    caller is done with a result, so no more than `max_workers` results,
+    including the one being consumed, are held in memory when the consumer
+    is slower than the workers."""
+    items = iter(items)
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        pending = deque(executor.submit(func, item) for item in itertools.islice(items, max_workers))
+        while pending:
+            yield pending.popleft().result()
+
+            for item in itertools.islice(items, 1):
+                pending.append(executor.submit(func, item))
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+_END = object()
+
+
+def _put_until_stopped(values, value, stopped):
+    while not stopped.is_set():
+        try:
+            values.put(value, timeout=0.1)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def _queue_values(func, item, values, stopped):
+    try:
+        for value in func(item):
+            if not _put_until_stopped(values, value, stopped):
+                return
+    finally:
+        _put_until_stopped(values, _END, stopped)
+
+
+def ordered_concurrent_chain(func, items, max_workers, queue_size):
+    """Yields the values of the iterable func(item) for each item, in order,
+    iterating up to `max_workers` of them at once. Each iterable is read at
+    most `queue_size` values ahead of the consumer, and its thread gives up
+    once the consumer stops, so stopping early neither waits for the
+    iterables to be exhausted nor holds them in memory."""
+    items = iter(items)
+    stopped = threading.Event()
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def submit(item):
+        values = queue.Queue(queue_size)
+        return values, executor.submit(_queue_values, func, item, values, stopped)
+
+    try:
+        pending = deque(submit(item) for item in itertools.islice(items, max_workers))
+        while pending:
+            values, future = pending.popleft()
+
+            # Keep the pool busy while the caller consumes these values
+            for item in itertools.islice(items, 1):
+                pending.append(submit(item))
+
+            yield from iter(values.get, _END)
+            # Raises the error that ended the iterable, if any
+            future.result()
+    finally:
+        stopped.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def get_literal_prefixes(pattern):
+    """Returns the sorted list of literal key prefixes that every key matched
+    by `pattern` (with re.search) must start with, or None if the pattern
+    isn't anchored to the start of the key and so can match anywhere in it.
+
+    e.g. "^exports/(orders|refunds)/.*\\.csv" -> ["exports/orders/", "exports/refunds/"]
+    """
+    parsed = sre_parse.parse(pattern)
+    if parsed.state.flags & (re.IGNORECASE | re.MULTILINE):
+        return None
+
+    prefixes = _get_anchored_prefixes(list(parsed))
+    if not prefixes or '' in prefixes:
+        return None
+
+    if len(prefixes) > MAX_LITERAL_PREFIXES:
+        common_prefix = os.path.commonprefix(prefixes)
+        return [common_prefix] if common_prefix else None
+
+    # Drop prefixes already covered by a shorter one
+    literal_prefixes = []
+    for prefix in sorted(prefixes):
+        if not literal_prefixes or not prefix.startswith(literal_prefixes[-1]):
+            literal_prefixes.append(prefix)
+    return literal_prefixes
+
+
+def _get_anchored_prefixes(tokens):
+    if not tokens:
+        return None
+    op, av = tokens[0]
+    if op == sre_parse.AT and av in (sre_parse.AT_BEGINNING, sre_parse.AT_BEGINNING_STRING):
+        return [prefix for prefix, _ in _get_literal_prefixes(tokens[1:])]
+
+    # e.g. "^foo|^bar" or "(^foo)" - every alternative has to be anchored
+    if op == sre_parse.BRANCH:
+        alternatives = [list(item) + tokens[1:] for item in av[1]]
+    elif op == sre_parse.SUBPATTERN and not av[1] & re.IGNORECASE:
+        alternatives = [list(av[-1]) + tokens[1:]]
+    else:
+        return None
+
+    prefixes = []
+    for alternative in alternatives:
+        alternative_prefixes = _get_anchored_prefixes(alternative)
+        if alternative_prefixes is None:
+            return None
+        prefixes.extend(alternative_prefixes)
+    return prefixes
+
+
+def _get_literal_prefixes(tokens):
+    """Returns (prefix, is_complete) tuples for the literal prefixes of
+    `tokens`, where is_complete means that the whole of `tokens` is literal,
+    so the prefix can be extended by the tokens that follow."""
+    prefixes = [('', True)]
+    for op, av in tokens:
+        if op == sre_parse.LITERAL:
+            alternatives = [(chr(av), True)]
+        elif op == sre_parse.IN and all(item_op == sre_parse.LITERAL for item_op, _ in av):
+            alternatives = [(chr(item_av), True) for _, item_av in av]
+        elif op == sre_parse.BRANCH:
+            alternatives = [prefix for item in av[1] for prefix in _get_literal_prefixes(item)]
+        elif op == sre_parse.SUBPATTERN and not av[1] & re.IGNORECASE:
+            alternatives = _get_literal_prefixes(av[-1])
+        else:
+            return [(prefix, False) for prefix, _ in prefixes]
+
+        prefixes = [(prefix + alternative, is_complete)
+                    for prefix, _ in prefixes
+                    for alternative, is_complete in alternatives]
+        if len(prefixes) > MAX_LITERAL_PREFIXES or not all(is_complete for _, is_complete in prefixes):
+            return [(prefix, False) for prefix, _ in prefixes]
+    return prefixes
+
+
 def _read_exact(fp, n):
     """This is the gzip.GzipFile._read_exact() method from the
     Python library.
@@ -56,3 +339,14 @@ def _read_exact(fp, n):
                            "end-of-stream marker was reached")
         data += b
     return data
+
+def get_positive_int(config, key, default):
+    """Returns the config value for `key` as a positive integer.
+
+    Config values may arrive as strings, so "" / "0" / 0 and a missing key all
+    fall back to `default`.
+    """
+    config_value = config.get(key)
+    if config_value and int(config_value) > 0:
+        return int(config_value)
+    return default
@@ -9,7 +9,7 @@ class S3CompressedGZTarGZFile(S3CSVBaseTest):
         return ["sample_compressed_gz_file.gz","sample_compressed_tar_file.tar.gz"]
 
     def name(self):
-        return "test_targz_not_considered_with_gz"
+        return "test_targz_synced_with_gz"
 
     def expected_check_streams(self):
         return {
@@ -41,7 +41,8 @@ class S3CompressedGZTarGZFile(S3CSVBaseTest):
 
         self.run_and_verify_sync(self.conn_id)
 
-        expected_records = 998
+        # 998 records of the gz file and 998 + 985 records of the two csv members of the tar.gz file
+        expected_records = 2981
         # Verify actual rows were synced
         records  = runner.get_upserts_from_target_output()
 
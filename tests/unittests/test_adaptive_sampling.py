@@ -0,0 +1,102 @@
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+from unittest import mock
+
+from voluptuous import Invalid
+
+from tap_s3_csv import s3
+from tap_s3_csv import sampling
+from tap_s3_csv.config import CONFIG_CONTRACT
+
+S3_FILES = [{'key': 'file{}.csv'.format(i), 'last_modified': datetime(2024, 1, day), 'etag': '"{}"'.format(i), 'size': 10}
+            for i, day in enumerate([3, 1, 5, 2, 4])]
+
+
+def mock_get_files_to_sample(config, s3_files, max_files, zip_files=None):
+    return [{"s3_path": s3_file['key'], "file_handle": None, "extension": "csv"} for s3_file in s3_files][:max_files]
+
+
+def mock_sample_file(table_spec, s3_path, file_handle, sample_rate, extension, max_records=1000):
+    if s3_path == 'file4.csv':
+        yield {'id': '1', 'extra': 'x'}
+    else:
+        yield from ({'id': str(i)} for i in range(max_records))
+
+
+class TestOrderFilesToSample(unittest.TestCase):
+
+    def get_keys(self, strategy):
+        table_spec = {'table_name': 'test', 'sample_strategy': strategy}
+        return [s3_file['key'] for s3_file in sampling.order_files_to_sample(iter(S3_FILES), table_spec)]
+
+    def test_first_keeps_listing_order(self):
+        self.assertEqual(['file0.csv', 'file1.csv', 'file2.csv', 'file3.csv', 'file4.csv'], self.get_keys('first'))
+
+    def test_newest_and_oldest(self):
+        self.assertEqual(['file2.csv', 'file4.csv', 'file0.csv', 'file3.csv', 'file1.csv'], self.get_keys('newest'))
+        self.assertEqual(['file1.csv', 'file3.csv', 'file0.csv', 'file4.csv', 'file2.csv'], self.get_keys('oldest'))
+
+    def test_spread_alternates_newest_oldest_and_random(self):
+        keys = self.get_keys('spread')
+
+        self.assertEqual(['file2.csv', 'file1.csv'], keys[:2])
+        self.assertEqual(sorted(keys), [s3_file['key'] for s3_file in S3_FILES])
+
+    def test_random_orders_are_repeatable(self):
+        self.assertEqual(self.get_keys('random'), self.get_keys('random'))
+        self.assertEqual(sorted(self.get_keys('random')), [s3_file['key'] for s3_file in S3_FILES])
+
+    def test_unknown_strategies_are_rejected(self):
+        table_spec = {'table_name': 'test', 'search_pattern': 'csv', 'key_properties': [], 'sample_strategy': 'last'}
+
+        with self.assertRaises(Invalid):
+            CONFIG_CONTRACT([table_spec])
+
+
+@mock.patch("tap_s3_csv.s3.sample_file", side_effect=mock_sample_file)
+@mock.patch("tap_s3_csv.s3.get_files_to_sample", side_effect=mock_get_files_to_sample)
+class TestAdaptiveSampling(unittest.TestCase):
+
+    def test_table_sampling_parameters_are_used(self, mocked_get_files_to_sample, mocked_sample_file):
+        table_spec = {'sample_rate': 2, 'max_records': 3, 'max_files': 2}
+
+        samples = list(s3.sample_files({}, table_spec, S3_FILES))
+
+        self.assertEqual(6, len(samples))
+        mocked_get_files_to_sample.assert_called_once_with({}, S3_FILES, 2, mock.ANY)
+        self.assertEqual(2, mocked_sample_file.call_args[0][3])
+
+    def test_sampling_stops_once_schema_is_stable(self, mocked_get_files_to_sample, mocked_sample_file):
+        table_spec = {'max_records': 3, 'sample_stable_files': 2}
+
+        list(s3.sample_files({}, table_spec, S3_FILES))
+
+        self.assertEqual(['file0.csv', 'file1.csv', 'file2.csv'],
+                         [call[0][1] for call in mocked_sample_file.call_args_list])
+
+    def test_file_changing_schema_resets_stability(self, mocked_get_files_to_sample, mocked_sample_file):
+        table_spec = {'table_name': 'test', 'max_records': 3, 'sample_stable_files': 2, 'sample_strategy': 'newest'}
+
+        list(s3.sample_files({}, table_spec, S3_FILES))
+
+        # file4.csv adds the "extra" column, so two more files are sampled after it
+        self.assertEqual(['file2.csv', 'file4.csv', 'file0.csv', 'file3.csv'],
+                         [call[0][1] for call in mocked_sample_file.call_args_list])
+
+    def test_cached_sampling_stops_once_schema_is_stable(self, mocked_get_files_to_sample, mocked_sample_file):
+        cache_path = tempfile.mkdtemp()
+        try:
+            config = {'bucket': 'test', 'schema_cache_path': cache_path}
+            table_spec = {'max_records': 3, 'sample_stable_files': 2}
+            cache = s3.SchemaCache(cache_path)
+
+            records_count, observations = s3.sample_files_with_cache(config, table_spec, S3_FILES, cache)
+            cached = s3.sample_files_with_cache(config, table_spec, S3_FILES, cache)
+        finally:
+            shutil.rmtree(cache_path)
+
+        self.assertEqual(9, records_count)
+        self.assertEqual((records_count, observations), cached)
+        self.assertEqual(3, mocked_sample_file.call_count)
@@ -27,15 +27,6 @@ class ZipFileMocked(zipfile.ZipFile):
         self.name = name
 
 
-def mockclass():
-    class Transformer():
-        def __init__(self):
-            pass
-        def transform(self,rec,schema,matadata):
-            return rec
-    return Transformer()
-
-
 class TestCompressedFileSupport(unittest.TestCase):
 
     @mock.patch("tap_s3_csv.s3.get_file_handle")
@@ -51,9 +42,8 @@ class TestCompressedFileSupport(unittest.TestCase):
         self.assertListEqual([], files)
 
 
-    @mock.patch("tap_s3_csv.s3.get_file_handle")
-    @mock.patch("singer_encodings.compression.infer")
-    def test_sampling_of_zip_file(self, mocked_infer, mocked_get_file_handle):
+    @mock.patch("tap_s3_csv.s3.get_s3fs_file_handle")
+    def test_sampling_of_zip_file(self, mocked_get_s3fs_file_handle):
         config = {}
 
         sample_key = { "key" : "unittest_compressed_files/sample_compressed_zip_mixer_files.zip" }
@@ -63,10 +53,9 @@ class TestCompressedFileSupport(unittest.TestCase):
 
         expected_extensions = ["csv","gz","jsonl"]
 
-        with zipfile.ZipFile(zip_file_path, "r") as zip_file:
+        with open(zip_file_path, "rb") as zip_file:
 
-            mocked_get_file_handle.return_value = zip_file.fp
-            mocked_infer.return_value = [zip_file.open(file) for file in zip_file.namelist()]
+            mocked_get_s3fs_file_handle.return_value = zip_file
             files = s3.get_files_to_sample(config, [sample_key], 5)
 
             self.assertTrue(all([True for file in files if file["file_handle"].name.split(".")[-1].lower() in expected_extensions]))
@@ -234,7 +223,7 @@ class TestCompressedFileSupport(unittest.TestCase):
 @mock.patch("tap_s3_csv.sync.LOGGER.warning")
 class TestUnsupportedFiles(unittest.TestCase):
 
-    def mock_get_files_to_sample_csv(config, s3_files, max_files):
+    def mock_get_files_to_sample_csv(config, s3_files, max_files, zip_files=None):
         gz_file_path = get_resources_path("gz_stored_as_csv.csv", COMPRESSION_FOLDER_PATH)
 
         with gzip.GzipFile(gz_file_path) as gz_file:
@@ -246,7 +235,7 @@ class TestUnsupportedFiles(unittest.TestCase):
     def mock_csv_sample_file(table_spec, s3_path, file_handle, sample_rate, extension, max_records=1000):
         raise UnicodeDecodeError("test",b"'utf-8' codec can't decode byte 0x8b in position 1: invalid start byte",42, 43, 'the universe and everything else')
 
-    def mock_get_files_to_sample_jsonl(config, s3_files, max_files):
+    def mock_get_files_to_sample_jsonl(config, s3_files, max_files, zip_files=None):
         gz_file_path = get_resources_path("gz_stored_as_jsonl.jsonl", COMPRESSION_FOLDER_PATH)
 
         with gzip.GzipFile(gz_file_path) as gz_file:
@@ -267,39 +256,36 @@ class TestUnsupportedFiles(unittest.TestCase):
 
         actual_output = s3.get_files_to_sample(config, [sample_key], 5)
 
-        self.assertEqual(0,len(actual_output))
+        self.assertEqual(1,len(actual_output))
+        self.assertEqual("gz", actual_output[0]["extension"])
 
-        mocked_logger.assert_called_with('Skipping "%s" file as .tar.gz extension is not supported',sample_key["key"])
 
-
-    @mock.patch("singer_encodings.compression.infer")
-    @mock.patch("tap_s3_csv.s3.get_file_handle")
-    def test_get_files_for_samples_of_zip_contains_tar_gz_file(self, mocked_file_handle, mocked_infer, mocked_logger):
+    @mock.patch("tap_s3_csv.s3.get_s3fs_file_handle")
+    def test_get_files_for_samples_of_zip_contains_tar_gz_file(self, mocked_file_handle, mocked_logger):
         config = {}
         sample_key = { "key" : "unittest_compressed_files/sample_compressed.zip" }
         mocked_file_handle.return_value = None
 
         zip_file_path = get_resources_path("sample_compressed_zip_contains_tar_gz_file.zip", COMPRESSION_FOLDER_PATH)
-        with zipfile.ZipFile(zip_file_path, "r") as zip_file:
+        with open(zip_file_path, "rb") as zip_file:
 
-            mocked_file_handle.return_value = zip_file.fp
-            mocked_infer.return_value = [zip_file.open(file) for file in zip_file.namelist()]
+            mocked_file_handle.return_value = zip_file
             actual_output = s3.get_files_to_sample(config, [sample_key], 5)
             self.assertEqual(0,len(actual_output))
 
 
     def test_sampling_of_tar_gz_file_samples(self, mocked_logger):
         table_spec = {}
-        file_handle = None
         s3_path = "unittest_compressed_files/sample_compressed.tar.gz"
         sample_rate = 5
         extension = "gz"
 
-        actual_output = [sample for sample in s3.sample_file(table_spec, s3_path, file_handle, sample_rate, extension)]
-
-        self.assertTrue(len(actual_output)==0)
+        tar_file_path = get_resources_path("sample_compressed_tar_file.tar.gz", CSV_FOLDER_PATH)
+        with open(tar_file_path, "rb") as file_handle:
+            actual_output = [sample for sample in s3.sample_file(table_spec, s3_path, file_handle, sample_rate, extension)]
 
-        mocked_logger.assert_called_with('Skipping "%s" file as .tar.gz extension is not supported',s3_path)
+        # Every 5th of the 998 and 985 records of the two csv members
+        self.assertEqual(200 + 197, len(actual_output))
 
 
     def test_sampling_of_unsupported_file_samples(self, mocked_logger):
@@ -388,7 +374,7 @@ class TestUnsupportedFiles(unittest.TestCase):
         table_spec = {}
         s3_files = "unittest_compressed_files/gz_stored_as_csv.csv"
         sample_rate = 5
-        config = []
+        config = {}
 
 
         actual_output = [sample for sample in s3.sample_files(config, table_spec, s3_files, sample_rate)]
@@ -406,7 +392,7 @@ class TestUnsupportedFiles(unittest.TestCase):
         table_spec = {}
         s3_files = "unittest_compressed_files/gz_stored_as_jsonl.jsonl"
         sample_rate = 5
-        config = []
+        config = {}
 
 
         actual_output = [sample for sample in s3.sample_files(config, table_spec, s3_files, sample_rate)]
@@ -532,17 +518,22 @@ class TestUnsupportedFiles(unittest.TestCase):
         mocked_logger.assert_called_with('Skipping %s file as parsing failed. Verify an extension of the file.',s3_path)
         self.assertEqual(0, records)
 
-    def test_syncing_tar_gz_file(self, mocked_logger):
+    @mock.patch("tap_s3_csv.sync.sync_csv_file", side_effect=lambda config, file_handle, s3_path, table_spec, stream: len(file_handle.readlines()) - 1)
+    @mock.patch("tap_s3_csv.s3.get_file_handle")
+    def test_syncing_tar_gz_file(self, mocked_file_handle, mocked_sync_csv_file, mocked_logger):
         config = {}
         table_spec = {}
         s3_path = "unittest_compressed_files/sample_compressed.tar.gz"
         extension = "gz"
 
-        records = sync.handle_file(config, s3_path, table_spec, {}, extension)
-
-        self.assertTrue(records == 0)
+        tar_file_path = get_resources_path("sample_compressed_tar_file.tar.gz", CSV_FOLDER_PATH)
+        with open(tar_file_path, "rb") as file_handle:
+            mocked_file_handle.return_value = file_handle
+            records = sync.handle_file(config, s3_path, table_spec, {}, extension)
 
-        mocked_logger.assert_called_with('Skipping "%s" file as .tar.gz extension is not supported',s3_path)
+        self.assertEqual(998 + 985, records)
+        self.assertEqual([s3_path + "/csv_files/sample_csv_file_01.csv", s3_path + "/csv_files/sample_csv_file_02.csv"],
+                         [call.args[2] for call in mocked_sync_csv_file.call_args_list])
 
     def test_syncing_gz_file_of_file_gzip_using_no_name(self, mocked_logger):
         config = {"bucket" : "bucket_name"}
@@ -651,12 +642,11 @@ class TestUnsupportedFiles(unittest.TestCase):
         mocked_logger.assert_called_with('"%s" having the ".%s" extension will not be sampled.',sample_key["key"],extension)
 
 
-@mock.patch("singer.Transformer",side_effect=mockclass)
-@mock.patch("singer.write_record")
+@mock.patch("tap_s3_csv.output.write_record")
 class TestSyncingCompressedFiles(unittest.TestCase):
 
 
-    def test_syncing_gz_file_contains_csv(self, mocked_write_record, mock_class):
+    def test_syncing_gz_file_contains_csv(self, mocked_write_record):
         config = {"bucket" : "bucket_name"}
         table_spec = { "table_name" : "GZ_CSV_DATA"}
 
@@ -676,7 +666,7 @@ class TestSyncingCompressedFiles(unittest.TestCase):
             self.assertTrue(records == 998)
 
 
-    def test_syncing_gz_file_contains_jsonl(self, mocked_write_record, mock_class):
+    def test_syncing_gz_file_contains_jsonl(self, mocked_write_record):
         config = {"bucket" : "bucket_name"}
         table_spec = { "table_name" : "GZ_JSONL_DATA"}
 
@@ -696,7 +686,7 @@ class TestSyncingCompressedFiles(unittest.TestCase):
             self.assertTrue(records == 2)
 
 
-    def test_syncing_csv_file(self, mocked_write_record, mock_class):
+    def test_syncing_csv_file(self, mocked_write_record):
         config = {"bucket" : "bucket_name"}
         table_spec = { "table_name" : "CSV_DATA"}
 
@@ -716,7 +706,7 @@ class TestSyncingCompressedFiles(unittest.TestCase):
             self.assertTrue(records == 998)
 
 
-    def test_syncing_jsonl_file(self, mocked_write_record, mock_class):
+    def test_syncing_jsonl_file(self, mocked_write_record):
         config = {"bucket" : "bucket_name"}
         table_spec = { "table_name" : "JSONL_DATA"}
 
@@ -736,9 +726,8 @@ class TestSyncingCompressedFiles(unittest.TestCase):
             self.assertTrue(records == 11)
 
 
-    @mock.patch("singer_encodings.compression.infer")
-    @mock.patch("tap_s3_csv.s3.get_file_handle")
-    def test_syncing_zip_file_for_csv(self, mocked_file_handle, mocked_infer, mocked_write_record, mock_class):
+    @mock.patch("tap_s3_csv.s3.get_s3fs_file_handle")
+    def test_syncing_zip_file_for_csv(self, mocked_file_handle, mocked_write_record):
         config = {"bucket" : "bucket_name"}
         table_spec = { "table_name" : "ZIP_DATA"}
 
@@ -750,18 +739,16 @@ class TestSyncingCompressedFiles(unittest.TestCase):
 
         zip_file_path = get_resources_path("sample_compressed_zip_mixer_files.zip", CSV_FOLDER_PATH)
 
-        with zipfile.ZipFile(zip_file_path, "r") as zip_file:
+        with open(zip_file_path, "rb") as zip_file:
 
-            mocked_file_handle.return_value = zip_file.fp
-            mocked_infer.return_value = [zip_file.open(file) for file in zip_file.namelist()]
+            mocked_file_handle.return_value = zip_file
             records = sync.sync_compressed_file(config, s3_path, table_spec, stream)
 
             self.assertTrue(records == 1983)
 
 
-    @mock.patch("singer_encodings.compression.infer")
-    @mock.patch("tap_s3_csv.s3.get_file_handle")
-    def test_syncing_zip_file_for_jsonl(self, mocked_file_handle, mocked_infer, mocked_write_record, mock_class):
+    @mock.patch("tap_s3_csv.s3.get_s3fs_file_handle")
+    def test_syncing_zip_file_for_jsonl(self, mocked_file_handle, mocked_write_record):
         config = {"bucket" : "bucket_name"}
         table_spec = { "table_name" : "ZIP_DATA"}
 
@@ -773,10 +760,9 @@ class TestSyncingCompressedFiles(unittest.TestCase):
 
         zip_file_path = get_resources_path("sample_compressed_zip_mixer_files.zip", JSONL_FOLDER_PATH)
 
-        with zipfile.ZipFile(zip_file_path, "r") as zip_file:
+        with open(zip_file_path, "rb") as zip_file:
 
-            mocked_file_handle.return_value = zip_file.fp
-            mocked_infer.return_value = [zip_file.open(file) for file in zip_file.namelist()]
+            mocked_file_handle.return_value = zip_file
             records = sync.sync_compressed_file(config, s3_path, table_spec, stream)
 
             self.assertTrue(records == 4)
@@ -0,0 +1,38 @@
+import threading
+import time
+import unittest
+from unittest import mock
+
+from tap_s3_csv import discover
+
+TABLES = [{'table_name': 'table_{}'.format(i), 'search_pattern': 'table_{}'.format(i), 'key_properties': []}
+          for i in range(5)]
+
+
+def mock_get_sampled_schema_for_table(config, table_spec):
+    index = int(table_spec['table_name'].split('_')[1])
+    # Earlier tables take longer, so workers finish out of order
+    time.sleep(0.01 * (5 - index))
+    return {'type': 'object', 'properties': {'column_{}'.format(index): {'type': ['null', 'string']}},
+            'thread': threading.get_ident()}
+
+
+class TestConcurrentDiscovery(unittest.TestCase):
+
+    @mock.patch("tap_s3_csv.s3.get_sampled_schema_for_table", side_effect=mock_get_sampled_schema_for_table)
+    def test_catalog_is_the_same_as_serial_discovery(self, mocked_get_sampled_schema_for_table):
+        serial_streams = discover.discover_streams({'tables': TABLES})
+        concurrent_streams = discover.discover_streams({'tables': TABLES, 'discovery_concurrency': '3'})
+
+        for stream in serial_streams + concurrent_streams:
+            stream['schema'].pop('thread')
+        self.assertEqual(serial_streams, concurrent_streams)
+        self.assertEqual([table['table_name'] for table in TABLES],
+                         [stream['tap_stream_id'] for stream in concurrent_streams])
+
+    @mock.patch("tap_s3_csv.s3.get_sampled_schema_for_table", side_effect=mock_get_sampled_schema_for_table)
+    def test_tables_are_sampled_concurrently(self, mocked_get_sampled_schema_for_table):
+        streams = discover.discover_streams({'tables': TABLES, 'discovery_concurrency': 3})
+
+        self.assertGreater(len({stream['schema']['thread'] for stream in streams}), 1)
+        self.assertNotIn(threading.get_ident(), {stream['schema']['thread'] for stream in streams})
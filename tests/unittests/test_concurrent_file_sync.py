@@ -0,0 +1,117 @@
+import threading
+import time
+import unittest
+from datetime import datetime
+from unittest import mock
+
+from tap_s3_csv import s3
+from tap_s3_csv import sync
+
+
+def mock_sync_table_file(config, s3_path, table_spec, stream):
+    # Earlier files take longer, so workers finish out of order
+    time.sleep(0.05 if s3_path == "file1.csv" else 0)
+    for i in range(2):
+        sync.write_record(table_spec['table_name'], {"file": s3_path, "row": i})
+    return 2
+
+
+class TestSyncFilesConcurrently(unittest.TestCase):
+
+    @mock.patch("tap_s3_csv.sync.sync_table_file", side_effect=mock_sync_table_file)
+    @mock.patch("tap_s3_csv.output.write_record")
+    def test_records_written_in_file_order(self, mocked_write_record, mocked_sync_table_file):
+        s3_files = [{"key": "file{}.csv".format(i)} for i in range(1, 4)]
+
+        synced_files = list(sync.sync_files_concurrently({}, s3_files, {"table_name": "table"}, {}, 3))
+
+        self.assertEqual([(s3_file, 2) for s3_file in s3_files], synced_files)
+        written = [call.args[1] for call in mocked_write_record.call_args_list]
+        self.assertEqual([{"file": s3_file["key"], "row": i} for s3_file in s3_files for i in range(2)], written)
+
+    @mock.patch("tap_s3_csv.sync.RECORD_QUEUE_SIZE", 5)
+    @mock.patch("tap_s3_csv.output.write_record")
+    def test_workers_are_bounded_by_the_record_queue(self, mocked_write_record):
+        synced = []
+        written = []
+        lock = threading.Lock()
+        def sync_table_file(config, s3_path, table_spec, stream):
+            for i in range(100):
+                sync.write_record(table_spec['table_name'], {"file": s3_path, "row": i})
+                with lock:
+                    synced.append((s3_path, i))
+            return 100
+        def write_record(table_name, record):
+            time.sleep(0.001)
+            with lock:
+                written.append((record["file"], record["row"]))
+                # The second file's worker waits once its queue is full
+                ahead = len([row for row in synced if row[0] == "file2.csv"])
+            if record["file"] == "file1.csv":
+                self.assertLessEqual(ahead, sync.RECORD_QUEUE_SIZE + 1)
+        mocked_write_record.side_effect = write_record
+        s3_files = [{"key": "file1.csv"}, {"key": "file2.csv"}]
+
+        with mock.patch("tap_s3_csv.sync.sync_table_file", side_effect=sync_table_file):
+            synced_files = list(sync.sync_files_concurrently({}, s3_files, {"table_name": "table"}, {}, 2))
+
+        self.assertEqual([(s3_file, 100) for s3_file in s3_files], synced_files)
+        self.assertEqual([(s3_file["key"], i) for s3_file in s3_files for i in range(100)], written)
+
+    @mock.patch("tap_s3_csv.output.write_record")
+    def test_workers_stop_when_writing_stops(self, mocked_write_record):
+        mocked_write_record.side_effect = Exception("Broken pipe")
+        s3_files = [{"key": "file{}.csv".format(i)} for i in range(1, 7)]
+        def sync_table_file(config, s3_path, table_spec, stream):
+            # More records than fit in the queue
+            for i in range(sync.RECORD_QUEUE_SIZE * 2):
+                sync.write_record(table_spec['table_name'], {"file": s3_path, "row": i})
+            return sync.RECORD_QUEUE_SIZE * 2
+
+        with mock.patch("tap_s3_csv.sync.sync_table_file", side_effect=sync_table_file) as mocked_sync_table_file:
+            with self.assertRaises(Exception):
+                list(sync.sync_files_concurrently({}, s3_files, {"table_name": "table"}, {}, 2))
+
+        # The workers waiting on full queues gave up, and the files not yet
+        # started when writing failed were never synced
+        self.assertLess(mocked_sync_table_file.call_count, 6)
+
+    def test_skipped_files_are_counted_from_every_thread(self):
+        s3.skipped_files_count = 0
+        threads = [threading.Thread(target=lambda: [s3.increment_skipped_files_count() for _ in range(1000)])
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(8000, s3.skipped_files_count)
+        s3.skipped_files_count = 0
+
+    @mock.patch("tap_s3_csv.sync.sync_table_file", side_effect=mock_sync_table_file)
+    @mock.patch("tap_s3_csv.output.write_record")
+    def test_write_record_outside_of_worker_writes_directly(self, mocked_write_record, mocked_sync_table_file):
+        sync.write_record("table", {"id": 1})
+
+        mocked_write_record.assert_called_once_with("table", {"id": 1})
+
+    @mock.patch("tap_s3_csv.s3.get_input_files_for_table")
+    @mock.patch("tap_s3_csv.sync.sync_table_file", side_effect=mock_sync_table_file)
+    @mock.patch("tap_s3_csv.output.write_record")
+    @mock.patch("singer.write_state")
+    def test_sync_stream_bookmarks_in_last_modified_order(self, mocked_write_state, mocked_write_record,
+                                                          mocked_sync_table_file, mocked_get_input_files):
+        mocked_get_input_files.return_value = [
+            {"key": "file3.csv", "last_modified": datetime(2024, 1, 3)},
+            {"key": "file1.csv", "last_modified": datetime(2024, 1, 1)},
+            {"key": "file2.csv", "last_modified": datetime(2024, 1, 2)},
+        ]
+        bookmarks = []
+        mocked_write_state.side_effect = lambda state: bookmarks.append(state["bookmarks"]["table"]["modified_since"])
+        config = {"start_date": "2024-01-01T00:00:00Z", "max_concurrent_files": "2"}
+        state = {}
+
+        records_streamed = sync.sync_stream(config, state, {"table_name": "table"}, {}, datetime(2024, 2, 1))
+
+        self.assertEqual(6, records_streamed)
+        self.assertEqual(["2024-01-01T00:00:00", "2024-01-02T00:00:00", "2024-01-03T00:00:00"], bookmarks)
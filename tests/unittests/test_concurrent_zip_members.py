@@ -0,0 +1,76 @@
+import io
+import threading
+import time
+import unittest
+import zipfile
+from unittest import mock
+
+from tap_s3_csv import sync
+
+from utils_for_unittests import get_stream
+
+STREAM = get_stream({'id': {'type': ['null', 'string']}})
+
+MEMBERS = ['member{}.csv'.format(i) for i in range(6)]
+
+
+def make_zip():
+    zip_bytes = io.BytesIO()
+    with zipfile.ZipFile(zip_bytes, "w", zipfile.ZIP_DEFLATED) as zip_file:
+        for name in MEMBERS:
+            zip_file.writestr(name, "id\n" + "".join("{}-{}\n".format(name, i) for i in range(50)))
+        zip_file.writestr("notes.md", "not synced")
+    zip_bytes.seek(0)
+    return zip_bytes
+
+
+handle_file = sync.handle_file
+lock = threading.Lock()
+running = {'now': 0, 'max': 0}
+
+
+def slow_handle_file(config, s3_path, table_spec, stream, extension, file_handler=None):
+    with lock:
+        running['now'] += 1
+        running['max'] = max(running['max'], running['now'])
+    # Earlier members take longer, so workers finish out of order
+    time.sleep(0.01 * (len(MEMBERS) - int(s3_path[-len('0.csv'):-len('.csv')])))
+    with lock:
+        running['now'] -= 1
+    return handle_file(config, s3_path, table_spec, stream, extension, file_handler)
+
+
+@mock.patch("tap_s3_csv.sync.handle_file", side_effect=slow_handle_file)
+@mock.patch("tap_s3_csv.s3.get_s3fs_file_handle", side_effect=lambda config, s3_path: make_zip())
+@mock.patch("tap_s3_csv.output.write_record")
+class TestConcurrentZipMembers(unittest.TestCase):
+
+    def setUp(self):
+        running['max'] = 0
+
+    def sync_zip(self, config, mocked_write_record):
+        records_synced = sync.sync_compressed_file(config, 'archive.zip', {'table_name': 'table'}, STREAM)
+        return records_synced, [call.args[1] for call in mocked_write_record.call_args_list]
+
+    def test_records_are_written_in_member_order(self, mocked_write_record, mocked_get_s3fs_file_handle,
+                                                 mocked_handle_file):
+        serial = self.sync_zip({'bucket': 'test'}, mocked_write_record)
+        mocked_write_record.reset_mock()
+
+        concurrent = self.sync_zip({'bucket': 'test', 'zip_member_concurrency': '4'}, mocked_write_record)
+
+        self.assertEqual(serial, concurrent)
+        records_synced, records = concurrent
+        self.assertEqual(300, records_synced)
+        self.assertEqual(['{}-{}'.format(name, i) for name in MEMBERS for i in range(50)],
+                         [record['id'] for record in records])
+        self.assertEqual('archive.zip/member0.csv', records[0]['_sdc_source_file'])
+        self.assertEqual('archive.zip/member5.csv', records[-1]['_sdc_source_file'])
+
+    def test_members_are_synced_concurrently(self, mocked_write_record, mocked_get_s3fs_file_handle,
+                                             mocked_handle_file):
+        self.sync_zip({'bucket': 'test'}, mocked_write_record)
+        self.assertEqual(1, running['max'])
+
+        self.sync_zip({'bucket': 'test', 'zip_member_concurrency': '3'}, mocked_write_record)
+        self.assertEqual(3, running['max'])
@@ -0,0 +1,153 @@
+import copy
+import io
+import unittest
+from datetime import datetime
+from unittest import mock
+
+from tap_s3_csv import sync
+
+from utils_for_unittests import get_stream
+
+CSV = b"id,name\n" + b"".join("{},name_{}\n".format(i, i).encode() for i in range(100))
+JSONL = b"".join('{{"id": "{}", "name": "name_{}"}}\n'.format(i, i).encode() for i in range(100))
+
+STREAM = get_stream({'id': {'type': ['null', 'string']}, 'name': {'type': ['null', 'string']}})
+
+
+class FailingStream():
+    """A body that fails with a connection error after `fail_after_lines` lines."""
+
+    def __init__(self, data, fail_after_lines=None):
+        self.lines = io.BytesIO(data).readlines()
+        self.fail_after_lines = fail_after_lines
+
+    def __iter__(self):
+        for i, line in enumerate(self.lines):
+            if i == self.fail_after_lines:
+                raise ConnectionError("Connection reset")
+            yield line
+
+
+class MockBody():
+
+    def __init__(self, data, fail_after_lines=None):
+        self._raw_stream = FailingStream(data, fail_after_lines)
+
+    def close(self):
+        pass
+
+
+class MockS3Client():
+
+    def __init__(self, body, fail_after_lines=None):
+        self.body = body
+        self.fail_after_lines = fail_after_lines
+        self.requests = []
+
+    def get_object(self, Bucket, Key, Range=None, IfMatch=None):
+        self.requests.append((Range, IfMatch))
+        if Range is None:
+            return {'Body': MockBody(self.body, self.fail_after_lines)}
+        offset = int(Range[len('bytes='):-1])
+        return {'Body': MockBody(self.body[offset:])}
+
+
+@mock.patch("tap_s3_csv.s3.get_input_files_for_table")
+@mock.patch("tap_s3_csv.s3.get_s3_client")
+@mock.patch("tap_s3_csv.output.write_record")
+@mock.patch("singer.write_state")
+class TestFileCheckpoint(unittest.TestCase):
+
+    def sync(self, state, config=None):
+        config = config or {'bucket': 'test', 'start_date': '2024-01-01T00:00:00Z', 'file_checkpoint_bytes': '100'}
+        return sync.sync_stream(config, state, {'table_name': 'table'}, STREAM, datetime(2024, 2, 1))
+
+    def run_failed_and_resumed_sync(self, key, data, mocked_write_state, mocked_write_record, mocked_get_s3_client,
+                                    mocked_get_input_files):
+        states = []
+        mocked_write_state.side_effect = lambda state: states.append(copy.deepcopy(state))
+        mocked_get_input_files.return_value = [{'key': key, 'last_modified': datetime(2024, 1, 2), 'etag': '"1"'}]
+
+        mocked_get_s3_client.return_value = MockS3Client(data, fail_after_lines=60)
+        with self.assertRaises(ConnectionError):
+            self.sync({})
+        first_records = [call.args[1] for call in mocked_write_record.call_args_list]
+        checkpoint = states[-1]['bookmarks']['table']['file_checkpoint']
+        mocked_write_record.reset_mock()
+
+        mocked_get_s3_client.return_value = MockS3Client(data)
+        records_streamed = self.sync(copy.deepcopy(states[-1]))
+        second_records = [call.args[1] for call in mocked_write_record.call_args_list]
+
+        return checkpoint, first_records, second_records, records_streamed, states[-1]
+
+    def test_csv_sync_resumes_from_checkpoint(self, mocked_write_state, mocked_write_record, mocked_get_s3_client,
+                                              mocked_get_input_files):
+        checkpoint, first_records, second_records, records_streamed, state = self.run_failed_and_resumed_sync(
+            'file.csv', CSV, mocked_write_state, mocked_write_record, mocked_get_s3_client, mocked_get_input_files)
+
+        self.assertEqual('file.csv', checkpoint['key'])
+        self.assertEqual('"1"', checkpoint['etag'])
+        # The checkpoint is at the end of the line of its last record
+        self.assertEqual(CSV.index("{},name_".format(checkpoint['records']).encode()), checkpoint['offset'])
+        self.assertGreaterEqual(len(first_records), checkpoint['records'])
+        self.assertEqual([('bytes={}-'.format(checkpoint['offset']), '"1"'), (None, None)],
+                         mocked_get_s3_client.return_value.requests)
+
+        # Records after the checkpoint are synced again, with the same line numbers
+        self.assertEqual(100 - checkpoint['records'], records_streamed)
+        self.assertEqual(first_records[:checkpoint['records']] + second_records,
+                         [{'id': str(i), 'name': 'name_{}'.format(i), '_sdc_source_bucket': 'test',
+                           '_sdc_source_file': 'file.csv', '_sdc_source_lineno': i + 2} for i in range(100)])
+        # The checkpoint is cleared once the file is synced
+        self.assertEqual({'modified_since': '2024-01-02T00:00:00', 'synced_keys': ['file.csv']}, state['bookmarks']['table'])
+
+    def test_jsonl_sync_resumes_from_checkpoint(self, mocked_write_state, mocked_write_record, mocked_get_s3_client,
+                                                mocked_get_input_files):
+        checkpoint, first_records, second_records, _, _ = self.run_failed_and_resumed_sync(
+            'file.jsonl', JSONL, mocked_write_state, mocked_write_record, mocked_get_s3_client, mocked_get_input_files)
+
+        self.assertEqual([('bytes={}-'.format(checkpoint['offset']), '"1"')], mocked_get_s3_client.return_value.requests)
+        self.assertEqual(first_records[:checkpoint['records']] + second_records,
+                         [{'id': str(i), 'name': 'name_{}'.format(i), '_sdc_source_bucket': 'test',
+                           '_sdc_source_file': 'file.jsonl', '_sdc_source_lineno': i + 1} for i in range(100)])
+
+    def test_checkpoint_at_end_of_object_is_resumed(self, mocked_write_state, mocked_write_record, mocked_get_s3_client,
+                                                    mocked_get_input_files):
+        mocked_get_input_files.return_value = [{'key': 'file.csv', 'last_modified': datetime(2024, 1, 2), 'etag': '"1"',
+                                                'size': len(CSV)}]
+        mocked_get_s3_client.return_value = MockS3Client(CSV)
+        states = []
+        mocked_write_state.side_effect = lambda state: states.append(copy.deepcopy(state))
+        state = {'bookmarks': {'table': {'file_checkpoint': {'key': 'file.csv', 'etag': '"1"', 'offset': len(CSV), 'records': 100}}}}
+
+        records_streamed = self.sync(state)
+
+        self.assertEqual(0, records_streamed)
+        mocked_write_record.assert_not_called()
+        # Only the header is read, not a range past the end of the object
+        self.assertEqual([(None, None)], mocked_get_s3_client.return_value.requests)
+        self.assertEqual({'modified_since': '2024-01-02T00:00:00', 'synced_keys': ['file.csv']}, states[-1]['bookmarks']['table'])
+
+    def test_changed_object_is_synced_from_start(self, mocked_write_state, mocked_write_record, mocked_get_s3_client,
+                                                 mocked_get_input_files):
+        mocked_get_input_files.return_value = [{'key': 'file.csv', 'last_modified': datetime(2024, 1, 2), 'etag': '"2"'}]
+        mocked_get_s3_client.return_value = MockS3Client(CSV)
+        state = {'bookmarks': {'table': {'file_checkpoint': {'key': 'file.csv', 'etag': '"1"', 'offset': 500, 'records': 50}}}}
+
+        records_streamed = self.sync(state)
+
+        self.assertEqual(100, records_streamed)
+        self.assertEqual([(None, None)], mocked_get_s3_client.return_value.requests)
+
+    def test_no_checkpoints_by_default(self, mocked_write_state, mocked_write_record, mocked_get_s3_client,
+                                       mocked_get_input_files):
+        mocked_get_input_files.return_value = [{'key': 'file.csv', 'last_modified': datetime(2024, 1, 2), 'etag': '"1"'}]
+        mocked_get_s3_client.return_value = MockS3Client(CSV)
+        states = []
+        mocked_write_state.side_effect = lambda state: states.append(copy.deepcopy(state))
+
+        self.sync({}, {'bucket': 'test', 'start_date': '2024-01-01T00:00:00Z'})
+
+        self.assertEqual([{'bookmarks': {'table': {'modified_since': '2024-01-02T00:00:00', 'synced_keys': ['file.csv']}}}],
+                         states)
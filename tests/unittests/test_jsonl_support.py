@@ -185,7 +185,8 @@ class TestJsonlSupport(unittest.TestCase):
         ]
         sample_rate = 5
 
-        s3.sample_file(table_spec, s3_path, file_handle, sample_rate, "jsonl")
+        # The records are checked as they're sampled
+        list(s3.sample_file(table_spec, s3_path, file_handle, sample_rate, "jsonl"))
         self.assertEqual(mock_get_records_for_jsonl.call_count, 1)
 
 
@@ -0,0 +1,77 @@
+import io
+import threading
+import time
+import unittest
+from unittest import mock
+
+from tap_s3_csv import s3
+
+
+def mock_sample_file(table_spec, s3_path, file_handle, sample_rate, extension, max_records=1000):
+    yield {'s3_path': s3_path, 'data': file_handle.read().decode()}
+
+
+@mock.patch("tap_s3_csv.s3.get_file_handle")
+class TestLazySamplingHandles(unittest.TestCase):
+
+    def test_skipped_files_are_never_opened(self, mocked_get_file_handle):
+        s3_files = [{'key': 'no_extension'}, {'key': 'file.rar'}, {'key': 'file.xlsx'}]
+
+        files = s3.get_files_to_sample({'bucket': 'test'}, s3_files, 5)
+
+        self.assertEqual([], files)
+        mocked_get_file_handle.assert_not_called()
+
+    @mock.patch("tap_s3_csv.s3.sample_file", side_effect=mock_sample_file)
+    def test_files_are_opened_right_before_sampling(self, mocked_sample_file, mocked_get_file_handle):
+        opened = []
+        def get_file_handle(config, s3_path):
+            opened.append(s3_path)
+            return io.BytesIO(s3_path.encode())
+        mocked_get_file_handle.side_effect = get_file_handle
+        s3_files = [{'key': 'file1.csv'}, {'key': 'file2.csv'}, {'key': 'file3.csv'}]
+
+        samples = s3.sample_files({'bucket': 'test'}, {}, s3_files, 1)
+
+        self.assertEqual('file1.csv', next(samples)['data'])
+        self.assertEqual(['file1.csv'], opened)
+        self.assertEqual(['file2.csv', 'file3.csv'], [sample['data'] for sample in samples])
+        self.assertEqual(['file1.csv', 'file2.csv', 'file3.csv'], opened)
+
+    @mock.patch("tap_s3_csv.s3.sample_file", side_effect=mock_sample_file)
+    def test_prefetched_files_are_sampled_in_order(self, mocked_sample_file, mocked_get_file_handle):
+        lock = threading.Lock()
+        opening = {'now': 0, 'max': 0}
+        def get_file_handle(config, s3_path):
+            with lock:
+                opening['now'] += 1
+                opening['max'] = max(opening['max'], opening['now'])
+            # Later files open faster, so they finish opening out of order
+            time.sleep(0.02 / int(s3_path[len('file'):-len('.csv')]))
+            with lock:
+                opening['now'] -= 1
+            return io.BytesIO(s3_path.encode())
+        mocked_get_file_handle.side_effect = get_file_handle
+        s3_files = [{'key': 'file{}.csv'.format(i)} for i in range(1, 7)]
+
+        samples = list(s3.sample_files({'bucket': 'test', 'sample_prefetch_files': '2'}, {}, s3_files, 1, max_files=6))
+
+        self.assertEqual([s3_file['key'] for s3_file in s3_files], [sample['data'] for sample in samples])
+        self.assertLessEqual(opening['max'], 2)
+
+    @mock.patch("tap_s3_csv.s3.sample_file", side_effect=mock_sample_file)
+    def test_prefetched_files_are_closed_when_sampling_stops(self, mocked_sample_file, mocked_get_file_handle):
+        handles = {}
+        def get_file_handle(config, s3_path):
+            handles[s3_path] = io.BytesIO(b'same')
+            return handles[s3_path]
+        mocked_get_file_handle.side_effect = get_file_handle
+        s3_files = [{'key': 'file{}.csv'.format(i)} for i in range(1, 7)]
+        config = {'bucket': 'test', 'sample_prefetch_files': '3'}
+
+        # The second file doesn't change the schema, so sampling stops there
+        samples = list(s3.sample_files(config, {'sample_stable_files': 1}, s3_files, 1, max_files=6))
+
+        self.assertEqual(2, len(samples))
+        self.assertGreater(len(handles), 2)
+        self.assertTrue(all(handle.closed for handle in handles.values()))
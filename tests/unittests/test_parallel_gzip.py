@@ -0,0 +1,133 @@
+import gzip
+import struct
+import threading
+import time
+import unittest
+import zlib
+from unittest import mock
+
+from tap_s3_csv import parallel_gzip
+from tap_s3_csv import sync
+from tap_s3_csv import utils
+
+from utils_for_unittests import StreamingBody, get_stream, gzip_with_name
+
+STREAM = get_stream({'id': {'type': ['null', 'string']}, 'name': {'type': ['null', 'string']}})
+
+CSV = b"id,name\n" + b"".join("{},name_{}\n".format(i, i).encode() for i in range(5000))
+
+
+def bgzf_block(data):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, -zlib.MAX_WBITS)
+    deflated = compressor.compress(data) + compressor.flush()
+    block_size = parallel_gzip.BGZF_HEADER_SIZE + len(deflated) + 8
+    header = b'\x1f\x8b\x08\x04\x00\x00\x00\x00\x00\xff' + struct.pack('<H', 6) + b'BC' + struct.pack('<HH', 2, block_size - 1)
+    return header + deflated + struct.pack('<II', zlib.crc32(data), len(data))
+
+
+def bgzf(data, block_size=4096):
+    # BGZF files end with an empty block
+    return b''.join(bgzf_block(data[i:i + block_size]) for i in range(0, len(data), block_size)) + bgzf_block(b'')
+
+
+@mock.patch("tap_s3_csv.parallel_gzip.CHUNK_SIZE", 1000)
+class TestParallelGzip(unittest.TestCase):
+
+    def test_gzip_file_is_decompressed(self):
+        gz_bytes = gzip_with_name("data.csv", CSV) + gzip_with_name("data.csv", CSV)
+
+        gz_file_name, gz_file = utils.open_gz_file(StreamingBody(gz_bytes), 4)
+
+        self.assertEqual("data.csv", gz_file_name)
+        # Every member is decompressed
+        self.assertEqual(CSV + CSV, gz_file.read())
+
+    def test_bgzf_blocks_are_decompressed_concurrently(self):
+        threads = set()
+        zlib_decompress = zlib.decompress
+        def decompress(data, wbits):
+            threads.add(threading.current_thread().name)
+            time.sleep(0.001)
+            return zlib_decompress(data, wbits)
+
+        with mock.patch("tap_s3_csv.parallel_gzip.zlib.decompress", side_effect=decompress):
+            gz_file_name, gz_file = utils.open_gz_file(StreamingBody(bgzf(CSV)), 4, "data.csv")
+            lines = list(gz_file)
+
+        # BGZF files don't store the file name
+        self.assertEqual("data.csv", gz_file_name)
+        self.assertEqual(CSV.splitlines(keepends=True), lines)
+        self.assertGreater(len(threads), 1)
+
+    def test_bgzf_files_without_default_name_are_not_opened(self):
+        with self.assertRaises(AttributeError):
+            utils.open_gz_file(StreamingBody(bgzf(CSV)), 4)
+
+    def test_zero_padding_is_skipped(self):
+        padding = b"\x00" * 16
+        for gz_bytes in [gzip_with_name("data.csv", CSV) + padding,
+                         gzip_with_name("data.csv", CSV) + padding + gzip_with_name("data.csv", CSV),
+                         bgzf(CSV) + padding]:
+            expected = gzip.decompress(gz_bytes)
+            for threads in [1, 4]:
+                _, gz_file = utils.open_gz_file(StreamingBody(gz_bytes), threads, "data.csv")
+                with gz_file:
+                    self.assertEqual(expected, gz_file.read())
+
+    def test_padding_split_across_chunks_is_skipped(self):
+        gz_bytes = gzip_with_name("data.csv", b"a,b\n1,2\n")
+        chunks = [gz_bytes, b"\x00" * 8, b"\x00" * 8]
+
+        self.assertEqual(b"a,b\n1,2\n", b"".join(parallel_gzip.inflate_members(chunks)))
+
+    def test_truncated_files_raise_an_error(self):
+        for gz_bytes in [gzip_with_name("data.csv", CSV), bgzf(CSV)]:
+            _, gz_file = utils.open_gz_file(StreamingBody(gz_bytes[:-100]), 4, "data.csv")
+            with self.assertRaises(EOFError):
+                gz_file.read()
+
+    def test_closed_reader_stops_its_threads(self):
+        threads_before = threading.active_count()
+        _, gz_file = utils.open_gz_file(StreamingBody(gzip_with_name("data.csv", CSV * 10)), 4)
+
+        self.assertEqual(b"id,name\n", gz_file.readline())
+        gz_file.close()
+
+        for _ in range(50):
+            if threading.active_count() <= threads_before:
+                break
+            time.sleep(0.1)
+        self.assertEqual(threads_before, threading.active_count())
+
+    @mock.patch("tap_s3_csv.output.write_record")
+    @mock.patch("tap_s3_csv.s3.get_file_handle")
+    def test_sync_closes_the_reader(self, mocked_get_file_handle, mocked_write_record):
+        mocked_get_file_handle.return_value = StreamingBody(gzip_with_name("data.csv", CSV))
+        readers = []
+        open_gzip_file = parallel_gzip.open_gzip_file
+        def open_and_keep_gzip_file(fileobj, threads):
+            readers.append(open_gzip_file(fileobj, threads))
+            return readers[-1]
+
+        with mock.patch("tap_s3_csv.parallel_gzip.open_gzip_file", side_effect=open_and_keep_gzip_file):
+            sync.sync_table_file({'bucket': 'test', 'gzip_decompression_threads': '4'}, 'exports/data.csv.gz',
+                                 {'table_name': 'table'}, STREAM)
+
+        self.assertTrue(readers[0].closed)
+
+    @mock.patch("tap_s3_csv.output.write_record")
+    @mock.patch("tap_s3_csv.s3.get_file_handle")
+    def test_sync_with_decompression_threads(self, mocked_get_file_handle, mocked_write_record):
+        for gz_bytes in [gzip_with_name("data.csv", CSV), bgzf(CSV)]:
+            synced = []
+            for config in [{'bucket': 'test'}, {'bucket': 'test', 'gzip_decompression_threads': '4'}]:
+                mocked_write_record.reset_mock()
+                mocked_get_file_handle.return_value = StreamingBody(gz_bytes)
+
+                records_synced = sync.sync_table_file(config, 'exports/data.csv.gz', {'table_name': 'table'}, STREAM)
+
+                self.assertEqual(5000, records_synced)
+                synced.append([call.args[1] for call in mocked_write_record.call_args_list])
+
+            self.assertEqual(synced[0], synced[1])
+            self.assertEqual('exports/data.csv.gz/data.csv', synced[1][0]['_sdc_source_file'])
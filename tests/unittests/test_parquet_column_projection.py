@@ -0,0 +1,74 @@
+import io
+import unittest
+from unittest import mock
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from singer import metadata
+
+from tap_s3_csv import sync
+
+SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'id': {'type': ['null', 'integer']},
+        'name': {'type': ['null', 'string']},
+        'blob': {'type': ['null', 'string']},
+        'missing': {'type': ['null', 'string']},
+        '_sdc_source_bucket': {'type': 'string'},
+        '_sdc_source_file': {'type': 'string'},
+        '_sdc_source_lineno': {'type': 'integer'}
+    }
+}
+
+
+def make_stream(selected=('name', 'missing'), key_properties=('id',)):
+    mdata = metadata.new()
+    mdata = metadata.write(mdata, (), 'table-key-properties', list(key_properties))
+    for field in SCHEMA['properties']:
+        mdata = metadata.write(mdata, ('properties', field), 'inclusion', 'available')
+        mdata = metadata.write(mdata, ('properties', field), 'selected',
+                               field in selected or field.startswith('_sdc'))
+    return {'schema': SCHEMA, 'metadata': metadata.to_list(mdata)}
+
+
+def make_parquet_file():
+    parquet_file = io.BytesIO()
+    pq.write_table(pa.table({'id': [1, 2], 'name': ['a', 'b'], 'blob': ['x' * 100, 'y' * 100]}), parquet_file)
+    parquet_file.seek(0)
+    return parquet_file
+
+
+def read_rows(batches):
+    return [row for batch in batches for row in batch.to_pylist()]
+
+
+class TestParquetColumnProjection(unittest.TestCase):
+
+    def test_selected_columns_include_key_properties(self):
+        self.assertEqual({'id', 'name', 'missing', '_sdc_source_bucket', '_sdc_source_file', '_sdc_source_lineno'},
+                         sync.get_selected_columns(make_stream()))
+
+    def test_every_column_is_read_without_compiled_schema(self):
+        self.assertIsNone(sync.get_selected_columns({'schema': {'type': 'object', 'properties': {}}}))
+
+    def test_only_selected_columns_are_read(self):
+        rows = read_rows(sync.get_parquet_batch_iterator(make_parquet_file(), sync.get_selected_columns(make_stream())))
+
+        self.assertEqual([{'id': 1, 'name': 'a'}, {'id': 2, 'name': 'b'}], rows)
+
+    def test_rows_are_kept_when_no_selected_column_is_in_the_file(self):
+        rows = read_rows(sync.get_parquet_batch_iterator(make_parquet_file(), {'missing'}))
+
+        self.assertEqual([{}, {}], rows)
+
+    @mock.patch("tap_s3_csv.sync.write_record")
+    def test_sync_parquet_file(self, mocked_write_record):
+        records = sync.sync_parquet_file({'bucket': 'bucket'}, make_parquet_file(), 'file.parquet',
+                                         {'table_name': 'table'}, make_stream())
+
+        self.assertEqual(2, records)
+        # `id` is read as a key property, but dropped by the transform as it isn't selected
+        self.assertEqual({'name': 'a', '_sdc_source_bucket': 'bucket',
+                          '_sdc_source_file': 'file.parquet', '_sdc_source_lineno': 1},
+                         mocked_write_record.call_args_list[0].args[1])
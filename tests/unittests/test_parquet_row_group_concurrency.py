@@ -0,0 +1,73 @@
+import io
+import unittest
+from unittest import mock
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from tap_s3_csv import sync
+
+from utils_for_unittests import get_stream
+
+STREAM = get_stream({'id': {'type': ['null', 'integer']}, 'name': {'type': ['null', 'string']}})
+
+
+def make_parquet_bytes(num_rows=100, row_group_size=10):
+    parquet_file = io.BytesIO()
+    table = pa.table({'id': list(range(num_rows)), 'name': [str(i) for i in range(num_rows)]})
+    pq.write_table(table, parquet_file, row_group_size=row_group_size)
+    return parquet_file.getvalue()
+
+
+def read_rows(batches):
+    return [row for batch in batches for row in batch.to_pylist()]
+
+
+class TestParquetRowGroupConcurrency(unittest.TestCase):
+
+    def test_rows_are_in_row_group_order(self):
+        parquet_bytes = make_parquet_bytes()
+        open_file_handle = mock.Mock(side_effect=lambda: io.BytesIO(parquet_bytes))
+
+        rows = read_rows(sync.get_parquet_row_group_batch_iterator(
+            io.BytesIO(parquet_bytes), open_file_handle, None, 4))
+
+        self.assertEqual(read_rows(sync.get_parquet_batch_iterator(io.BytesIO(parquet_bytes))), rows)
+        self.assertEqual(100, len(rows))
+        # One handle per row group
+        self.assertEqual(10, open_file_handle.call_count)
+
+    def test_only_selected_columns_are_read(self):
+        parquet_bytes = make_parquet_bytes(num_rows=20)
+
+        rows = read_rows(sync.get_parquet_row_group_batch_iterator(
+            io.BytesIO(parquet_bytes), lambda: io.BytesIO(parquet_bytes), {'id', 'missing'}, 2))
+
+        self.assertEqual([{'id': i} for i in range(20)], rows)
+
+    @mock.patch("tap_s3_csv.sync.write_record")
+    @mock.patch("tap_s3_csv.s3.get_s3fs_file_handle")
+    def test_handle_file_reads_row_groups_concurrently(self, mocked_get_s3fs_file_handle, mocked_write_record):
+        parquet_bytes = make_parquet_bytes()
+        mocked_get_s3fs_file_handle.side_effect = lambda config, s3_path: io.BytesIO(parquet_bytes)
+        config = {'bucket': 'bucket', 'parquet_row_group_concurrency': '3'}
+
+        records = sync.handle_file(config, 'file.parquet', {'table_name': 'table'}, STREAM, 'parquet')
+
+        self.assertEqual(100, records)
+        # The file is opened once for its footer, then once per row group
+        self.assertEqual(11, mocked_get_s3fs_file_handle.call_count)
+        written = [call.args[1] for call in mocked_write_record.call_args_list]
+        self.assertEqual(list(range(100)), [record['id'] for record in written])
+        self.assertEqual(list(range(1, 101)), [record['_sdc_source_lineno'] for record in written])
+
+    @mock.patch("tap_s3_csv.sync.write_record")
+    @mock.patch("tap_s3_csv.s3.get_s3fs_file_handle")
+    def test_handle_file_reads_sequentially_by_default(self, mocked_get_s3fs_file_handle, mocked_write_record):
+        parquet_bytes = make_parquet_bytes()
+        mocked_get_s3fs_file_handle.side_effect = lambda config, s3_path: io.BytesIO(parquet_bytes)
+
+        records = sync.handle_file({'bucket': 'bucket'}, 'file.parquet', {'table_name': 'table'}, STREAM, 'parquet')
+
+        self.assertEqual(100, records)
+        self.assertEqual(1, mocked_get_s3fs_file_handle.call_count)
@@ -0,0 +1,125 @@
+import threading
+import time
+import unittest
+from datetime import datetime
+from unittest import mock
+
+from parameterized import parameterized
+
+from tap_s3_csv import s3
+from tap_s3_csv import utils
+
+
+def mock_list_files_in_bucket(config, search_prefix=None, sharded=True):
+    keys = {
+        "exports/orders/": ["exports/orders/1.csv", "exports/orders/2.csv"],
+        "exports/refunds/": ["exports/refunds/1.csv"],
+    }
+    for key in keys.get(search_prefix, []):
+        yield {'Key': key, 'LastModified': datetime(2024, 1, 1), 'Size': 10}
+
+
+class TestGetLiteralPrefixes(unittest.TestCase):
+
+    @parameterized.expand([
+        ("anchored_literal", r"^exports/orders/.*\.csv", ["exports/orders/"]),
+        ("alternation", r"^exports/(orders|refunds)/.*\.csv", ["exports/orders/", "exports/refunds/"]),
+        ("top_level_alternation", r"^refunds/|^orders/", ["orders/", "refunds/"]),
+        ("character_set", r"^exports/[ab]/", ["exports/a/", "exports/b/"]),
+        ("optional_character", r"^exports/orders?/", ["exports/order"]),
+        ("covered_prefix", r"^ab|^abc", ["ab"]),
+        ("unanchored", r"exports/orders/.*\.csv", None),
+        ("partially_anchored", r"^exports/|orders/", None),
+        ("ignore_case", r"(?i)^exports/", None),
+        ("no_literal", r"^.*\.csv", None),
+    ])
+    def test_get_literal_prefixes(self, name, pattern, expected_prefixes):
+        self.assertEqual(expected_prefixes, utils.get_literal_prefixes(pattern))
+
+    def test_too_many_alternatives_use_common_prefix(self):
+        pattern = "^exports/(" + "|".join("table_{}".format(i) for i in range(30)) + ")/"
+
+        self.assertEqual(["exports/table_"], utils.get_literal_prefixes(pattern))
+
+
+class TestGetInputFilesWithDerivedPrefixes(unittest.TestCase):
+
+    @mock.patch("tap_s3_csv.s3.list_files_in_bucket", side_effect=mock_list_files_in_bucket)
+    def test_lists_each_derived_prefix(self, mocked_list_files_in_bucket):
+        table_spec = {'table_name': 'test', 'search_pattern': r'^exports/(orders|refunds)/.*\.csv'}
+
+        files = list(s3.get_input_files_for_table({'bucket': 'test'}, table_spec))
+
+        self.assertEqual(["exports/orders/1.csv", "exports/orders/2.csv", "exports/refunds/1.csv"],
+                         [s3_file['key'] for s3_file in files])
+        self.assertEqual(["exports/orders/", "exports/refunds/"],
+                         sorted(call.args[1] for call in mocked_list_files_in_bucket.call_args_list))
+
+    @mock.patch("tap_s3_csv.s3.list_files_in_bucket", side_effect=mock_list_files_in_bucket)
+    def test_search_prefix_takes_precedence(self, mocked_list_files_in_bucket):
+        table_spec = {'table_name': 'test', 'search_pattern': r'^exports/(orders|refunds)/.*\.csv',
+                      'search_prefix': 'exports/orders/'}
+
+        files = list(s3.get_input_files_for_table({'bucket': 'test'}, table_spec))
+
+        self.assertEqual(2, len(files))
+        mocked_list_files_in_bucket.assert_called_once_with({'bucket': 'test'}, 'exports/orders/', True)
+
+
+class TestListFilesInPrefixes(unittest.TestCase):
+
+    def setUp(self):
+        s3.clear_s3_clients()
+
+    @mock.patch("boto3.client")
+    def test_empty_derived_prefix_is_listed(self, mocked_client):
+        def paginate(**args):
+            if args['Prefix'] == 'orders/':
+                return [{'KeyCount': 1, 'Contents': [
+                    {'Key': 'orders/1.csv', 'LastModified': datetime(2024, 1, 1), 'Size': 10}]}]
+            # S3 leaves Contents out of the page of an empty prefix
+            return [{'KeyCount': 0}]
+        mocked_client.return_value.get_paginator.return_value.paginate.side_effect = paginate
+        table_spec = {'table_name': 'test', 'search_pattern': r'^(orders|refunds)/'}
+
+        files = list(s3.get_input_files_for_table({'bucket': 'test'}, table_spec))
+
+        self.assertEqual(["orders/1.csv"], [s3_file['key'] for s3_file in files])
+
+    def test_prefixes_are_listed_lazily_and_with_bounded_concurrency(self):
+        listed = []
+        running = []
+        max_running = []
+        lock = threading.Lock()
+        def list_files_in_bucket(config, search_prefix=None, sharded=True):
+            with lock:
+                running.append(search_prefix)
+                max_running.append(len(running))
+            try:
+                for i in range(10000):
+                    listed.append(search_prefix)
+                    yield {'Key': '{}{}.csv'.format(search_prefix, i)}
+            finally:
+                with lock:
+                    running.remove(search_prefix)
+        search_prefixes = ["exports/{}/".format(i) for i in range(10)]
+
+        with mock.patch("tap_s3_csv.s3.list_files_in_bucket", side_effect=list_files_in_bucket):
+            s3_objects = s3.list_files_in_prefixes({'bucket': 'test'}, search_prefixes)
+            self.assertEqual("exports/0/0.csv", next(s3_objects)['Key'])
+            s3_objects.close()
+            time.sleep(0.3)
+
+        self.assertLessEqual(max(max_running), s3.PREFIX_LIST_CONCURRENCY)
+        # Each prefix was listed at most a few pages ahead of the keys consumed
+        self.assertLess(len(listed), s3.PREFIX_LIST_CONCURRENCY * (s3.LIST_QUEUE_PAGES + 2) * s3.LIST_PAGE_SIZE)
+
+    @mock.patch("tap_s3_csv.utils.ordered_concurrent_chain")
+    @mock.patch("tap_s3_csv.s3.list_files_in_bucket", side_effect=mock_list_files_in_bucket)
+    def test_sharded_prefixes_are_listed_one_at_a_time(self, mocked_list_files_in_bucket, mocked_chain):
+        s3_objects = s3.list_files_in_prefixes({'bucket': 'test', 'list_concurrency': '4'},
+                                               ["exports/orders/", "exports/refunds/"])
+
+        self.assertEqual(["exports/orders/1.csv", "exports/orders/2.csv", "exports/refunds/1.csv"],
+                         [s3_object['Key'] for s3_object in s3_objects])
+        mocked_chain.assert_not_called()
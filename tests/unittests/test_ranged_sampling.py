@@ -0,0 +1,98 @@
+import io
+import json
+import unittest
+from unittest import mock
+
+from tap_s3_csv import s3
+
+JSONL = b"".join(json.dumps({"id": i, "name": "name_{}".format(i)}).encode() + b"\n" for i in range(1000))
+CSV = b"id,name\n" + b"".join("{},name_{}\n".format(i, i).encode() for i in range(1000))
+
+
+class MockS3Client():
+
+    def __init__(self, body):
+        self.body = body
+        self.ranges = []
+
+    def get_object(self, Bucket, Key, Range=None):
+        self.ranges.append(Range)
+        start, end = (int(offset) for offset in Range[len('bytes='):].split('-'))
+        data = self.body[start:end + 1]
+        return {'Body': io.BytesIO(data),
+                'ContentRange': 'bytes {}-{}/{}'.format(start, start + len(data) - 1, len(self.body))}
+
+
+class TestGetSampleFileHandle(unittest.TestCase):
+
+    @mock.patch("tap_s3_csv.s3.get_s3_client")
+    def test_only_whole_lines_of_the_first_range_are_read(self, mocked_get_s3_client):
+        mocked_get_s3_client.return_value = MockS3Client(JSONL)
+
+        data = s3.get_sample_file_handle({'bucket': 'test'}, 'file.jsonl', 100).read()
+
+        self.assertEqual(['bytes=0-99'], mocked_get_s3_client.return_value.ranges)
+        self.assertLessEqual(len(data), 100)
+        self.assertTrue(JSONL.startswith(data))
+        self.assertTrue(data.endswith(b"\n"))
+
+    @mock.patch("tap_s3_csv.s3.get_s3_client")
+    def test_small_object_is_read_whole(self, mocked_get_s3_client):
+        mocked_get_s3_client.return_value = MockS3Client(b'{"id": 1}')
+
+        self.assertEqual(b'{"id": 1}', s3.get_sample_file_handle({'bucket': 'test'}, 'file.jsonl', 100).read())
+
+    @mock.patch("tap_s3_csv.s3.get_s3_client")
+    def test_random_ranges_are_realigned_to_lines(self, mocked_get_s3_client):
+        mocked_get_s3_client.return_value = MockS3Client(JSONL)
+
+        data = s3.get_sample_file_handle({'bucket': 'test'}, 'file.jsonl', 1000, random_ranges=3).read()
+
+        ranges = mocked_get_s3_client.return_value.ranges
+        self.assertEqual(4, len(ranges))
+        self.assertLessEqual(len(data), 1000)
+        lines = data.splitlines(keepends=True)
+        self.assertTrue(all(line in JSONL.splitlines(keepends=True) for line in lines))
+        # Lines from after the first range were sampled
+        self.assertGreater(max(json.loads(line)['id'] for line in lines), 20)
+        # Offsets are the same for the same key
+        s3.get_sample_file_handle({'bucket': 'test'}, 'file.jsonl', 1000, random_ranges=3)
+        self.assertEqual(ranges[:4], ranges[4:])
+
+
+class TestGetFilesToSampleWithByteBudget(unittest.TestCase):
+
+    @mock.patch("tap_s3_csv.s3.get_file_handle")
+    @mock.patch("tap_s3_csv.s3.get_s3_client")
+    def test_csv_is_sampled_from_its_start_only(self, mocked_get_s3_client, mocked_get_file_handle):
+        mocked_get_s3_client.return_value = MockS3Client(CSV)
+        config = {'bucket': 'test', 'sample_max_bytes': '200', 'sample_random_ranges': '3'}
+
+        files = s3.get_files_to_sample(config, [{'key': 'file.csv'}], 5)
+        records = list(s3.sample_file({}, 'file.csv', files[0]['open_file_handle'](), 1, 'csv'))
+
+        mocked_get_file_handle.assert_not_called()
+        self.assertEqual(['bytes=0-199'], mocked_get_s3_client.return_value.ranges)
+        self.assertEqual({'id': '0', 'name': 'name_0'}, records[0])
+        self.assertEqual(['id', 'name'], list(records[-1].keys()))
+        self.assertTrue(all(record['name'] == 'name_' + record['id'] for record in records))
+
+    @mock.patch("tap_s3_csv.s3.get_file_handle")
+    @mock.patch("tap_s3_csv.s3.get_s3_client")
+    def test_jsonl_is_sampled_from_random_ranges(self, mocked_get_s3_client, mocked_get_file_handle):
+        mocked_get_s3_client.return_value = MockS3Client(JSONL)
+        config = {'bucket': 'test', 'sample_max_bytes': 400, 'sample_random_ranges': 1}
+
+        files = s3.get_files_to_sample(config, [{'key': 'file.jsonl'}], 5)
+        files[0]['open_file_handle']()
+
+        mocked_get_file_handle.assert_not_called()
+        self.assertEqual(2, len(mocked_get_s3_client.return_value.ranges))
+        self.assertEqual("jsonl", files[0]['extension'])
+
+    @mock.patch("tap_s3_csv.s3.get_file_handle")
+    def test_files_are_read_whole_by_default(self, mocked_get_file_handle):
+        files = s3.get_files_to_sample({'bucket': 'test'}, [{'key': 'file.csv'}], 5)
+        files[0]['open_file_handle']()
+
+        mocked_get_file_handle.assert_called_once_with({'bucket': 'test'}, 'file.csv')
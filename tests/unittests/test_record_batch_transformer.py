@@ -0,0 +1,96 @@
+import copy
+import datetime
+import decimal
+import unittest
+
+import pyarrow as pa
+from singer import metadata
+from singer.transform import SchemaMismatch
+import singer.schema_generation as schema
+
+from tap_s3_csv import transform
+
+UTC = datetime.timezone.utc
+
+TABLE = pa.table({
+    'id': pa.array([1, None, 3], pa.int64()),
+    'small': pa.array([1, 2, None], pa.int8()),
+    'name': pa.array(['a', '', None]),
+    'score': pa.array([1.5, None, 1e-05]),
+    'flag': pa.array([True, None, False]),
+    'amount': pa.array([decimal.Decimal('1.10'), None, decimal.Decimal('0.0000001')], pa.decimal128(10, 8)),
+    'day': pa.array([datetime.date(2024, 1, 2), None, datetime.date(5, 1, 1)]),
+    'created_at': pa.array([datetime.datetime(2024, 1, 1, 1, 2, 3, 4000), None, datetime.datetime(1969, 12, 31)],
+                           pa.timestamp('ms')),
+    'updated_at': pa.array([datetime.datetime(2024, 1, 1, tzinfo=UTC), None,
+                            datetime.datetime(2024, 1, 1, 0, 0, 0, 5, tzinfo=UTC)], pa.timestamp('us', tz='UTC')),
+    'tags': pa.array([['x'], None, []]),
+    'address': pa.array([{'city': 'Pune'}, None, {'city': None}]),
+    'secret': pa.array(['s', 't', 'u']),
+})
+
+
+def make_stream(json_schema, deselected=('secret',)):
+    mdata = metadata.new()
+    for field in json_schema['properties']:
+        mdata = metadata.write(mdata, ('properties', field), 'inclusion', 'available')
+        mdata = metadata.write(mdata, ('properties', field), 'selected', field not in deselected)
+    return {'schema': json_schema, 'metadata': metadata.to_list(mdata)}
+
+
+def transform_rows(stream, batch):
+    with transform.RecordTransformer(stream) as transformer:
+        return [transformer.transform(row) for row in copy.deepcopy(batch.to_pylist())]
+
+
+class TestTransformBatch(unittest.TestCase):
+
+    def assert_matches_row_transform(self, stream, batch):
+        with transform.RecordTransformer(stream) as transformer:
+            self.assertEqual(transform_rows(stream, batch), transformer.transform_batch(batch))
+
+    def test_matches_row_transform_with_discovered_schema(self):
+        discovered_schema = schema.generate_schema(TABLE.to_pylist())
+
+        self.assert_matches_row_transform(make_stream(discovered_schema), TABLE.to_batches()[0])
+
+    def test_matches_row_transform_with_other_types(self):
+        json_schema = {'type': 'object', 'properties': {
+            'id': {'type': ['null', 'number', 'integer']},
+            'small': {'type': ['string']},
+            'name': {'type': ['null', 'integer', 'string']},
+            'score': {'type': ['null', 'number']},
+            'flag': {'type': ['null', 'boolean']},
+            'amount': {'type': ['null', 'string'], 'format': 'singer.decimal'},
+            'day': {'type': ['boolean', 'null']},
+            'created_at': {'anyOf': [{'type': 'string', 'format': 'date-time'}, {'type': ['null', 'string']}]},
+            'updated_at': {},
+            'tags': {'type': ['null', 'array'], 'items': {'type': ['null', 'string']}},
+            'address': {'type': ['null', 'object'], 'properties': {'city': {'type': ['null', 'string']}}},
+        }}
+        batch = TABLE.drop(['small', 'secret']).to_batches()[0]
+
+        self.assert_matches_row_transform(make_stream(json_schema), batch)
+
+    def test_deselected_and_unknown_columns_are_dropped(self):
+        json_schema = {'type': 'object', 'properties': {'id': {'type': ['null', 'integer']},
+                                                         'secret': {'type': ['null', 'string']}}}
+
+        with transform.RecordTransformer(make_stream(json_schema)) as transformer:
+            records = transformer.transform_batch(TABLE.select(['id', 'name', 'secret']).to_batches()[0])
+
+        self.assertEqual([{'id': 1}, {'id': None}, {'id': 3}], records)
+        self.assertEqual({'name'}, transformer.transformer.removed)
+        self.assertEqual({'secret'}, transformer.transformer.filtered)
+
+    def test_schema_mismatch_is_raised(self):
+        json_schema = {'type': 'object', 'properties': {'id': {'type': 'integer'}}}
+
+        with self.assertRaises(SchemaMismatch):
+            transform.RecordTransformer(make_stream(json_schema)).transform_batch(TABLE.select(['id']).to_batches()[0])
+
+    def test_rows_are_kept_without_columns(self):
+        json_schema = {'type': 'object', 'properties': {'id': {'type': 'integer'}}}
+        batch = TABLE.select(['name']).to_batches()[0]
+
+        self.assertEqual([{}, {}, {}], transform.RecordTransformer(make_stream(json_schema)).transform_batch(batch))
@@ -0,0 +1,100 @@
+import io
+import json
+import unittest
+from datetime import datetime
+from decimal import Decimal
+from unittest import mock
+
+import singer
+
+from tap_s3_csv import output
+from tap_s3_csv import sync
+
+
+class TestRecordWriter(unittest.TestCase):
+
+    @mock.patch("sys.stdout", new_callable=io.StringIO)
+    def test_messages_match_singer_write_record(self, mocked_stdout):
+        records = [{"id": 1, "name": "ä", "amount": 1.5, "tags": ["a", None]},
+                   {"id": 2, "amount": Decimal("1.10"), "big": 2 ** 70}]
+        writer = output.RecordWriter()
+        for record in records:
+            writer.write_record("my \"table\"", record)
+        writer.flush()
+        written = mocked_stdout.getvalue()
+
+        mocked_stdout.seek(0)
+        mocked_stdout.truncate()
+        for record in records:
+            singer.write_record("my \"table\"", record)
+
+        self.assertEqual([json.loads(line) for line in mocked_stdout.getvalue().splitlines()],
+                         [json.loads(line) for line in written.splitlines()])
+        self.assertIn('"amount":1.10', written.replace(" ", ""))
+
+    @mock.patch("sys.stdout", new_callable=io.StringIO)
+    def test_non_finite_floats_are_written_like_singer_write_record(self, mocked_stdout):
+        records = [{"id": 1, "score": float("nan")},
+                   {"id": 2, "scores": [1.5, float("inf")], "nested": {"low": float("-inf")}}]
+        expected = []
+        for record in records:
+            singer.write_record("table", record)
+            expected.append(json.loads(mocked_stdout.getvalue().splitlines()[-1]))
+
+        for dumps in [output._dumps, output._fast_dumps]:
+            written = [json.loads(dumps(record)) for record in records]
+            self.assertEqual([record["record"] for record in expected], written)
+        self.assertIn("NaN", output._fast_dumps(records[0]))
+
+    @mock.patch("sys.stdout", new_callable=io.StringIO)
+    def test_records_are_written_in_batches(self, mocked_stdout):
+        writer = output.RecordWriter(batch_size=3, flush_interval=60)
+
+        writer.write_record("table", {"id": 1})
+        writer.write_record("table", {"id": 2})
+        self.assertEqual("", mocked_stdout.getvalue())
+
+        writer.write_record("table", {"id": 3})
+        self.assertEqual(3, len(mocked_stdout.getvalue().splitlines()))
+
+    @mock.patch("sys.stdout", new_callable=io.StringIO)
+    def test_records_are_written_after_flush_interval(self, mocked_stdout):
+        writer = output.RecordWriter(batch_size=1000, flush_interval=0.000001)
+
+        writer.write_record("table", {"id": 1})
+
+        self.assertEqual(1, len(mocked_stdout.getvalue().splitlines()))
+
+    def test_configure(self):
+        output.configure({"output_batch_size": "10", "output_flush_interval": "0.5"})
+        self.assertEqual(10, output._record_writer.batch_size)
+        self.assertEqual(0.5, output._record_writer.flush_interval)
+
+        output.configure({"output_batch_size": "", "output_flush_interval": 0})
+        self.assertEqual(output.OUTPUT_BATCH_SIZE, output._record_writer.batch_size)
+        self.assertEqual(output.OUTPUT_FLUSH_INTERVAL, output._record_writer.flush_interval)
+
+
+class TestRecordsFlushedBeforeState(unittest.TestCase):
+
+    def tearDown(self):
+        output.configure({})
+
+    @mock.patch("tap_s3_csv.s3.get_input_files_for_table")
+    @mock.patch("tap_s3_csv.sync.sync_table_file")
+    @mock.patch("sys.stdout", new_callable=io.StringIO)
+    def test_state_is_written_after_records(self, mocked_stdout, mocked_sync_table_file, mocked_get_input_files):
+        def mock_sync_table_file(config, s3_path, table_spec, stream):
+            sync.write_record("table", {"file": s3_path})
+            return 1
+
+        mocked_sync_table_file.side_effect = mock_sync_table_file
+        mocked_get_input_files.return_value = [{"key": "file1.csv", "last_modified": datetime(2024, 1, 1)},
+                                               {"key": "file2.csv", "last_modified": datetime(2024, 1, 2)}]
+        output.configure({"output_flush_interval": 60})
+
+        sync.sync_stream({"start_date": "2024-01-01T00:00:00Z"}, {}, {"table_name": "table"}, {},
+                         datetime(2024, 2, 1))
+
+        messages = [json.loads(line)["type"] for line in mocked_stdout.getvalue().splitlines()]
+        self.assertEqual(["RECORD", "STATE", "RECORD", "STATE"], messages)
@@ -0,0 +1,126 @@
+import copy
+import unittest
+from unittest import mock
+
+from singer import metadata
+from singer import Transformer
+from singer.transform import SchemaMismatch
+
+from tap_s3_csv import sync
+from tap_s3_csv import transform
+
+SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'id': {'type': ['null', 'integer']},
+        'name': {'type': ['null', 'string']},
+        'amount': {'type': ['null', 'string'], 'format': 'singer.decimal'},
+        'score': {'type': ['number', 'null']},
+        'active': {'type': ['null', 'boolean']},
+        'created_at': {'anyOf': [{'type': 'string', 'format': 'date-time'}, {'type': ['null', 'string']}]},
+        'tags': {'type': ['null', 'array'], 'items': {'type': ['null', 'string']}},
+        'address': {'type': ['null', 'object'], 'properties': {'city': {'type': ['null', 'string']}}},
+        'secret': {'type': ['null', 'string']},
+        '_sdc_source_lineno': {'type': 'integer'}
+    }
+}
+
+RECORDS = [
+    {'id': '1', 'name': 'a', 'amount': '1.50', 'score': '1,000.5', 'active': 'false',
+     'created_at': '2024-01-01', 'tags': ['x', 1], 'address': {'city': 'Pune', 'zip': 1},
+     'secret': 's', 'unknown': 'u', '_sdc_source_lineno': 2},
+    {'id': '', 'name': None, 'amount': '', 'score': '', 'active': '', 'created_at': 'not a date',
+     'tags': [], 'address': None, 'secret': '', '_sdc_source_lineno': 3},
+    {'id': 3, 'name': 3, 'amount': 3.25, 'score': 3, 'active': 1, 'created_at': '',
+     '_sdc_source_lineno': 4},
+]
+
+
+def make_stream(schema=SCHEMA, deselected=('secret',)):
+    mdata = metadata.new()
+    for field in schema.get('properties', {}):
+        mdata = metadata.write(mdata, ('properties', field), 'inclusion', 'available')
+        mdata = metadata.write(mdata, ('properties', field), 'selected', field not in deselected)
+    return {'schema': schema, 'metadata': metadata.to_list(mdata)}
+
+
+def singer_transform(record, stream):
+    with Transformer() as transformer:
+        return transformer.transform(record, stream['schema'], metadata.to_map(stream['metadata']))
+
+
+class TestRecordTransformer(unittest.TestCase):
+
+    def test_matches_singer_transformer(self):
+        stream = make_stream()
+        with transform.RecordTransformer(stream) as transformer:
+            for record in RECORDS:
+                self.assertEqual(singer_transform(copy.deepcopy(record), stream),
+                                 transformer.transform(copy.deepcopy(record)))
+
+    def test_deselected_and_unknown_fields_are_dropped(self):
+        with transform.RecordTransformer(make_stream()) as transformer:
+            to_write = transformer.transform(copy.deepcopy(RECORDS[0]))
+
+        self.assertNotIn('secret', to_write)
+        self.assertNotIn('unknown', to_write)
+
+    def test_deselected_fields_are_popped_from_the_record(self):
+        record = copy.deepcopy(RECORDS[0])
+        with transform.RecordTransformer(make_stream()) as transformer:
+            transformer.transform(record)
+
+        self.assertNotIn('secret', record)
+        self.assertIn('unknown', record)
+
+    @mock.patch("tap_s3_csv.sync.LOGGER.warning")
+    @mock.patch("tap_s3_csv.output.write_record")
+    def test_deselected_jsonl_fields_are_not_stored_in_sdc_extra(self, mocked_write_record, mocked_logger):
+        schema = copy.deepcopy(SCHEMA)
+        schema['properties'].update({
+            '_sdc_source_bucket': {'type': 'string'},
+            '_sdc_source_file': {'type': 'string'},
+            '_sdc_extra': {'type': ['null', 'array'], 'items': {'type': 'object', 'properties': {}}}})
+        stream = make_stream(schema)
+        rows = [{'id': 1, 'secret': 's'}, {'id': 2, 'secret': 's', 'unknown': 'u'}]
+
+        sync.sync_jsonl_file({'bucket': 'test'}, iter(rows), 'data.jsonl', {'table_name': 'table'}, stream)
+
+        records = [call.args[1] for call in mocked_write_record.call_args_list]
+        self.assertNotIn('_sdc_extra', records[0])
+        self.assertEqual([{'unknown': 'u'}], records[1]['_sdc_extra'])
+        self.assertNotIn('secret', str(mocked_logger.call_args_list))
+
+    def test_schema_mismatch_only_reports_the_errors_of_its_record(self):
+        stream = make_stream()
+        with transform.RecordTransformer(stream) as transformer:
+            with self.assertRaises(SchemaMismatch):
+                transformer.transform({'id': 'abc', '_sdc_source_lineno': 2})
+            with self.assertRaises(SchemaMismatch) as context:
+                transformer.transform({'id': 'def', '_sdc_source_lineno': 3})
+
+        self.assertEqual(1, len(transformer.transformer.errors))
+        self.assertEqual(2, str(context.exception).count("data does not match"))
+
+    def test_automatic_fields_are_kept_when_deselected(self):
+        stream = make_stream(deselected=('id',))
+        mdata = metadata.to_map(stream['metadata'])
+        mdata = metadata.write(mdata, ('properties', 'id'), 'inclusion', 'automatic')
+        stream['metadata'] = metadata.to_list(mdata)
+
+        with transform.RecordTransformer(stream) as transformer:
+            self.assertEqual(1, transformer.transform({'id': '1'})['id'])
+
+    def test_schema_mismatch_is_raised(self):
+        stream = make_stream()
+        record = {'id': 'abc', '_sdc_source_lineno': 2}
+
+        with self.assertRaises(SchemaMismatch):
+            singer_transform(dict(record), stream)
+        with self.assertRaises(SchemaMismatch):
+            transform.RecordTransformer(stream).transform(dict(record))
+
+    def test_schema_without_properties_keeps_every_field(self):
+        stream = {'schema': {'type': 'object', 'properties': {}}, 'metadata': []}
+
+        self.assertEqual({'a': 1}, transform.RecordTransformer(stream).transform({'a': 1}))
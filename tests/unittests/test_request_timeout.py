@@ -9,6 +9,9 @@ from botocore.paginate import PageIterator
 @mock.patch("tap_s3_csv.s3.Config")
 class TestRequestTimeoutValue(unittest.TestCase):
 
+    def setUp(self):
+        s3.clear_s3_clients()
+
     def test_no_request_timeout_in_config(self, mocked_boto_config, mocked_client, mocked_resource):
         """
             Verify that if request_timeout is not provided in config then default value is used
@@ -17,12 +20,12 @@ class TestRequestTimeoutValue(unittest.TestCase):
         # Call get_file_handle() which set timeout with Config object
         s3.get_file_handle(config, "test")
         # Verify Config is called with expected timeout
-        mocked_boto_config.assert_called_with(connect_timeout=300, read_timeout=300)
+        mocked_boto_config.assert_called_with(connect_timeout=300, read_timeout=300, max_pool_connections=10)
 
         # Call list_files_in_bucket() which set timeout with Config object
         file_handles = list(s3.list_files_in_bucket(config, "test"))
         # Verify Config is called with expected timeout
-        mocked_boto_config.assert_called_with(connect_timeout=300, read_timeout=300)
+        mocked_boto_config.assert_called_with(connect_timeout=300, read_timeout=300, max_pool_connections=10)
 
     def test_integer_request_timeout_in_config(self, mocked_boto_config, mocked_client, mocked_resource):
         """
@@ -32,13 +35,13 @@ class TestRequestTimeoutValue(unittest.TestCase):
         # Call get_file_handle() which set timeout with Config object
         s3.get_file_handle(config, "test")
         # Verify Config is called with expected timeout
-        mocked_boto_config.assert_called_with(connect_timeout=100, read_timeout=100)
+        mocked_boto_config.assert_called_with(connect_timeout=100, read_timeout=100, max_pool_connections=10)
 
         config = {"bucket": "test", "request_timeout": 200} # integer timeout in config
         # Call list_files_in_bucket() which set timeout with Config object
         file_handles = list(s3.list_files_in_bucket(config, "test"))
         # Verify Config is called with expected timeout
-        mocked_boto_config.assert_called_with(connect_timeout=200, read_timeout=200)
+        mocked_boto_config.assert_called_with(connect_timeout=200, read_timeout=200, max_pool_connections=10)
 
     def test_float_request_timeout_in_config(self, mocked_boto_config, mocked_client, mocked_resource):
         """
@@ -48,13 +51,13 @@ class TestRequestTimeoutValue(unittest.TestCase):
         # Call get_file_handle() which set timeout with Config object
         s3.get_file_handle(config, "test")
         # Verify Config is called with expected timeout
-        mocked_boto_config.assert_called_with(connect_timeout=100.5, read_timeout=100.5)
+        mocked_boto_config.assert_called_with(connect_timeout=100.5, read_timeout=100.5, max_pool_connections=10)
 
         config = {"bucket": "test", "request_timeout": 200.5} # float timeout in config
         # Call list_files_in_bucket() which set timeout with Config object
         file_handles = list(s3.list_files_in_bucket(config, "test"))
         # Verify Config is called with expected timeout
-        mocked_boto_config.assert_called_with(connect_timeout=200.5, read_timeout=200.5)
+        mocked_boto_config.assert_called_with(connect_timeout=200.5, read_timeout=200.5, max_pool_connections=10)
 
     def test_string_request_timeout_in_config(self, mocked_boto_config, mocked_client, mocked_resource):
         """
@@ -64,12 +67,12 @@ class TestRequestTimeoutValue(unittest.TestCase):
         # Call get_file_handle() which set timeout with Config object
         s3.get_file_handle(config, "test")
         # Verify Config is called with expected timeout
-        mocked_boto_config.assert_called_with(connect_timeout=100, read_timeout=100)
+        mocked_boto_config.assert_called_with(connect_timeout=100, read_timeout=100, max_pool_connections=10)
 
         # Call list_files_in_bucket() which set timeout with Config object
         file_handles = list(s3.list_files_in_bucket(config, "test"))
         # Verify Config is called with expected timeout
-        mocked_boto_config.assert_called_with(connect_timeout=100, read_timeout=100)
+        mocked_boto_config.assert_called_with(connect_timeout=100, read_timeout=100, max_pool_connections=10)
 
     def test_empty_string_request_timeout_in_config(self, mocked_boto_config, mocked_client, mocked_resource):
         """
@@ -79,12 +82,12 @@ class TestRequestTimeoutValue(unittest.TestCase):
         # Call get_file_handle() which set timeout with Config object
         s3.get_file_handle(config, "test")
         # Verify Config is called with expected timeout
-        mocked_boto_config.assert_called_with(connect_timeout=300, read_timeout=300)
+        mocked_boto_config.assert_called_with(connect_timeout=300, read_timeout=300, max_pool_connections=10)
 
         # Call list_files_in_bucket() which set timeout with Config object
         file_handles = list(s3.list_files_in_bucket(config, "test"))
         # Verify Config is called with expected timeout
-        mocked_boto_config.assert_called_with(connect_timeout=300, read_timeout=300)
+        mocked_boto_config.assert_called_with(connect_timeout=300, read_timeout=300, max_pool_connections=10)
 
     def test_zero_request_timeout_in_config(self, mocked_boto_config, mocked_client, mocked_resource):
         """
@@ -94,12 +97,12 @@ class TestRequestTimeoutValue(unittest.TestCase):
         # Call get_file_handle() which set timeout with Config object
         s3.get_file_handle(config, "test")
         # Verify Config is called with expected timeout
-        mocked_boto_config.assert_called_with(connect_timeout=300, read_timeout=300)
+        mocked_boto_config.assert_called_with(connect_timeout=300, read_timeout=300, max_pool_connections=10)
 
         # Call list_files_in_bucket() which set timeout with Config object
         file_handles = list(s3.list_files_in_bucket(config, "test"))
         # Verify Config is called with expected timeout
-        mocked_boto_config.assert_called_with(connect_timeout=300, read_timeout=300)
+        mocked_boto_config.assert_called_with(connect_timeout=300, read_timeout=300, max_pool_connections=10)
 
     def test_zero_string_request_timeout_in_config(self, mocked_boto_config, mocked_client, mocked_resource):
         """
@@ -109,46 +112,35 @@ class TestRequestTimeoutValue(unittest.TestCase):
         # Call get_file_handle() which set timeout with Config object
         s3.get_file_handle(config, "test")
         # Verify Config is called with expected timeout
-        mocked_boto_config.assert_called_with(connect_timeout=300, read_timeout=300)
+        mocked_boto_config.assert_called_with(connect_timeout=300, read_timeout=300, max_pool_connections=10)
 
         # Call list_files_in_bucket() which set timeout with Config object
         file_handles = list(s3.list_files_in_bucket(config, "test"))
         # Verify Config is called with expected timeout
-        mocked_boto_config.assert_called_with(connect_timeout=300, read_timeout=300)
-
-# Mock objects for boto resource
-class MockObjectConnect:
-    def get():
-        raise ConnectTimeoutError(endpoint_url="test")
-
-class MockBucketConnect:
-    def Object(self):
-        return MockObjectConnect
-    
-class MockResourceConnect:
-    def Bucket(self):
-        return MockBucketConnect
+        mocked_boto_config.assert_called_with(connect_timeout=300, read_timeout=300, max_pool_connections=10)
 
 @mock.patch("time.sleep")
 class TestConnectTimeoutErrorBackoff(unittest.TestCase):
 
-    @mock.patch("boto3.resource")
+    @mock.patch("boto3.client")
     @mock.patch("tap_s3_csv.s3.Config")
-    def test_connect_timeout_on_get_file_handle(self, mocked_boto_config, mocked_resource, mocked_sleep):
+    def test_connect_timeout_on_get_file_handle(self, mocked_boto_config, mocked_client, mocked_sleep):
         """
             Verify that backoff is working properly on get_file_handle() function for ConnectTimeoutError
         """
-        # Set config and resource object to raise ConnectTimeoutError
+        # Set config and client object to raise ConnectTimeoutError
         config = {"bucket": "test"}
-        mocked_resource.return_value = MockResourceConnect
+        s3.clear_s3_clients()
+        mocked_client.return_value.get_object.side_effect = ConnectTimeoutError(endpoint_url="test")
         try:
             s3.get_file_handle(config, "test")
         except ConnectTimeoutError as e:
             pass
-    
-        # Verify that resource ans Config object called 5 times
-        self.assertEqual(mocked_resource.call_count, 5)
-        self.assertEqual(mocked_boto_config.call_count, 5)
+
+        # Verify that the request is retried 5 times with the same shared client
+        self.assertEqual(mocked_client.return_value.get_object.call_count, 5)
+        self.assertEqual(mocked_client.call_count, 1)
+        self.assertEqual(mocked_boto_config.call_count, 1)
 
     def test_connect_timeout_on_make_request(self, mocked_sleep):
         """
@@ -169,39 +161,28 @@ class TestConnectTimeoutErrorBackoff(unittest.TestCase):
         self.assertEqual(mocked_method.call_count, 5)
 
 
-# Mock objects for boto resource
-class MockObjectRead:
-    def get():
-        raise ReadTimeoutError(endpoint_url="test")
-
-class MockBucketRead:
-    def Object(self):
-        return MockObjectRead
-    
-class MockResourceRead:
-    def Bucket(self):
-        return MockBucketRead
-
 @mock.patch("time.sleep")
 class TestReadTimeoutErrorBackoff(unittest.TestCase):
     
-    @mock.patch("boto3.resource")
+    @mock.patch("boto3.client")
     @mock.patch("tap_s3_csv.s3.Config")
-    def test_read_timeout_on_get_file_handle(self, mocked_boto_config, mocked_resource, mocked_sleep):
+    def test_read_timeout_on_get_file_handle(self, mocked_boto_config, mocked_client, mocked_sleep):
         """
             Verify that backoff is working properly on get_file_handle() function for ReadTimeoutError
         """
-        # Set config and resource object to raise ReadTimeoutError
+        # Set config and client object to raise ReadTimeoutError
         config = {"bucket": "test"}
-        mocked_resource.return_value = MockResourceRead
+        s3.clear_s3_clients()
+        mocked_client.return_value.get_object.side_effect = ReadTimeoutError(endpoint_url="test")
         try:
             s3.get_file_handle(config, "test")
         except ReadTimeoutError as e:
             pass
 
-        # Verify that resource ans Config object called 5 times
-        self.assertEqual(mocked_resource.call_count, 5)
-        self.assertEqual(mocked_boto_config.call_count, 5)
+        # Verify that the request is retried 5 times with the same shared client
+        self.assertEqual(mocked_client.return_value.get_object.call_count, 5)
+        self.assertEqual(mocked_client.call_count, 1)
+        self.assertEqual(mocked_boto_config.call_count, 1)
 
     def test_read_timeout_on_make_request(self, mocked_sleep):
         """
@@ -220,3 +201,41 @@ class TestReadTimeoutErrorBackoff(unittest.TestCase):
     
         # Verify that PageIterator.method called 5 times
         self.assertEqual(mocked_method.call_count, 5)
+
+
+@mock.patch("boto3.client")
+class TestSharedS3Client(unittest.TestCase):
+
+    def setUp(self):
+        s3.clear_s3_clients()
+
+    def test_client_is_reused_across_calls(self, mocked_client):
+        """
+            Verify that listing and file handles share a single client
+        """
+        config = {"bucket": "test"}
+        s3.get_file_handle(config, "test_1")
+        s3.get_file_handle(config, "test_2")
+        list(s3.list_files_in_bucket(config, "test"))
+
+        self.assertEqual(mocked_client.call_count, 1)
+        self.assertEqual(mocked_client.return_value.get_object.call_count, 2)
+
+    def test_pool_size_from_config(self, mocked_client):
+        """
+            Verify that the connection pool is sized by max_pool_connections
+        """
+        s3.get_s3_client({"max_pool_connections": "50"})
+
+        client_config = mocked_client.call_args.kwargs["config"]
+        self.assertEqual(client_config.max_pool_connections, 50)
+
+    def test_clients_are_rebuilt_after_clearing(self, mocked_client):
+        """
+            Verify that a new client is created once the cached ones are cleared
+        """
+        s3.get_s3_client({})
+        s3.clear_s3_clients()
+        s3.get_s3_client({})
+
+        self.assertEqual(mocked_client.call_count, 2)
@@ -0,0 +1,141 @@
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+from unittest import mock
+
+from tap_s3_csv import s3
+from tap_s3_csv import schema_cache
+
+RECORDS = {
+    "file1.csv": [{'id': '1', 'name': 'a'}, {'id': '2', 'name': None}],
+    "file2.csv": [{'id': 'x', 'amount': '1.5', 'nested': {'a': [1]}}],
+    "file3.csv": [{'id': '3', 'flag': True}],
+}
+
+S3_FILES = [{'key': key, 'last_modified': datetime(2024, 1, 1), 'etag': '"{}"'.format(key), 'size': 10}
+            for key in RECORDS]
+
+
+def mock_get_files_to_sample(config, s3_files, max_files, zip_files=None):
+    return [{"s3_path": s3_file['key'], "file_handle": None, "extension": "csv"} for s3_file in s3_files][:max_files]
+
+
+def mock_sample_file(table_spec, s3_path, file_handle, sample_rate, extension, max_records=1000):
+    yield from RECORDS[s3_path]
+
+
+@mock.patch("tap_s3_csv.s3.sample_file", side_effect=mock_sample_file)
+@mock.patch("tap_s3_csv.s3.get_files_to_sample", side_effect=mock_get_files_to_sample)
+@mock.patch("tap_s3_csv.s3.get_input_files_for_table")
+class TestSchemaCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_path = tempfile.mkdtemp()
+        self.config = {'bucket': 'test', 'schema_cache_path': self.cache_path}
+        self.table_spec = {'table_name': 'test', 'date_overrides': ['id']}
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_path)
+
+    def test_schema_matches_uncached_sampling(self, mocked_get_input_files, mocked_get_files_to_sample,
+                                              mocked_sample_file):
+        mocked_get_input_files.side_effect = lambda config, table_spec, sharded: iter(S3_FILES)
+
+        uncached = s3.get_sampled_schema_for_table({'bucket': 'test'}, self.table_spec)
+        first = s3.get_sampled_schema_for_table(self.config, self.table_spec)
+        cached = s3.get_sampled_schema_for_table(self.config, self.table_spec)
+
+        self.assertEqual(uncached, first)
+        self.assertEqual(uncached, cached)
+        self.assertEqual(list(uncached['properties']), list(cached['properties']))
+
+    def test_unchanged_files_are_not_sampled_again(self, mocked_get_input_files, mocked_get_files_to_sample,
+                                                   mocked_sample_file):
+        mocked_get_input_files.side_effect = lambda config, table_spec, sharded: iter(S3_FILES)
+        s3.get_sampled_schema_for_table(self.config, self.table_spec)
+        mocked_get_files_to_sample.reset_mock()
+
+        s3.get_sampled_schema_for_table(self.config, self.table_spec)
+
+        mocked_get_files_to_sample.assert_not_called()
+
+    def test_changed_files_are_sampled_again(self, mocked_get_input_files, mocked_get_files_to_sample,
+                                             mocked_sample_file):
+        mocked_get_input_files.side_effect = lambda config, table_spec, sharded: iter(S3_FILES)
+        s3.get_sampled_schema_for_table(self.config, self.table_spec)
+        mocked_get_files_to_sample.reset_mock()
+
+        changed_files = [dict(S3_FILES[0], etag='"changed"')] + S3_FILES[1:]
+        mocked_get_input_files.side_effect = lambda config, table_spec, sharded: iter(changed_files)
+        s3.get_sampled_schema_for_table(self.config, self.table_spec)
+
+        mocked_get_files_to_sample.assert_called_once_with(self.config, [changed_files[0]], 5, mock.ANY)
+
+    def test_sampling_parameters_are_part_of_the_key(self, mocked_get_input_files, mocked_get_files_to_sample,
+                                                     mocked_sample_file):
+        mocked_get_input_files.side_effect = lambda config, table_spec, sharded: iter(S3_FILES)
+        s3.get_sampled_schema_for_table(self.config, self.table_spec)
+        mocked_get_files_to_sample.reset_mock()
+
+        s3.get_sampled_schema_for_table(self.config, dict(self.table_spec, delimiter='|'))
+
+        self.assertEqual(3, mocked_get_files_to_sample.call_count)
+
+    def test_jsonl_check_settings_are_part_of_the_key(self, mocked_get_input_files, mocked_get_files_to_sample,
+                                                      mocked_sample_file):
+        mocked_get_input_files.side_effect = lambda config, table_spec, sharded: iter(S3_FILES)
+        s3.get_sampled_schema_for_table(self.config, self.table_spec)
+        mocked_get_files_to_sample.reset_mock()
+
+        s3.get_sampled_schema_for_table(self.config, dict(self.table_spec, key_properties=['id']))
+        s3.get_sampled_schema_for_table(self.config, dict(self.table_spec, date_overrides=['name']))
+
+        self.assertEqual(6, mocked_get_files_to_sample.call_count)
+
+    def test_skipped_files_are_counted_on_cache_hits(self, mocked_get_input_files, mocked_get_files_to_sample,
+                                                     mocked_sample_file):
+        def sample_file(table_spec, s3_path, file_handle, sample_rate, extension, max_records=1000):
+            if s3_path == "file2.csv":
+                s3.increment_skipped_files_count()
+                return
+            yield from RECORDS[s3_path]
+        mocked_sample_file.side_effect = sample_file
+        cache = schema_cache.SchemaCache(self.cache_path)
+
+        skipped_files_counts = []
+        for _ in range(2):
+            s3.skipped_files_count = 0
+            s3.sample_files_with_cache(self.config, self.table_spec, S3_FILES, cache)
+            skipped_files_counts.append(s3.skipped_files_count)
+
+        # The second run only used the cache
+        self.assertEqual(3, mocked_get_files_to_sample.call_count)
+        self.assertEqual([1, 1], skipped_files_counts)
+        s3.skipped_files_count = 0
+
+    def test_max_files_includes_cached_files(self, mocked_get_input_files, mocked_get_files_to_sample,
+                                             mocked_sample_file):
+        many_files = S3_FILES * 3
+        cache = schema_cache.SchemaCache(self.cache_path)
+
+        samples_count, _ = s3.sample_files_with_cache(self.config, self.table_spec, many_files, cache)
+        cached_samples_count, _ = s3.sample_files_with_cache(self.config, self.table_spec, many_files, cache)
+
+        # file1, file2, file3, file1, file2
+        self.assertEqual(7, samples_count)
+        self.assertEqual(7, cached_samples_count)
+
+
+class TestMergeObservations(unittest.TestCase):
+
+    def test_merged_observations_match_observations_of_all_records(self):
+        records = [record for file_records in RECORDS.values() for record in file_records]
+        merged = {}
+        for file_records in RECORDS.values():
+            observations = {}
+            for record in file_records:
+                s3.schema.add_observations(observations, [], record)
+            schema_cache.merge_observations(merged, observations)
+
+        self.assertEqual(s3.schema.generate_schema(records), s3.schema.to_json_schema(merged))
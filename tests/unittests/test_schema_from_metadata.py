@@ -0,0 +1,152 @@
+import datetime
+import decimal
+import io
+import unittest
+from unittest import mock
+
+import fastavro
+import pyarrow as pa
+import pyarrow.parquet as pq
+import singer.schema_generation as schema
+
+from tap_s3_csv import file_schema
+from tap_s3_csv import s3
+
+PARQUET_TABLE = pa.table({
+    'id': pa.array([1, 2], pa.int64()),
+    'small': pa.array([1, 2], pa.uint8()),
+    'score': pa.array([1.5, 2.5], pa.float32()),
+    'flag': pa.array([True, False]),
+    'name': pa.array(['a', 'b']),
+    'category': pa.array(['a', 'b']).dictionary_encode(),
+    'blob': pa.array([b'a', b'b']),
+    'amount': pa.array([decimal.Decimal('1.10'), decimal.Decimal('2.20')], pa.decimal128(10, 2)),
+    'day': pa.array([datetime.date(2024, 1, 1), datetime.date(2024, 1, 2)]),
+    'created_at': pa.array([datetime.datetime(2024, 1, 1), datetime.datetime(2024, 1, 2)], pa.timestamp('ms', tz='UTC')),
+    'tags': pa.array([['x'], ['y', 'z']]),
+    'scores': pa.array([[1.5], [2.5]]),
+    'address': pa.array([{'city': 'Pune', 'zip': 1}, {'city': 'Delhi', 'zip': 2}]),
+    'attributes': pa.array([[('a', 1)], [('b', 2)]], pa.map_(pa.string(), pa.int64())),
+})
+
+AVRO_SCHEMA = {
+    'type': 'record',
+    'name': 'Row',
+    'namespace': 'test',
+    'fields': [
+        {'name': 'id', 'type': 'long'},
+        {'name': 'score', 'type': ['null', 'double']},
+        {'name': 'flag', 'type': 'boolean'},
+        {'name': 'name', 'type': 'string'},
+        {'name': 'blob', 'type': 'bytes'},
+        {'name': 'kind', 'type': {'type': 'enum', 'name': 'Kind', 'symbols': ['A', 'B']}},
+        {'name': 'other_kind', 'type': 'Kind'},
+        {'name': 'created_at', 'type': {'type': 'long', 'logicalType': 'timestamp-millis'}},
+        {'name': 'day', 'type': {'type': 'int', 'logicalType': 'date'}},
+        {'name': 'value', 'type': ['long', 'string']},
+        {'name': 'tags', 'type': {'type': 'array', 'items': 'string'}},
+        {'name': 'address', 'type': {'type': 'record', 'name': 'Address', 'fields': [
+            {'name': 'city', 'type': 'string'}, {'name': 'zip', 'type': ['null', 'int']}]}},
+        {'name': 'previous_address', 'type': ['null', 'test.Address']},
+    ]
+}
+
+AVRO_RECORDS = [
+    {'id': 1, 'score': 1.5, 'flag': True, 'name': 'a', 'blob': b'a', 'kind': 'A', 'other_kind': 'B',
+     'created_at': datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc), 'day': datetime.date(2024, 1, 1),
+     'value': 1, 'tags': ['x'], 'address': {'city': 'Pune', 'zip': 1},
+     'previous_address': {'city': 'Delhi', 'zip': 2}},
+    {'id': 2, 'score': 2.5, 'flag': False, 'name': 'b', 'blob': b'b', 'kind': 'B', 'other_kind': 'A',
+     'created_at': datetime.datetime(2024, 1, 2, tzinfo=datetime.timezone.utc), 'day': datetime.date(2024, 1, 2),
+     'value': 'two', 'tags': ['y', 'z'], 'address': {'city': 'Delhi', 'zip': 2},
+     'previous_address': {'city': 'Pune', 'zip': 3}},
+]
+
+
+def make_parquet_file():
+    parquet_file = io.BytesIO()
+    pq.write_table(PARQUET_TABLE, parquet_file)
+    parquet_file.seek(0)
+    return parquet_file
+
+
+def make_avro_file():
+    avro_file = io.BytesIO()
+    fastavro.writer(avro_file, AVRO_SCHEMA, AVRO_RECORDS)
+    avro_file.seek(0)
+    return avro_file
+
+
+def generate_schema(records):
+    observations = {}
+    for record in records:
+        file_schema.add_observations(observations, [], record)
+    return schema.to_json_schema(observations)
+
+
+class TestSchemaFromMetadata(unittest.TestCase):
+
+    def test_parquet_schema_matches_sampled_schema(self):
+        sampled_schema = schema.generate_schema(PARQUET_TABLE.to_pylist())
+
+        prototype_records = file_schema.get_parquet_prototype_records(make_parquet_file())
+
+        self.assertEqual(sampled_schema, schema.generate_schema(prototype_records))
+
+    def test_avro_schema_matches_sampled_schema(self):
+        sampled_schema = schema.generate_schema(list(fastavro.reader(make_avro_file())))
+
+        prototype_records = file_schema.get_avro_prototype_records(make_avro_file())
+
+        self.assertEqual(sampled_schema, schema.generate_schema(prototype_records))
+
+    def test_avro_map_fields_are_kept(self):
+        avro_schema = {'type': 'record', 'name': 'Row', 'fields': [
+            {'name': 'id', 'type': 'long'},
+            {'name': 'attributes', 'type': {'type': 'map', 'values': 'long'}},
+            {'name': 'labels', 'type': ['null', {'type': 'map', 'values': 'string'}]}]}
+        avro_file = io.BytesIO()
+        fastavro.writer(avro_file, avro_schema, [{'id': 1, 'attributes': {'a': 1}, 'labels': None}])
+        avro_file.seek(0)
+
+        prototype_records = file_schema.get_avro_prototype_records(avro_file)
+
+        properties = generate_schema(prototype_records)['properties']
+        self.assertEqual({'type': ['null', 'object'], 'properties': {}}, properties['attributes'])
+        self.assertEqual({'type': ['null', 'object'], 'properties': {}}, properties['labels'])
+
+    def test_avro_recursive_records_are_expanded_once(self):
+        avro_schema = {'type': 'record', 'name': 'Node', 'fields': [
+            {'name': 'value', 'type': 'long'},
+            {'name': 'next', 'type': ['null', 'Node']},
+            {'name': 'children', 'type': {'type': 'array', 'items': 'Node'}}]}
+        avro_file = io.BytesIO()
+        fastavro.writer(avro_file, avro_schema, [{'value': 1, 'next': None, 'children': []}])
+        avro_file.seek(0)
+
+        prototype_records = file_schema.get_avro_prototype_records(avro_file)
+
+        properties = generate_schema(prototype_records)['properties']
+        self.assertEqual({'type': ['null', 'integer']}, properties['value'])
+        self.assertEqual({'type': ['null', 'object'], 'properties': {}}, properties['next'])
+        self.assertEqual({'type': ['null', 'array'], 'items': {'type': ['null', 'object'], 'properties': {}}},
+                         properties['children'])
+
+    @mock.patch("tap_s3_csv.s3.get_records_for_parquet")
+    def test_sample_file_uses_footer_when_configured(self, mocked_get_records_for_parquet):
+        records = s3.sample_file({'schema_from_metadata': True}, 'file.parquet', make_parquet_file(), 5, 'parquet')
+
+        mocked_get_records_for_parquet.assert_not_called()
+        self.assertEqual(schema.generate_schema(PARQUET_TABLE.to_pylist()), schema.generate_schema(records))
+
+    @mock.patch("tap_s3_csv.s3.get_records_for_iterator")
+    def test_sample_file_uses_header_when_configured(self, mocked_get_records_for_iterator):
+        records = s3.sample_file({'schema_from_metadata': True}, 'file.avro', make_avro_file(), 5, 'avro')
+
+        mocked_get_records_for_iterator.assert_not_called()
+        self.assertEqual(2, len(records))
+
+    def test_sample_file_reads_rows_by_default(self):
+        records = list(s3.sample_file({}, 'file.parquet', make_parquet_file(), 1, 'parquet'))
+
+        self.assertEqual(PARQUET_TABLE.to_pylist(), records)
@@ -0,0 +1,152 @@
+import time
+import unittest
+from unittest import mock
+
+from tap_s3_csv import s3
+from tap_s3_csv import utils
+
+KEYS = sorted([
+    "exports/a.csv",
+    "exports/2024/01/a.csv",
+    "exports/2024/01/b.csv",
+    "exports/2024/02/a.csv",
+    "exports/2024-summary.csv",
+    "exports/2025/01/a.csv",
+    "exports/z.csv",
+])
+
+
+class MockPaginator():
+
+    def __init__(self, keys, calls):
+        self.keys = keys
+        self.calls = calls
+
+    def paginate(self, **args):
+        self.calls.append(args)
+        prefix = args.get('Prefix', '')
+        delimiter = args.get('Delimiter')
+        contents = []
+        common_prefixes = []
+        for key in self.keys:
+            if not key.startswith(prefix):
+                continue
+            rest = key[len(prefix):]
+            if delimiter and delimiter in rest:
+                common_prefix = prefix + rest.split(delimiter)[0] + delimiter
+                if common_prefix not in common_prefixes:
+                    common_prefixes.append(common_prefix)
+            else:
+                contents.append({'Key': key})
+
+        page = {'Contents': contents}
+        if delimiter:
+            page['CommonPrefixes'] = [{'Prefix': common_prefix} for common_prefix in common_prefixes]
+        return [page]
+
+
+class TestShardedListing(unittest.TestCase):
+
+    def setUp(self):
+        s3.clear_s3_clients()
+
+    @mock.patch("boto3.client")
+    def test_sharded_listing_matches_single_listing(self, mocked_client):
+        calls = []
+        mocked_client.return_value.get_paginator.return_value = MockPaginator(KEYS, calls)
+
+        single = [s3_object['Key'] for s3_object in s3.list_files_in_bucket({'bucket': 'test'}, 'exports/')]
+        sharded = [s3_object['Key'] for s3_object in
+                   s3.list_files_in_bucket({'bucket': 'test', 'list_concurrency': 4}, 'exports/')]
+
+        self.assertEqual(KEYS, single)
+        self.assertEqual(KEYS, sharded)
+
+    @mock.patch("boto3.client")
+    def test_each_sub_prefix_is_listed_once(self, mocked_client):
+        calls = []
+        mocked_client.return_value.get_paginator.return_value = MockPaginator(KEYS, calls)
+
+        list(s3.list_files_in_bucket({'bucket': 'test', 'list_concurrency': '4'}, 'exports/'))
+
+        self.assertEqual({'Bucket': 'test', 'MaxKeys': 1000, 'Prefix': 'exports/', 'Delimiter': '/'}, calls[0])
+        self.assertEqual(['exports/2024/', 'exports/2025/'], sorted(call['Prefix'] for call in calls[1:]))
+
+
+    @mock.patch("boto3.client")
+    def test_unsharded_listing_ignores_list_concurrency(self, mocked_client):
+        calls = []
+        mocked_client.return_value.get_paginator.return_value = MockPaginator(KEYS, calls)
+
+        keys = [s3_object['Key'] for s3_object in
+                s3.list_files_in_bucket({'bucket': 'test', 'list_concurrency': '4'}, 'exports/', sharded=False)]
+
+        self.assertEqual(KEYS, keys)
+        self.assertEqual([{'Bucket': 'test', 'MaxKeys': 1000, 'Prefix': 'exports/'}], calls)
+
+    @mock.patch("boto3.client")
+    def test_shards_are_listed_page_by_page(self, mocked_client):
+        pages_listed = []
+        def paginate(**args):
+            if 'Delimiter' in args:
+                yield {'CommonPrefixes': [{'Prefix': 'exports/2024/'}, {'Prefix': 'exports/2025/'}]}
+                return
+            for page in range(100):
+                pages_listed.append((args['Prefix'], page))
+                yield {'Contents': [{'Key': '{}{:03}.csv'.format(args['Prefix'], page)}]}
+        mocked_client.return_value.get_paginator.return_value.paginate.side_effect = paginate
+
+        s3_objects = s3.list_files_in_bucket({'bucket': 'test', 'list_concurrency': '4'}, 'exports/')
+        self.assertEqual('exports/2024/000.csv', next(s3_objects)['Key'])
+        # Stopping early doesn't wait for the shards to be listed
+        s3_objects.close()
+
+        time.sleep(0.3)
+        for prefix in ['exports/2024/', 'exports/2025/']:
+            self.assertLessEqual(len([page for page in pages_listed if page[0] == prefix]), s3.LIST_QUEUE_PAGES + 2)
+
+
+class TestOrderedConcurrentMap(unittest.TestCase):
+
+    def test_results_are_in_input_order(self):
+        def slow_for_small_numbers(number):
+            time.sleep(0.01 * (5 - number))
+            return number * 2
+
+        self.assertEqual([0, 2, 4, 6, 8], list(utils.ordered_concurrent_map(slow_for_small_numbers, range(5), 3)))
+
+
+    def test_no_more_than_max_workers_results_are_held(self):
+        calls = []
+        results = utils.ordered_concurrent_map(calls.append, range(5), 2)
+
+        next(results)
+        time.sleep(0.1)
+        # The result being consumed and the one after it
+        self.assertEqual([0, 1], calls)
+
+        self.assertEqual(4, len(list(results)))
+        self.assertEqual([0, 1, 2, 3, 4], calls)
+
+
+class TestOrderedConcurrentChain(unittest.TestCase):
+
+    def test_values_are_in_input_order(self):
+        def slow_for_small_numbers(number):
+            time.sleep(0.01 * (5 - number))
+            yield number
+            yield number * 2
+
+        self.assertEqual([0, 0, 1, 2, 2, 4, 3, 6, 4, 8],
+                         list(utils.ordered_concurrent_chain(slow_for_small_numbers, range(5), 3, 1)))
+
+    def test_errors_are_raised_after_the_values_before_them(self):
+        def fail_after_one(number):
+            yield number
+            raise ValueError("Listing failed")
+
+        values = utils.ordered_concurrent_chain(fail_after_one, range(3), 2, 1)
+
+        self.assertEqual(0, next(values))
+        with self.assertRaises(ValueError):
+            next(values)
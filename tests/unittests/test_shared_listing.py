@@ -0,0 +1,107 @@
+import time
+import unittest
+from datetime import datetime
+from unittest import mock
+
+import tap_s3_csv
+from tap_s3_csv import discover
+from tap_s3_csv import s3
+
+KEYS = ["exports/orders/1.csv", "exports/orders/2.csv", "exports/refunds/1.csv", "exports/refunds/2.jsonl"]
+
+
+def mock_list_files_in_bucket(config, search_prefix=None, sharded=True):
+    time.sleep(0.01)
+    for key in KEYS:
+        if key.startswith(search_prefix or ''):
+            yield {'Key': key, 'LastModified': datetime(2024, 1, 1), 'Size': 10}
+
+
+def get_keys(table_spec):
+    return [s3_file['key'] for s3_file in s3.get_input_files_for_table({'bucket': 'test'}, table_spec)]
+
+
+@mock.patch("tap_s3_csv.s3.list_files_in_bucket", side_effect=mock_list_files_in_bucket)
+class TestSharedListing(unittest.TestCase):
+
+    def setUp(self):
+        s3.enable_shared_listing()
+
+    def tearDown(self):
+        s3.disable_shared_listing()
+
+    def test_prefix_is_listed_once(self, mocked_list_files_in_bucket):
+        orders = get_keys({'table_name': 'orders', 'search_pattern': 'orders/.*', 'search_prefix': 'exports/'})
+        refunds = get_keys({'table_name': 'refunds', 'search_pattern': r'refunds/.*\.csv', 'search_prefix': 'exports/'})
+
+        self.assertEqual(["exports/orders/1.csv", "exports/orders/2.csv"], orders)
+        self.assertEqual(["exports/refunds/1.csv"], refunds)
+        mocked_list_files_in_bucket.assert_called_once_with({'bucket': 'test'}, 'exports/')
+
+    def test_longer_prefix_is_filtered_from_listed_prefix(self, mocked_list_files_in_bucket):
+        get_keys({'table_name': 'all', 'search_pattern': '.*', 'search_prefix': 'exports/'})
+        refunds = get_keys({'table_name': 'refunds', 'search_pattern': '.*', 'search_prefix': 'exports/refunds/'})
+        # Derived from the search_pattern
+        orders = get_keys({'table_name': 'orders', 'search_pattern': '^exports/orders/'})
+
+        self.assertEqual(["exports/refunds/1.csv", "exports/refunds/2.jsonl"], refunds)
+        self.assertEqual(["exports/orders/1.csv", "exports/orders/2.csv"], orders)
+        mocked_list_files_in_bucket.assert_called_once_with({'bucket': 'test'}, 'exports/')
+
+    def test_shorter_prefix_is_listed_again(self, mocked_list_files_in_bucket):
+        get_keys({'table_name': 'refunds', 'search_pattern': '.*', 'search_prefix': 'exports/refunds/'})
+        keys = get_keys({'table_name': 'all', 'search_pattern': '.*', 'search_prefix': 'exports/'})
+
+        self.assertEqual(KEYS, keys)
+        self.assertEqual(2, mocked_list_files_in_bucket.call_count)
+
+    def test_concurrent_discovery_lists_prefix_once(self, mocked_list_files_in_bucket):
+        tables = [{'table_name': 'table_{}'.format(i), 'search_pattern': r'\.csv', 'search_prefix': 'exports/',
+                   'key_properties': []} for i in range(5)]
+
+        config = {'bucket': 'test', 'tables': tables, 'discovery_concurrency': 5}
+
+        # Consume the listing without sampling any file
+        with mock.patch("tap_s3_csv.s3.sample_files", side_effect=lambda config, table_spec, files: list(files)[:0]):
+            discover.discover_streams(config)
+
+        mocked_list_files_in_bucket.assert_called_once_with(config, 'exports/')
+
+    def test_listing_is_not_shared_when_disabled(self, mocked_list_files_in_bucket):
+        s3.disable_shared_listing()
+        table_spec = {'table_name': 'orders', 'search_pattern': 'orders/.*', 'search_prefix': 'exports/'}
+
+        get_keys(table_spec)
+        get_keys(table_spec)
+
+        self.assertEqual(2, mocked_list_files_in_bucket.call_count)
+
+
+class TestShareListings(unittest.TestCase):
+
+    def get_shared_listing_during_sync(self, config):
+        shared_listings = []
+        with mock.patch("tap_s3_csv.sync_streams", side_effect=lambda *args: shared_listings.append(s3._shared_listing)):
+            tap_s3_csv.do_sync(config, {'streams': []}, {}, None)
+        return shared_listings[0]
+
+    def test_listings_are_shared_only_when_configured(self):
+        tables = [{'table_name': 'orders'}, {'table_name': 'refunds'}]
+
+        self.assertIsNone(self.get_shared_listing_during_sync({'tables': tables}))
+        self.assertIsNone(self.get_shared_listing_during_sync({'tables': tables[:1], 'share_listings': 'true'}))
+        self.assertIsNotNone(self.get_shared_listing_during_sync({'tables': tables, 'share_listings': True}))
+        self.assertIsNone(s3._shared_listing)
+
+    @mock.patch("json.dump")
+    def test_listings_are_not_shared_during_discovery(self, mocked_dump):
+        shared_listings = []
+        def discover_streams(config):
+            shared_listings.append(s3._shared_listing)
+            return [{}]
+
+        with mock.patch("tap_s3_csv.discover_streams", side_effect=discover_streams):
+            tap_s3_csv.do_discover({'tables': [{'table_name': 'orders'}, {'table_name': 'refunds'}],
+                                    'share_listings': 'true'})
+
+        self.assertEqual([None], shared_listings)
@@ -0,0 +1,80 @@
+import bz2
+import lzma
+import unittest
+from unittest import mock
+
+from tap_s3_csv import s3
+from tap_s3_csv import sync
+from tap_s3_csv import utils
+
+from utils_for_unittests import StreamingBody, get_stream
+
+STREAM = get_stream({'id': {'type': ['null', 'string']}})
+
+CSV = b"id\n" + b"".join("{}\n".format(i).encode() for i in range(100))
+JSONL = b"".join('{{"id": "{}"}}\n'.format(i).encode() for i in range(100))
+
+
+def compress(data, extension):
+    if extension == "bz2":
+        return bz2.compress(data)
+    if extension == "xz":
+        return lzma.compress(data)
+    # Written as two frames, as concatenated zst files are
+    compressor = utils.zstandard.ZstdCompressor()
+    half = len(data) // 2
+    return compressor.compress(data[:half]) + compressor.compress(data[half:])
+
+
+def get_extensions():
+    return ["bz2", "xz", "zst"] if utils.zstandard is not None else ["bz2", "xz"]
+
+
+@mock.patch("tap_s3_csv.output.write_record")
+@mock.patch("tap_s3_csv.s3.get_file_handle")
+class TestStreamCompression(unittest.TestCase):
+
+    def sync_file(self, s3_path, data, mocked_get_file_handle, mocked_write_record):
+        mocked_write_record.reset_mock()
+        mocked_get_file_handle.return_value = StreamingBody(data)
+        records_synced = sync.sync_table_file({'bucket': 'test'}, s3_path, {'table_name': 'table'}, STREAM)
+        return records_synced, [call.args[1] for call in mocked_write_record.call_args_list]
+
+    def test_compressed_files_are_synced(self, mocked_get_file_handle, mocked_write_record):
+        for extension in get_extensions():
+            for file_name, data in [("data.csv", CSV), ("data.jsonl", JSONL)]:
+                s3_path = "exports/{}.{}".format(file_name, extension)
+                records_synced, records = self.sync_file(
+                    s3_path, compress(data, extension), mocked_get_file_handle, mocked_write_record)
+
+                self.assertEqual(100, records_synced)
+                self.assertEqual([str(i) for i in range(100)], [record['id'] for record in records])
+                self.assertEqual(s3_path + "/" + file_name, records[0]['_sdc_source_file'])
+
+    def test_compressed_files_are_sampled(self, mocked_get_file_handle, mocked_write_record):
+        for extension in get_extensions():
+            mocked_get_file_handle.return_value = StreamingBody(compress(CSV, extension))
+
+            records = list(s3.sample_files({'bucket': 'test'}, {'table_name': 'table'},
+                                           [{'key': 'data.csv.' + extension}], sample_rate=10))
+
+            self.assertEqual([str(i) for i in range(0, 100, 10)], [record['id'] for record in records])
+
+    def test_files_without_inner_extension_or_with_nested_compression_are_skipped(self, mocked_get_file_handle,
+                                                                                   mocked_write_record):
+        records_synced, _ = self.sync_file("data.bz2", bz2.compress(CSV), mocked_get_file_handle, mocked_write_record)
+        self.assertEqual(0, records_synced)
+
+        records_synced, _ = self.sync_file("data.csv.xz.bz2", bz2.compress(lzma.compress(CSV)),
+                                           mocked_get_file_handle, mocked_write_record)
+        self.assertEqual(0, records_synced)
+
+    @mock.patch("tap_s3_csv.utils.zstandard", None)
+    @mock.patch("tap_s3_csv.sync.LOGGER.warning")
+    def test_zst_files_are_skipped_without_zstandard(self, mocked_logger, mocked_get_file_handle,
+                                                     mocked_write_record):
+        records_synced, _ = self.sync_file("data.csv.zst", b"", mocked_get_file_handle, mocked_write_record)
+
+        self.assertEqual(0, records_synced)
+        mocked_logger.assert_called_with('Skipping "%s" file as the zstandard package is not installed.',
+                                         "data.csv.zst")
@@ -0,0 +1,69 @@
+import gzip
+import io
+import unittest
+from unittest import mock
+
+from tap_s3_csv import s3
+from tap_s3_csv import sync
+from tap_s3_csv import utils
+
+
+class StreamOnlyFile():
+    """File-like object that fails if the whole stream is read at once."""
+
+    def __init__(self, data):
+        self._file = io.BytesIO(data)
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            raise AssertionError("The whole gzip file was read into memory")
+        return self._file.read(size)
+
+
+def make_gz_bytes(file_name, content):
+    gz_file = io.BytesIO()
+    with gzip.GzipFile(filename=file_name, mode='wb', fileobj=gz_file) as gz:
+        gz.write(content)
+    return gz_file.getvalue()
+
+
+CSV_CONTENT = b"id,name\n" + b"".join(b"%d,name_%d\n" % (i, i) for i in range(1, 101))
+
+
+class TestStreamingGzFile(unittest.TestCase):
+
+    def test_open_gz_file_returns_name_and_decompressed_stream(self):
+        gz_bytes = make_gz_bytes("data.csv", CSV_CONTENT)
+
+        gz_file_name, gz_file = utils.open_gz_file(StreamOnlyFile(gz_bytes))
+
+        self.assertEqual("data.csv", gz_file_name)
+        self.assertEqual(CSV_CONTENT, b"".join(gz_file))
+
+    def test_open_gz_file_without_name_raises_attribute_error(self):
+        gz_file = io.BytesIO()
+        with gzip.GzipFile(mode='wb', fileobj=gz_file) as gz:
+            gz.write(CSV_CONTENT)
+
+        with self.assertRaises(AttributeError):
+            utils.open_gz_file(StreamOnlyFile(gz_file.getvalue()))
+
+    @mock.patch("tap_s3_csv.output.write_record")
+    def test_sync_gz_file_streams_records(self, mocked_write_record):
+        config = {"bucket": "bucket_name"}
+        table_spec = {"table_name": "GZ_DATA"}
+        stream = {"schema": {"properties": {"id": {"type": ["null", "integer"]}, "name": {"type": ["null", "string"]}}},
+                  "metadata": []}
+        gz_bytes = make_gz_bytes("data.csv", CSV_CONTENT)
+
+        records = sync.handle_file(config, "data.gz", table_spec, stream, "gz", StreamOnlyFile(gz_bytes))
+
+        self.assertEqual(100, records)
+        self.assertEqual("data.gz/data.csv", mocked_write_record.call_args.args[1]["_sdc_source_file"])
+
+    def test_sampling_gz_file_streams_records(self):
+        gz_bytes = make_gz_bytes("data.csv", CSV_CONTENT)
+
+        samples = list(s3.sample_file({}, "data.gz", StreamOnlyFile(gz_bytes), 10, "gz"))
+
+        self.assertEqual([str(i) for i in range(1, 101, 10)], [sample["id"] for sample in samples])
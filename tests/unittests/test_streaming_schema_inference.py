@@ -0,0 +1,62 @@
+import unittest
+import weakref
+from unittest import mock
+
+from tap_s3_csv import s3
+
+
+class Record(dict):
+    # Unlike dict, subclasses can be weakly referenced
+    pass
+
+
+class TestStreamingSchemaInference(unittest.TestCase):
+
+    @mock.patch("tap_s3_csv.s3.get_input_files_for_table")
+    def test_sampled_records_are_not_held(self, mocked_get_input_files):
+        references = []
+        def sample_files(config, table_spec, s3_files):
+            for i in range(100):
+                # Only the record the caller is observing may still be alive
+                self.assertTrue(all(reference() is None for reference in references[:-1]))
+                record = Record(id=str(i), name='name_{}'.format(i), **({'extra': 1.5} if i == 50 else {}))
+                references.append(weakref.ref(record))
+                yield record
+                del record
+
+        with mock.patch("tap_s3_csv.s3.sample_files", side_effect=sample_files):
+            data_schema = s3.get_sampled_schema_for_table({'bucket': 'test'}, {'table_name': 'test'})
+
+        self.assertEqual(100, len(references))
+        self.assertEqual(['id', 'name', 'extra'], list(data_schema['properties'])[:3])
+
+    def test_jsonl_records_are_checked_as_they_are_sampled(self):
+        pulled = []
+        def records():
+            for i in range(10):
+                pulled.append(i)
+                yield {'id': i}
+
+        checked_records = s3.get_checked_jsonl_records({'key_properties': ['id']}, 'file.jsonl', records(), 1000)
+
+        self.assertEqual({'id': 0}, next(checked_records))
+        # Only the next record is read ahead
+        self.assertEqual([0, 1], pulled)
+        self.assertEqual(9, len(list(checked_records)))
+
+    def test_jsonl_records_are_checked_when_sampling_stops_at_max_records(self):
+        records = iter([{'id': 1}, {'id': 2}, {'id': 3, 'created_at': '2024-01-01'}])
+        table_spec = {'date_overrides': ['created_at']}
+
+        with self.assertRaises(Exception) as err:
+            list(s3.get_checked_jsonl_records(table_spec, 'file.jsonl', records, 2))
+
+        self.assertEqual('JSONL file "file.jsonl" is missing date_overrides key: {\'created_at\'}', str(err.exception))
+
+    def test_sample_file_checks_jsonl_keys(self):
+        file_handle = [b'{"name": "a"}\n', b'{"name": "b"}\n']
+
+        with self.assertRaises(Exception) as err:
+            list(s3.sample_file({'key_properties': ['id']}, 'file.jsonl', file_handle, 1, 'jsonl'))
+
+        self.assertEqual('JSONL file "file.jsonl" is missing required key_properties key: {\'id\'}', str(err.exception))
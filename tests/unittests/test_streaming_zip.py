@@ -0,0 +1,97 @@
+import io
+import os
+import unittest
+import zipfile
+from unittest import mock
+
+from tap_s3_csv import s3
+from tap_s3_csv import sync
+
+
+class CountingFile(io.BytesIO):
+    """A seekable file that counts the bytes read from it, like s3fs fetches them."""
+
+    def __init__(self, data):
+        super().__init__(data)
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        data = super().read(size)
+        self.bytes_read += len(data)
+        return data
+
+
+def make_zip():
+    zip_bytes = io.BytesIO()
+    with zipfile.ZipFile(zip_bytes, "w", zipfile.ZIP_DEFLATED) as zip_file:
+        zip_file.writestr("small.csv", "id,name\n1,a\n")
+        # Random bytes don't compress, so the archive is as large as this member
+        zip_file.writestr("large.csv", "id,blob\n1,{}\n".format(os.urandom(1024 * 1024).hex()))
+    return zip_bytes.getvalue()
+
+
+@mock.patch("tap_s3_csv.s3.get_s3fs_file_handle")
+class TestStreamingZip(unittest.TestCase):
+
+    def test_only_central_directory_and_read_members_are_fetched(self, mocked_get_s3fs_file_handle):
+        zip_bytes = make_zip()
+        counting_file = CountingFile(zip_bytes)
+        mocked_get_s3fs_file_handle.return_value = counting_file
+
+        with s3.open_zip_file({'bucket': 'test'}, 'archive.zip') as zip_file:
+            members = {member.name: member for member in s3.get_zip_members(zip_file, lambda name: True)}
+            self.assertEqual(['small.csv', 'large.csv'], list(members))
+            self.assertLess(counting_file.bytes_read, 64 * 1024)
+
+            self.assertEqual(b"id,name\n1,a\n", members['small.csv'].read())
+            self.assertLess(counting_file.bytes_read, 64 * 1024)
+
+            # Members are inflated as they're read
+            self.assertEqual(b"id,blob\n", members['large.csv'].readline())
+            self.assertLess(counting_file.bytes_read, len(zip_bytes) / 2)
+
+        self.assertTrue(counting_file.closed)
+
+    def test_unsupported_members_are_not_opened(self, mocked_get_s3fs_file_handle):
+        mocked_get_s3fs_file_handle.return_value = CountingFile(make_zip())
+
+        with mock.patch("zipfile.ZipFile.open", autospec=True, side_effect=zipfile.ZipFile.open) as mocked_open:
+            with s3.open_zip_file({'bucket': 'test'}, 'archive.zip') as zip_file:
+                members = [member.name for member in s3.get_zip_members(zip_file, lambda name: name == 'large.csv')]
+
+        self.assertEqual(['large.csv'], members)
+        self.assertEqual(['large.csv'], [call.args[1] for call in mocked_open.call_args_list])
+
+    @mock.patch("tap_s3_csv.output.write_record")
+    def test_archive_is_closed_after_sync(self, mocked_write_record, mocked_get_s3fs_file_handle):
+        for config in [{'bucket': 'test'}, {'bucket': 'test', 'zip_member_concurrency': '2'}]:
+            counting_file = CountingFile(make_zip())
+            mocked_get_s3fs_file_handle.return_value = counting_file
+            stream = {'schema': {'type': 'object', 'properties': {'id': {'type': ['null', 'string']}}},
+                      'metadata': [{'breadcrumb': [], 'metadata': {'selected': True}}]}
+
+            records_synced = sync.sync_compressed_file(config, 'archive.zip', {'table_name': 'table'}, stream)
+
+            self.assertEqual(2, records_synced)
+            self.assertTrue(counting_file.closed)
+
+    def test_archive_is_closed_after_sampling(self, mocked_get_s3fs_file_handle):
+        counting_file = CountingFile(make_zip())
+        mocked_get_s3fs_file_handle.return_value = counting_file
+
+        records = list(s3.sample_files({'bucket': 'test'}, {'table_name': 'table'}, [{'key': 'archive.zip'}]))
+
+        self.assertEqual(['1', '1'], [record['id'] for record in records])
+        self.assertTrue(counting_file.closed)
+
+    def test_get_files_to_sample_lists_members_without_downloading_archive(self, mocked_get_s3fs_file_handle):
+        zip_bytes = make_zip()
+        counting_file = CountingFile(zip_bytes)
+        mocked_get_s3fs_file_handle.return_value = counting_file
+
+        with mock.patch("tap_s3_csv.s3.get_file_handle") as mocked_get_file_handle:
+            files = s3.get_files_to_sample({'bucket': 'test'}, [{'key': 'archive.zip'}], 5)
+
+        mocked_get_file_handle.assert_not_called()
+        self.assertEqual(['small.csv', 'large.csv'], [file['file_handle'].name for file in files])
+        self.assertLess(counting_file.bytes_read, 64 * 1024)
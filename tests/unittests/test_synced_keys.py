@@ -0,0 +1,66 @@
+import unittest
+from datetime import datetime, timezone
+from unittest import mock
+
+from tap_s3_csv import s3
+from tap_s3_csv import sync
+
+BOUNDARY = datetime(2024, 1, 2, tzinfo=timezone.utc)
+
+S3_OBJECTS = [
+    {'Key': 'file1.csv', 'LastModified': datetime(2024, 1, 1, tzinfo=timezone.utc), 'Size': 10},
+    {'Key': 'file2.csv', 'LastModified': BOUNDARY, 'Size': 10},
+    {'Key': 'file3.csv', 'LastModified': BOUNDARY, 'Size': 10},
+    {'Key': 'file4.csv', 'LastModified': datetime(2024, 1, 3, tzinfo=timezone.utc), 'Size': 10},
+]
+
+CONFIG = {'bucket': 'test', 'start_date': '2023-12-31T00:00:00Z'}
+TABLE_SPEC = {'table_name': 'table', 'search_pattern': 'csv'}
+
+
+def mock_list_files_in_bucket(config, search_prefix=None, sharded=True):
+    return iter(S3_OBJECTS)
+
+
+@mock.patch("tap_s3_csv.s3.list_files_in_bucket", side_effect=mock_list_files_in_bucket)
+class TestSyncedKeys(unittest.TestCase):
+
+    def get_keys(self, synced_keys):
+        return [s3_file['key'] for s3_file in s3.get_input_files_for_table(CONFIG, TABLE_SPEC, BOUNDARY, synced_keys)]
+
+    def test_files_at_bookmark_are_skipped_without_synced_keys(self, mocked_list_files_in_bucket):
+        self.assertEqual(['file4.csv'], self.get_keys(None))
+
+    def test_files_at_bookmark_not_synced_yet_are_listed(self, mocked_list_files_in_bucket):
+        self.assertEqual(['file3.csv', 'file4.csv'], self.get_keys({'file2.csv'}))
+        self.assertEqual(['file2.csv', 'file3.csv', 'file4.csv'], self.get_keys(set()))
+
+    @mock.patch("tap_s3_csv.sync.sync_table_file", return_value=1)
+    @mock.patch("singer.write_state")
+    def test_sync_resumes_within_the_bookmarked_second(self, mocked_write_state, mocked_sync_table_file,
+                                                       mocked_list_files_in_bucket):
+        state = {'bookmarks': {'table': {'modified_since': BOUNDARY.isoformat(), 'synced_keys': ['file2.csv']}}}
+
+        sync.sync_stream(CONFIG, state, TABLE_SPEC, {}, datetime(2024, 2, 1, tzinfo=timezone.utc))
+
+        self.assertEqual(['file3.csv', 'file4.csv'], [call.args[1] for call in mocked_sync_table_file.call_args_list])
+        self.assertEqual({'modified_since': '2024-01-03T00:00:00+00:00', 'synced_keys': ['file4.csv']},
+                         state['bookmarks']['table'])
+
+    @mock.patch("tap_s3_csv.sync.sync_table_file", return_value=1)
+    @mock.patch("singer.write_state")
+    def test_synced_keys_collect_files_of_the_same_second(self, mocked_write_state, mocked_sync_table_file,
+                                                          mocked_list_files_in_bucket):
+        bookmarks = []
+        mocked_write_state.side_effect = lambda state: bookmarks.append(dict(state['bookmarks']['table']))
+        state = {}
+
+        sync.sync_stream(CONFIG, state, TABLE_SPEC, {}, BOUNDARY)
+
+        self.assertEqual([
+            {'modified_since': '2024-01-01T00:00:00+00:00', 'synced_keys': ['file1.csv']},
+            {'modified_since': '2024-01-02T00:00:00+00:00', 'synced_keys': ['file2.csv']},
+            {'modified_since': '2024-01-02T00:00:00+00:00', 'synced_keys': ['file2.csv', 'file3.csv']},
+            # Files modified after the sync started are bookmarked at its start, to be synced again
+            {'modified_since': '2024-01-02T00:00:00+00:00', 'synced_keys': ['file2.csv', 'file3.csv']},
+        ], bookmarks)
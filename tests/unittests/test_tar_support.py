@@ -0,0 +1,71 @@
+import io
+import tarfile
+import unittest
+from unittest import mock
+
+from tap_s3_csv import s3
+from tap_s3_csv import sync
+from tap_s3_csv import utils
+
+from utils_for_unittests import StreamingBody, get_stream, gzip_with_name
+
+STREAM = get_stream({'id': {'type': ['null', 'string']}})
+
+
+def make_tar(mode="w"):
+    members = [
+        ("data/first.csv", b"id\n1\n2\n"),
+        ("data/second.jsonl", b'{"id": "3"}\n{"id": "4"}\n'),
+        ("data/third.csv.gz", gzip_with_name("third.csv", b"id\n5\n")),
+        ("notes.md", b"not synced"),
+        ("nested.tar.gz", b"not synced"),
+    ]
+    tar_bytes = io.BytesIO()
+    with tarfile.open(fileobj=tar_bytes, mode=mode) as tar_file:
+        directory = tarfile.TarInfo("data")
+        directory.type = tarfile.DIRTYPE
+        tar_file.addfile(directory)
+        for name, data in members:
+            tar_info = tarfile.TarInfo(name)
+            tar_info.size = len(data)
+            tar_file.addfile(tar_info, io.BytesIO(data))
+    return tar_bytes.getvalue()
+
+
+@mock.patch("tap_s3_csv.output.write_record")
+@mock.patch("tap_s3_csv.s3.get_file_handle")
+class TestTarSupport(unittest.TestCase):
+
+    def sync_tar(self, s3_path, tar_bytes, mocked_get_file_handle, mocked_write_record):
+        mocked_get_file_handle.return_value = StreamingBody(tar_bytes)
+        records_synced = sync.sync_table_file({'bucket': 'test'}, s3_path, {'table_name': 'table'}, STREAM)
+        return records_synced, [(call.args[1]['_sdc_source_file'], call.args[1]['id'])
+                                for call in mocked_write_record.call_args_list]
+
+    def test_members_are_synced_in_order(self, mocked_get_file_handle, mocked_write_record):
+        for s3_path, mode in [("archive.tar", "w"), ("archive.tar.gz", "w:gz"), ("archive.tgz", "w:gz")]:
+            mocked_write_record.reset_mock()
+            records_synced, records = self.sync_tar(s3_path, make_tar(mode), mocked_get_file_handle, mocked_write_record)
+
+            self.assertEqual(5, records_synced)
+            self.assertEqual([(s3_path + "/data/first.csv", "1"),
+                              (s3_path + "/data/first.csv", "2"),
+                              (s3_path + "/data/second.jsonl", "3"),
+                              (s3_path + "/data/second.jsonl", "4"),
+                              (s3_path + "/data/third.csv.gz/third.csv", "5")],
+                             records)
+
+    def test_members_are_sampled(self, mocked_get_file_handle, mocked_write_record):
+        mocked_get_file_handle.side_effect = lambda config, s3_path: StreamingBody(make_tar("w:gz"))
+
+        records = list(s3.sample_files({'bucket': 'test'}, {'table_name': 'table'},
+                                       [{'key': 'archive.tar.gz'}], sample_rate=1))
+
+        self.assertEqual([{'id': '1'}, {'id': '2'}, {'id': '3'}, {'id': '4'}, {'id': '5'}],
+                         [{'id': record['id']} for record in records])
+
+    def test_members_are_read_without_seeking(self, mocked_get_file_handle, mocked_write_record):
+        members = utils.get_tar_members(StreamingBody(make_tar("w:gz")))
+
+        self.assertEqual(["data/first.csv", "data/second.jsonl", "data/third.csv.gz", "notes.md", "nested.tar.gz"],
+                         [name for name, _ in members])
@@ -0,0 +1,38 @@
+import gzip
+import io
+
+
+def get_stream(properties):
+    """Returns a selected stream of the table 'table' whose records have
+    `properties` and the _sdc columns."""
+    return {
+        'stream': 'table',
+        'tap_stream_id': 'table',
+        'schema': {'type': 'object', 'properties': {
+            **properties,
+            '_sdc_source_bucket': {'type': 'string'},
+            '_sdc_source_file': {'type': 'string'},
+            '_sdc_source_lineno': {'type': 'integer'},
+            '_sdc_extra': {'type': ['null', 'array'], 'items': {'type': 'object', 'properties': {}}}}},
+        'metadata': [{'breadcrumb': [], 'metadata': {'selected': True}}]
+    }
+
+
+class StreamingBody():
+    """A forward-only stream, like the body of an S3 object."""
+
+    def __init__(self, data):
+        self._data = io.BytesIO(data)
+
+    def read(self, size=-1):
+        return self._data.read(size)
+
+    def close(self):
+        pass
+
+
+def gzip_with_name(name, data):
+    gz_bytes = io.BytesIO()
+    with gzip.GzipFile(filename=name, fileobj=gz_bytes, mode="wb") as gz_file:
+        gz_file.write(data)
+    return gz_bytes.getvalue()